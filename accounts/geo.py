@@ -0,0 +1,122 @@
+"""
+cached snapshot of the country -> city table for address forms.
+
+the snapshot is built from two queries and kept in redis without a timeout,
+its version is the hash of its content (so it is also the ETag). every
+process keeps the snapshot it last saw together with a name index and checks
+the version key in redis on each read, a changed or deleted Country/City
+drops both keys (accounts/signals.py).
+
+    geo:version  -> version
+    geo:snapshot -> {"version": ..., "countries": [{id, name, cities: [...]}]}
+"""
+
+import bisect
+import hashlib
+import json
+
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import City, Country
+
+GEO_VERSION_KEY = "geo:version"
+GEO_SNAPSHOT_KEY = "geo:snapshot"
+
+# GeoIndex of the version this process saw last
+_local = {}
+
+
+def build_geo_snapshot():
+    countries = {
+        pk: {"id": pk, "name": name, "cities": []}
+        for pk, name in Country.objects.order_by("name", "id").values_list("id", "name")
+    }
+    for pk, name, country_id in City.objects.order_by("name", "id").values_list(
+        "id", "name", "country_id"
+    ):
+        countries[country_id]["cities"].append({"id": pk, "name": name})
+
+    countries = list(countries.values())
+    body = json.dumps(countries, ensure_ascii=False, sort_keys=True).encode()
+    return {"version": hashlib.sha256(body).hexdigest()[:16], "countries": countries}
+
+
+class GeoIndex:
+    """
+    one snapshot with the lists the views answer from, rendered once
+    """
+
+    def __init__(self, snapshot):
+        self.version = snapshot["version"]
+        self.etag = f'"{self.version}"'
+        self.countries = [
+            {"id": country["id"], "name": country["name"]}
+            for country in snapshot["countries"]
+        ]
+        self.cities = {}
+        # (folded name, city id) sorted, for all cities and per country
+        self.names = []
+        self.country_names = {}
+        for country in snapshot["countries"]:
+            keys = self.country_names[country["id"]] = []
+            for city in country["cities"]:
+                self.cities[city["id"]] = {
+                    "id": city["id"],
+                    "name": city["name"],
+                    "country": {"id": country["id"], "name": country["name"]},
+                }
+                keys.append((city["name"].casefold(), city["id"]))
+            keys.sort()
+            self.names.extend(keys)
+        self.names.sort()
+        self.snapshot_body = self.render(snapshot)
+        self.countries_body = self.render(self.countries)
+        self.cities_body = self.render([self.cities[pk] for _, pk in self.names])
+
+    @staticmethod
+    def render(data):
+        return json.dumps(data, ensure_ascii=False).encode()
+
+    def search(self, q="", country=None, limit=None):
+        """
+        cities whose name starts with q (case insensitive), by name
+        """
+        names = self.names if country is None else self.country_names.get(country, [])
+        prefix = q.casefold()
+        found = []
+        for name, pk in names[bisect.bisect_left(names, (prefix,)) :]:
+            if not name.startswith(prefix) or len(found) == limit:
+                break
+            found.append(self.cities[pk])
+        return found
+
+
+def get_geo():
+    """
+    GeoIndex of the current snapshot, from this process when the version in
+    redis did not change, else from redis or the database
+    """
+    version = cache.get(GEO_VERSION_KEY)
+    geo = _local.get("geo")
+    if version is not None and geo is not None and geo.version == version:
+        return geo
+
+    snapshot = cache.get(GEO_SNAPSHOT_KEY) if version is not None else None
+    if snapshot is None or snapshot["version"] != version:
+        snapshot = build_geo_snapshot()
+        cache.set_many(
+            {GEO_SNAPSHOT_KEY: snapshot, GEO_VERSION_KEY: snapshot["version"]}, None
+        )
+    if geo is None or geo.version != snapshot["version"]:
+        geo = _local["geo"] = GeoIndex(snapshot)
+    return geo
+
+
+def invalidate_geo():
+    """
+    drop the snapshot now and again after commit
+    """
+    keys = [GEO_VERSION_KEY, GEO_SNAPSHOT_KEY]
+    cache.delete_many(keys)
+    transaction.on_commit(lambda: cache.delete_many(keys))
@@ -21,6 +21,10 @@ class User(AbstractUser, Time):
     role = models.CharField(max_length=10, choices=ROLE_CHOICES, default="USER")
     is_active = models.BooleanField(default=True)
 
+    class Meta(AbstractUser.Meta):
+        # keyset pagination (core.pagination)
+        indexes = [models.Index(fields=["-created_at", "-id"], name="user_created_idx")]
+
     def __str__(self):
         return f"{self.email} ({self.role})"
 
@@ -49,5 +53,11 @@ class Address(Time):
     zip_code = models.CharField(max_length=20)
     is_active = models.BooleanField(default=True)
 
+    class Meta:
+        # keyset pagination (core.pagination)
+        indexes = [
+            models.Index(fields=["-created_at", "-id"], name="address_created_idx")
+        ]
+
     def __str__(self):
         return f"{self.user.username} - {self.city.name}"
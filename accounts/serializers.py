@@ -25,6 +25,16 @@ class CitySerializer(serializers.ModelSerializer):
             return rep
 
 
+class CitySearchSerializer(serializers.Serializer):
+    """
+    query string of the city list: ?country=<id>&q=<name prefix>&limit
+    """
+
+    country = serializers.IntegerField(required=False, min_value=1)
+    q = serializers.CharField(required=False, allow_blank=True, max_length=255)
+    limit = serializers.IntegerField(required=False, min_value=1, max_value=100)
+
+
 class UserSerializer(serializers.ModelSerializer):
     password1 = serializers.CharField(write_only=True)
     password2 = serializers.CharField(write_only=True)
@@ -86,8 +96,10 @@ class UserSerializer(serializers.ModelSerializer):
 
 class AddressSerializer(serializers.ModelSerializer):
     # using serializers of user and city for mor information like name and id of city and user fild fore get method
-    city = serializers.SerializerMethodField()
+    city = serializers.PrimaryKeyRelatedField(queryset=City.objects.all())
     user = serializers.SerializerMethodField()
+    # relations read by get_city / get_user (for core.prefetch)
+    nested_relations = {"city": None, "user": None}
 
     class Meta:
         model = Address
@@ -105,6 +117,11 @@ class AddressSerializer(serializers.ModelSerializer):
 
     """for getting more information about user and city(id,name)"""
 
+    def to_representation(self, instance):
+        rep = super().to_representation(instance)
+        rep["city"] = self.get_city(instance)
+        return rep
+
     def get_city(self, obj):
 
         return {"id": obj.city.id, "name": obj.city.name}
@@ -130,14 +147,17 @@ class ChangePasswordSerializer(serializers.Serializer):
 
         validate_password(attrs["new_password"])
 
-        user = self.context["request"].user
+        # request.user can come from the user cache or the token claims,
+        # the password is checked against the row itself
+        user = User.objects.get(pk=self.context["request"].user.pk)
         if not user.check_password(attrs["old_password"]):
             raise serializers.ValidationError("رمز فعلی اشتباه است.")
 
+        attrs["user"] = user
         return attrs
 
     def save(self, **kwargs):
-        user = self.context["request"].user
+        user = self.validated_data["user"]
         user.set_password(self.validated_data["new_password"])
-        user.save()
+        user.save(update_fields=["password", "updated_at"])
         return user
@@ -0,0 +1,24 @@
+from django.db.models.signals import post_delete, post_save
+
+from core.authentication import invalidate_user
+
+from .geo import invalidate_geo
+from .models import City, Country, User
+
+
+# UserUpdate, UserDelete (soft delete) and password changes all save the row
+def invalidate_user_cache(sender, instance, **kwargs):
+    invalidate_user(instance.pk)
+
+
+post_save.connect(invalidate_user_cache, sender=User)
+post_delete.connect(invalidate_user_cache, sender=User)
+
+
+def invalidate_geo_snapshot(sender, instance, **kwargs):
+    invalidate_geo()
+
+
+for model in (Country, City):
+    post_save.connect(invalidate_geo_snapshot, sender=model)
+    post_delete.connect(invalidate_geo_snapshot, sender=model)
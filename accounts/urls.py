@@ -9,9 +9,11 @@ from .views import (
     AddressUpdate,
     AddressDelete,
     UserDetail,
+    UserExport,
     AddressList,
     CityList,
     CountryList,
+    GeoSnapshot,
     ChangePasswordView,
 )
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
@@ -21,6 +23,7 @@ urlpatterns = [
 
     # this urls is for geting user list and doing crud
     path("users", UserList.as_view(), name="users"),
+    path("users/export", UserExport.as_view(), name="users-export"),
     path("user/<int:pk>", UserDetail.as_view(), name="userdetail"),
     path("user/delete/<int:pk>", UserDelete.as_view(), name="userdelete"),
     path("user/update/<int:pk>", UserUpdate.as_view(), name="userupdate"),
@@ -28,13 +31,14 @@ urlpatterns = [
     # this urls is for getting and create addresses
     path("address/<int:pk>", AddressDetail.as_view(), name="address-detail"),
     path("address", AddressList.as_view(), name="address-list"),
-    path("address/create", AddressCreate.as_view()),
+    path("address/create", AddressCreate.as_view(), name="address-create"),
     path("address/update/<int:pk>", AddressUpdate.as_view(), name="address-update"),
     path("address/delete/<int:pk>", AddressDelete.as_view()),
 
     # list of city and country
-    path("city", CityList.as_view()),
+    path("city", CityList.as_view(), name="city-list"),
     path("country", CountryList.as_view(), name="country-list"),
+    path("geo", GeoSnapshot.as_view(), name="geo"),
 
     # changing password
     #with this url user can change password
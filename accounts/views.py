@@ -2,24 +2,32 @@ from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
 from drf_spectacular.utils import extend_schema, OpenApiParameter, OpenApiTypes
-from .models import User, Address, Country, City
+from .models import User, Address
 from .serializers import (
     UserSerializer,
     AddressSerializer,
     CountrySerializer,
     CitySerializer,
     ChangePasswordSerializer,
+    CitySearchSerializer,
 )
+from django.http import HttpResponse, HttpResponseNotModified
 from django.shortcuts import get_object_or_404
-import jwt
-from django.conf import settings
-from rest_framework.exceptions import AuthenticationFailed
+from django.utils.http import parse_etags
 from rest_framework.permissions import IsAuthenticated, IsAdminUser
 from core.permissions import IsOwnerOrAdmin
 from rest_framework import generics
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import filters
 from rest_framework.generics import ListAPIView
+from core.export import export_response
+from core.idempotency import idempotent
+from core.pagination import CreatedAtCursorPagination, OptionalCursorPagination
+from core.prefetch import optimize_queryset
+from .geo import get_geo
+
+# cities of a search (?country / ?q) without ?limit
+CITY_SEARCH_LIMIT = 20
 
 
 
@@ -61,6 +69,7 @@ class UserList(ListAPIView):
     permission_classes = [IsAdminUser]
     serializer_class = UserSerializer
     queryset = User.objects.all()
+    pagination_class = OptionalCursorPagination
 
     filter_backends = [
         DjangoFilterBackend,
@@ -72,6 +81,30 @@ class UserList(ListAPIView):
     ordering_fields = ["username", "email", "date_joined"]
 
 
+@extend_schema(tags=["Users"])
+class UserExport(APIView):
+    """
+    stream all users as ndjson (or ?output=csv for gzip csv), no passwords
+    """
+
+    permission_classes = [IsAdminUser]
+    fields = [
+        "id",
+        "username",
+        "email",
+        "phone",
+        "role",
+        "is_active",
+        "is_staff",
+        "date_joined",
+        "created_at",
+        "updated_at",
+    ]
+
+    def get(self, request):
+        return export_response(request, User.objects.all(), self.fields, "users")
+
+
 @extend_schema(tags=["Users"])
 class UserDetail(APIView):
     """
@@ -144,19 +177,15 @@ class UserDelete(APIView):
 
 
 @extend_schema(tags=["Addresses"])
-class AddressList(APIView):
+class AddressList(ListAPIView):
     """
     address list
     """
 
     permission_classes = [IsAdminUser]
     serializer_class = AddressSerializer
-
-    def get(self, request):
-        queryset = Address.objects.all()
-        self.check_object_permissions(request, queryset)
-        srz_data = self.serializer_class(queryset, many=True)
-        return Response(srz_data.data)
+    queryset = optimize_queryset(AddressSerializer)
+    pagination_class = CreatedAtCursorPagination
 
 
 @extend_schema(tags=["Addresses"])
@@ -182,8 +211,9 @@ class AddressCreate(APIView):
     permission_classes = [IsAuthenticated]
     serializer_class = AddressSerializer
 
+    @idempotent
     def post(self, request):
-        current_user = get_current_user_from_token(request)
+        current_user = request.user
         srz_data = self.serializer_class(data=request.data)
         if srz_data.is_valid():
             srz_data.save(user=current_user)
@@ -232,31 +262,88 @@ class AddressDelete(APIView):
 @extend_schema(tags=["Countries"])
 class CountryList(APIView):
     """
-    country list
+    country list (cached, answers 304 when If-None-Match matches)
     """
 
     permission_classes = [IsAuthenticated]
     serializer_class = CountrySerializer
 
     def get(self, request):
-        queryset = Country.objects.all()
-        srz_data = self.serializer_class(queryset, many=True)
-        return Response(srz_data.data)
+        geo = get_geo()
+        return geo_response(request, geo, geo.countries_body)
 
 
-@extend_schema(tags=["Cities"])
+@extend_schema(
+    tags=["Cities"],
+    parameters=[
+        OpenApiParameter(
+            name="country",
+            type=OpenApiTypes.INT,
+            location=OpenApiParameter.QUERY,
+            description="cities of one country",
+        ),
+        OpenApiParameter(
+            name="q",
+            type=OpenApiTypes.STR,
+            location=OpenApiParameter.QUERY,
+            description="city name prefix, case insensitive",
+        ),
+        OpenApiParameter(
+            name="limit",
+            type=OpenApiTypes.INT,
+            location=OpenApiParameter.QUERY,
+            description=f"at most this many cities (default {CITY_SEARCH_LIMIT})",
+        ),
+    ],
+)
 class CityList(APIView):
     """
-    city list
+    city list by name (cached, answers 304 when If-None-Match matches),
+    ?country and ?q search it by name prefix
     """
 
     permission_classes = [IsAuthenticated]
     serializer_class = CitySerializer
 
     def get(self, request):
-        queryset = City.objects.all()
-        srz_data = self.serializer_class(queryset, many=True)
-        return Response(srz_data.data)
+        params = CitySearchSerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        geo = get_geo()
+        if not params.validated_data:
+            return geo_response(request, geo, geo.cities_body)
+        cities = geo.search(
+            params.validated_data.get("q", ""),
+            country=params.validated_data.get("country"),
+            limit=params.validated_data.get("limit", CITY_SEARCH_LIMIT),
+        )
+        return geo_response(request, geo, geo.render(cities))
+
+
+@extend_schema(tags=["Cities"])
+class GeoSnapshot(APIView):
+    """
+    every country with its cities and the snapshot version, for clients
+    that keep the whole table (cached, 304 when If-None-Match matches)
+    """
+
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        geo = get_geo()
+        return geo_response(request, geo, geo.snapshot_body)
+
+
+def geo_response(request, geo, body):
+    """
+    json body tagged with the snapshot version, 304 when If-None-Match matches
+    """
+    if_none_match = parse_etags(request.headers.get("If-None-Match", ""))
+    if geo.etag in if_none_match or "*" in if_none_match:
+        response = HttpResponseNotModified()
+    else:
+        response = HttpResponse(body, content_type="application/json")
+    response["ETag"] = geo.etag
+    return response
 
 
 @extend_schema(tags=["ChangePassword"])
@@ -276,37 +363,3 @@ class ChangePasswordView(generics.GenericAPIView):
             serializer.save()
             return Response({"message": "your password changed!!"}, status=200)
         return Response(serializer.errors, status=400)
-
-
-"""for getting user ID in heather of token"""
-
-
-def get_current_user_from_token(request):
-    #get token from header
-    auth_header = request.headers.get("Authorization")
-
-    if not auth_header or not auth_header.startswith("Bearer "):
-        raise AuthenticationFailed("token is invalid or format is wrong")
-
-    token = auth_header.split(" ")[1]
-
-    try:
-        # decoding codes with secret_key
-        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=["HS256"])
-        user_id = payload.get("user_id")
-
-        if user_id is None:
-            raise AuthenticationFailed("token is not valid.")
-
-        try:
-            user = User.objects.get(id=user_id)
-            return user
-
-        except User.DoesNotExist:
-            raise AuthenticationFailed("user is not exist.")
-
-    except jwt.ExpiredSignatureError:
-        raise AuthenticationFailed("token is expired.")
-
-    except jwt.InvalidTokenError:
-        raise AuthenticationFailed("token is invalid.")
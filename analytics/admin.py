@@ -0,0 +1,13 @@
+from django.contrib import admin
+from .models import CategoryDailySales, ProductDailySales, RollupWatermark, ShopDailySales
+
+
+@admin.register(ShopDailySales)
+class ShopDailySalesAdmin(admin.ModelAdmin):
+    list_display = ("day", "shop", "order_count", "revenue")
+    list_filter = ("day",)
+
+
+admin.site.register(ProductDailySales)
+admin.site.register(CategoryDailySales)
+admin.site.register(RollupWatermark)
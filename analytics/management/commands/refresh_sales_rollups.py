@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from analytics.rollup import refresh_sales_rollups
+
+
+class Command(BaseCommand):
+    help = (
+        "rebuild the sales rollups of days with orders changed since the last "
+        "refresh, or of every day with --full (first load, deleted orders)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--full", action="store_true")
+
+    def handle(self, *args, **options):
+        # the watermark stays settings.SALES_ROLLUP_LAG behind now
+        days = refresh_sales_rollups(full=options["full"])
+        self.stdout.write(self.style.SUCCESS(f"rebuilt {len(days)} days"))
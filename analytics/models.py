@@ -0,0 +1,82 @@
+from django.db import models
+
+from catalog.models import Category, Product, Shop
+
+# rollups of orders_order / orders_orderitem, one row per day and key.
+# written only by analytics.rollup, reports never read the order tables
+
+
+class ShopDailySales(models.Model):
+    day = models.DateField()
+    shop = models.ForeignKey(Shop, on_delete=models.CASCADE, related_name="daily_sales")
+    order_count = models.PositiveIntegerField(default=0)
+    item_count = models.PositiveIntegerField(default=0)
+    # subtotal before coupons, discount and what was actually paid
+    gross = models.DecimalField(decimal_places=2, max_digits=14, default=0)
+    discount = models.DecimalField(decimal_places=2, max_digits=14, default=0)
+    revenue = models.DecimalField(decimal_places=2, max_digits=14, default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["shop", "day"], name="shop_daily_sales_unique")
+        ]
+        indexes = [models.Index(fields=["day"], name="shop_daily_sales_day_idx")]
+
+    def __str__(self):
+        return f"{self.shop_id} on {self.day}: {self.revenue}"
+
+
+class ProductDailySales(models.Model):
+    day = models.DateField()
+    product = models.ForeignKey(
+        Product, on_delete=models.CASCADE, related_name="daily_sales"
+    )
+    # copied from the product so seller reports need no join
+    shop = models.ForeignKey(Shop, on_delete=models.CASCADE, related_name="+")
+    units = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(decimal_places=2, max_digits=14, default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["product", "day"], name="product_daily_sales_unique"
+            )
+        ]
+        indexes = [
+            models.Index(fields=["shop", "day"], name="product_daily_sales_shop_idx")
+        ]
+
+    def __str__(self):
+        return f"{self.product_id} on {self.day}: {self.units}"
+
+
+class CategoryDailySales(models.Model):
+    day = models.DateField()
+    category = models.ForeignKey(
+        Category, on_delete=models.CASCADE, related_name="daily_sales"
+    )
+    units = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(decimal_places=2, max_digits=14, default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["category", "day"], name="category_daily_sales_unique"
+            )
+        ]
+        indexes = [models.Index(fields=["day"], name="category_daily_sales_day_idx")]
+
+    def __str__(self):
+        return f"{self.category_id} on {self.day}: {self.revenue}"
+
+
+class RollupWatermark(models.Model):
+    """
+    orders updated up to `value` are already in the rollups
+    """
+
+    name = models.CharField(max_length=50, primary_key=True)
+    value = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.name}: {self.value}"
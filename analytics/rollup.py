@@ -0,0 +1,113 @@
+"""
+incremental refresh of the sales rollups.
+
+orders changed since the watermark (Order.updated_at) tell which days are
+stale; each of those days is rebuilt from its own orders only (a day is
+deleted and inserted again), so a refresh costs the size of the changed
+days and not of the whole order history. cancelled orders are not sales,
+orders deleted outright leave nothing behind and need a full refresh.
+order items have no updated_at, changing one has to move the updated_at of
+its order (orders.models.touch_orders).
+
+the watermark stops SALES_ROLLUP_LAG behind now: a transaction that is
+still open can commit an order with an older updated_at, the lag gives it
+time to land before the watermark passes it.
+"""
+
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Sum
+from django.utils import timezone
+
+from orders.models import Order, OrderItem
+
+from .models import CategoryDailySales, ProductDailySales, RollupWatermark, ShopDailySales
+
+WATERMARK = "sales"
+
+
+def _day_range(day):
+    start = timezone.make_aware(datetime.combine(day, time.min))
+    return start, start + timedelta(days=1)
+
+
+def rebuild_day(day):
+    """
+    replace the rollup rows of one day with fresh aggregates of its orders
+    """
+    start, end = _day_range(day)
+    orders = Order.objects.filter(created_at__gte=start, created_at__lt=end).exclude(
+        status="CANCELLED"
+    )
+    items = OrderItem.objects.filter(order__in=orders).order_by()
+
+    shops = orders.order_by().values("shop").annotate(
+        order_count=Count("id"),
+        item_count=Sum("item_count"),
+        gross=Sum("subtotal"),
+        discount=Sum("discount_amount"),
+        revenue=Sum("total_price"),
+    )
+    products = items.values("product", "product__shop").annotate(
+        units=Sum("count"), revenue=Sum("row_price")
+    )
+    categories = items.values("product__category").annotate(
+        units=Sum("count"), revenue=Sum("row_price")
+    )
+
+    for model in (ShopDailySales, ProductDailySales, CategoryDailySales):
+        model.objects.filter(day=day).delete()
+
+    ShopDailySales.objects.bulk_create(
+        ShopDailySales(day=day, shop_id=row.pop("shop"), **row) for row in shops
+    )
+    ProductDailySales.objects.bulk_create(
+        ProductDailySales(
+            day=day,
+            product_id=row["product"],
+            shop_id=row["product__shop"],
+            units=row["units"],
+            revenue=row["revenue"],
+        )
+        for row in products
+    )
+    CategoryDailySales.objects.bulk_create(
+        CategoryDailySales(
+            day=day,
+            category_id=row["product__category"],
+            units=row["units"],
+            revenue=row["revenue"],
+        )
+        for row in categories
+    )
+
+
+def refresh_sales_rollups(until=None, full=False):
+    """
+    rebuild every day with an order updated after the watermark (every day
+    with `full`), then move the watermark to `until`. returns the days
+    """
+    if until is None:
+        until = timezone.now() - settings.SALES_ROLLUP_LAG
+
+    with transaction.atomic():
+        RollupWatermark.objects.get_or_create(name=WATERMARK)
+        # one refresh at a time
+        watermark = RollupWatermark.objects.select_for_update().get(name=WATERMARK)
+
+        changed = Order.objects.filter(updated_at__lte=until)
+        if watermark.value is not None and not full:
+            changed = changed.filter(updated_at__gt=watermark.value)
+        days = list(changed.dates("created_at", "day"))
+        if full:
+            # days whose orders are all gone
+            days = sorted(set(days) | set(ShopDailySales.objects.dates("day", "day")))
+
+        for day in days:
+            rebuild_day(day)
+
+        watermark.value = until
+        watermark.save()
+    return days
@@ -0,0 +1,23 @@
+from datetime import timedelta
+
+from django.utils import timezone
+from rest_framework import serializers
+
+
+class ReportParamsSerializer(serializers.Serializer):
+    """
+    query string of a report: ?start=YYYY-MM-DD&end=YYYY-MM-DD (the last
+    30 days by default), ?limit for top lists and ?category
+    """
+
+    start = serializers.DateField(required=False)
+    end = serializers.DateField(required=False)
+    limit = serializers.IntegerField(required=False, min_value=1, max_value=100, default=10)
+    category = serializers.IntegerField(required=False, min_value=1)
+
+    def validate(self, attrs):
+        attrs.setdefault("end", timezone.localdate())
+        attrs.setdefault("start", attrs["end"] - timedelta(days=29))
+        if attrs["start"] > attrs["end"]:
+            raise serializers.ValidationError("start is after end")
+        return attrs
@@ -0,0 +1,11 @@
+from celery import shared_task
+
+from .rollup import refresh_sales_rollups
+
+
+@shared_task
+def refresh_sales():
+    """
+    bring the sales rollups up to date (celery beat)
+    """
+    return len(refresh_sales_rollups())
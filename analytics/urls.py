@@ -0,0 +1,20 @@
+from django.urls import path
+from .views import (
+    SalesReport,
+    ShopSalesReport,
+    ShopProductsReport,
+    CategorySalesReport,
+)
+
+app_name = "analytics"
+
+urlpatterns = [
+    path("sales", SalesReport.as_view(), name="sales"),
+    path("shops/<int:shop_id>/sales", ShopSalesReport.as_view(), name="shop-sales"),
+    path(
+        "shops/<int:shop_id>/products",
+        ShopProductsReport.as_view(),
+        name="shop-products",
+    ),
+    path("categories", CategorySalesReport.as_view(), name="category-sales"),
+]
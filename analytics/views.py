@@ -0,0 +1,159 @@
+from django.db.models import Sum
+from django.shortcuts import get_object_or_404
+from drf_spectacular.utils import extend_schema
+from rest_framework import status
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from catalog.models import Category, Shop
+from core.permissions import IsOwnerOrAdmin, OwnerPath
+from .models import CategoryDailySales, ProductDailySales, ShopDailySales
+from .serializers import ReportParamsSerializer
+
+# every report reads the rollup tables only (analytics.rollup), never the orders
+
+SHOP_TOTALS = {
+    "order_count": Sum("order_count"),
+    "item_count": Sum("item_count"),
+    "gross": Sum("gross"),
+    "discount": Sum("discount"),
+    "revenue": Sum("revenue"),
+}
+
+
+class ReportView(APIView):
+    """
+    base of the reports: parses the query string
+    """
+
+    def get(self, request, **kwargs):
+        params = ReportParamsSerializer(data=request.query_params)
+        if not params.is_valid():
+            return Response(params.errors, status=status.HTTP_400_BAD_REQUEST)
+        return Response(self.report(request, params.validated_data, **kwargs))
+
+    def in_range(self, queryset, params):
+        return queryset.filter(day__gte=params["start"], day__lte=params["end"])
+
+
+@extend_schema(tags=["analytics"])
+class SalesReport(ReportView):
+    """
+    sales of all shops per day
+    """
+
+    permission_classes = [IsAdminUser]
+
+    def report(self, request, params):
+        days = (
+            self.in_range(ShopDailySales.objects.all(), params)
+            .values("day")
+            .annotate(**SHOP_TOTALS)
+            .order_by("day")
+        )
+        return {"start": params["start"], "end": params["end"], "days": list(days)}
+
+
+@extend_schema(tags=["analytics"])
+class ShopSalesReport(ReportView):
+    """
+    sales of one shop per day, for its owner
+    """
+
+    permission_classes = [IsAuthenticated, IsOwnerOrAdmin]
+    owner_path = OwnerPath("owner")
+
+    def report(self, request, params, shop_id):
+        shop = get_object_or_404(Shop, pk=shop_id)
+        self.check_object_permissions(request, shop)
+
+        rows = self.in_range(ShopDailySales.objects.filter(shop=shop), params)
+        days = rows.values(
+            "day", "order_count", "item_count", "gross", "discount", "revenue"
+        ).order_by("day")
+        return {
+            "shop": shop.id,
+            "start": params["start"],
+            "end": params["end"],
+            "total": rows.aggregate(**SHOP_TOTALS),
+            "days": list(days),
+        }
+
+
+@extend_schema(tags=["analytics"])
+class ShopProductsReport(ReportView):
+    """
+    best selling products of one shop, for its owner
+    """
+
+    permission_classes = [IsAuthenticated, IsOwnerOrAdmin]
+    owner_path = OwnerPath("owner")
+
+    def report(self, request, params, shop_id):
+        shop = get_object_or_404(Shop, pk=shop_id)
+        self.check_object_permissions(request, shop)
+
+        products = (
+            self.in_range(ProductDailySales.objects.filter(shop=shop), params)
+            .values("product", "product__name")
+            .annotate(units=Sum("units"), revenue=Sum("revenue"))
+            .order_by("-revenue", "product")[: params["limit"]]
+        )
+        return {
+            "shop": shop.id,
+            "start": params["start"],
+            "end": params["end"],
+            "products": [
+                {
+                    "product": row["product"],
+                    "name": row["product__name"],
+                    "units": row["units"],
+                    "revenue": row["revenue"],
+                }
+                for row in products
+            ],
+        }
+
+
+@extend_schema(tags=["analytics"])
+class CategorySalesReport(ReportView):
+    """
+    sales per category, ?category=<id> for one category with its subtree
+    """
+
+    permission_classes = [IsAdminUser]
+
+    def report(self, request, params):
+        rows = self.in_range(CategoryDailySales.objects.all(), params)
+
+        if "category" in params:
+            category = get_object_or_404(Category, pk=params["category"])
+            total = rows.filter(category__path__startswith=category.path).aggregate(
+                units=Sum("units"), revenue=Sum("revenue")
+            )
+            return {
+                "category": category.id,
+                "start": params["start"],
+                "end": params["end"],
+                **total,
+            }
+
+        categories = (
+            rows.values("category", "category__name")
+            .annotate(units=Sum("units"), revenue=Sum("revenue"))
+            .order_by("-revenue", "category")
+        )
+        return {
+            "start": params["start"],
+            "end": params["end"],
+            "categories": [
+                {
+                    "category": row["category"],
+                    "name": row["category__name"],
+                    "units": row["units"],
+                    "revenue": row["revenue"],
+                }
+                for row in categories
+            ],
+        }
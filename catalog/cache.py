@@ -0,0 +1,180 @@
+"""
+read-through cache of rendered products for ProductDetail.
+
+every cached entry keeps the versions of the rows it was built from
+(product, shop, category, parent category, shop address, its city and user,
+shop owner). when one of those rows changes its version key is dropped
+(catalog/signals.py), so the entry does not match any more and is rebuilt
+on the next read.
+"""
+
+import hashlib
+import json
+import uuid
+
+from django.core.cache import cache
+from django.db import transaction
+from django.http import Http404
+from django.shortcuts import get_object_or_404
+
+from core.prefetch import optimize_queryset
+from .models import Category, Product
+from .serializers import ProductSerializer
+
+PRODUCT_CACHE_TIMEOUT = 60 * 15
+
+# change this when ProductSerializer output changes shape
+PRODUCT_CACHE_SCHEMA = 3
+
+HITS_KEY = "catalog:product_cache:hits"
+MISSES_KEY = "catalog:product_cache:misses"
+
+
+def version_key(kind, pk):
+    return f"catalog:version:{kind}:{pk}"
+
+
+def product_cache_key(pk):
+    return f"catalog:product:v{PRODUCT_CACHE_SCHEMA}:{pk}"
+
+
+# (kind, path from Product) of every row a cached product is built from
+DEPENDENCIES = [
+    ("product", "id"),
+    ("shop", "shop_id"),
+    ("category", "category_id"),
+    ("category", "category__parent_id"),
+    ("address", "shop__address_id"),
+    ("city", "shop__address__city_id"),
+    ("user", "shop__address__user_id"),
+    ("user", "shop__owner_id"),
+]
+
+
+def _dependency_ids(product):
+    ids = []
+    for _, path in DEPENDENCIES:
+        value = product
+        for name in path.split("__"):
+            value = getattr(value, name)
+        ids.append(value)
+    return tuple(ids)
+
+
+def _dependencies(ids):
+    return [
+        version_key(kind, pk)
+        for (kind, _), pk in zip(DEPENDENCIES, ids)
+        if pk is not None
+    ]
+
+
+def _current_versions(keys):
+    versions = cache.get_many(keys)
+    missing = {key: uuid.uuid4().hex for key in keys if key not in versions}
+    if missing:
+        cache.set_many(missing, None)
+        versions.update(missing)
+    return versions
+
+
+def _count(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, 1, None)
+
+
+def get_product_data(pk):
+    """
+    rendered ProductSerializer data of product pk (404 if it does not exist)
+    """
+    entry = cache.get(product_cache_key(pk))
+    if entry is not None and cache.get_many(list(entry["versions"])) == entry["versions"]:
+        _count(HITS_KEY)
+        return entry["data"]
+
+    _count(MISSES_KEY)
+    # versions are read before the product row, a change committed after
+    # that drops a version read here and only causes a miss next time
+    ids = (
+        Product.objects.filter(pk=pk)
+        .values_list(*[path for _, path in DEPENDENCIES])
+        .first()
+    )
+    if ids is None:
+        raise Http404
+    versions = _current_versions(_dependencies(ids))
+    product = get_object_or_404(optimize_queryset(ProductSerializer), pk=pk)
+    data = ProductSerializer(product).data
+    # moved to another shop or category in between, versions are of the old rows
+    if _dependency_ids(product) == ids:
+        cache.set(
+            product_cache_key(pk),
+            {"versions": versions, "data": data},
+            PRODUCT_CACHE_TIMEOUT,
+        )
+    return data
+
+
+def invalidate(kind, pk):
+    """
+    drop the version of one row, now and again after commit
+    (so a read during the transaction cant keep the old data)
+    """
+    key = version_key(kind, pk)
+    cache.delete(key)
+    transaction.on_commit(lambda: cache.delete(key))
+
+
+def invalidate_many(kind, pks):
+    """
+    same as invalidate() for many rows (bulk_update does not send signals)
+    """
+    keys = [version_key(kind, pk) for pk in pks]
+    cache.delete_many(keys)
+    transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+def get_cache_stats():
+    stats = cache.get_many([HITS_KEY, MISSES_KEY])
+    return {"hits": stats.get(HITS_KEY, 0), "misses": stats.get(MISSES_KEY, 0)}
+
+
+CATEGORY_TREE_KEY = "catalog:category_tree"
+
+
+def build_category_tree():
+    """
+    nested tree of active categories from one query
+    """
+    nodes = {}
+    roots = []
+    # parents come before children when ordered by depth
+    for pk, name, parent_id in Category.objects.filter(is_active=True).order_by(
+        "depth", "name", "id"
+    ).values_list("id", "name", "parent_id"):
+        node = nodes[pk] = {"id": pk, "name": name, "children": []}
+        if parent_id is None:
+            roots.append(node)
+        elif parent_id in nodes:
+            nodes[parent_id]["children"].append(node)
+    return roots
+
+
+def get_category_tree():
+    """
+    (etag, json body) of the category tree, rendered once and kept until
+    a category is created, updated or deleted
+    """
+    entry = cache.get(CATEGORY_TREE_KEY)
+    if entry is None:
+        body = json.dumps(build_category_tree(), ensure_ascii=False).encode()
+        entry = ('"%s"' % hashlib.sha256(body).hexdigest(), body)
+        cache.set(CATEGORY_TREE_KEY, entry, None)
+    return entry
+
+
+def invalidate_category_tree():
+    cache.delete(CATEGORY_TREE_KEY)
+    transaction.on_commit(lambda: cache.delete(CATEGORY_TREE_KEY))
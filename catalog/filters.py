@@ -0,0 +1,54 @@
+import django_filters
+from django.db.models import F
+from rest_framework.filters import OrderingFilter
+
+from .models import Category, Product
+
+
+class ProductFilter(django_filters.FilterSet):
+    # all products under a category, subcategories included
+    category_tree = django_filters.NumberFilter(method="filter_category_tree")
+
+    class Meta:
+        model = Product
+        fields = ["category", "is_active", "created_at", "updated_at"]
+
+    def filter_category_tree(self, queryset, name, value):
+        path = (
+            Category.objects.filter(pk=value).values_list("path", flat=True).first()
+        )
+        if path is None:
+            return queryset.none()
+        return queryset.filter(category__path__startswith=path)
+
+
+class ProductOrderingFilter(OrderingFilter):
+    """
+    ordering by rating uses the copy of the stats on the product (indexed,
+    no join), products with no rate come last in both directions. -id ends
+    every ordering so equal values keep their order between pages
+    """
+
+    rating_fields = {"rating_avg", "rating_count"}
+
+    def filter_queryset(self, request, queryset, view):
+        ordering = self.get_ordering(request, queryset, view)
+        if not ordering:
+            return queryset
+
+        expressions = []
+        for term in ordering:
+            field = term.lstrip("-")
+            if field not in self.rating_fields:
+                expressions.append(term)
+            elif term.startswith("-"):
+                expressions.append(F(field).desc(nulls_last=True))
+            else:
+                expressions.append(F(field).asc(nulls_last=True))
+        if not {"id", "-id"} & set(ordering):
+            expressions.append("-id")
+        return queryset.order_by(*expressions)
+
+    def remove_invalid_fields(self, queryset, fields, view, request):
+        valid = set(view.ordering_fields) | self.rating_fields
+        return [term for term in fields if term.lstrip("-") in valid]
@@ -0,0 +1,156 @@
+import csv
+import json
+import os
+import time
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from catalog.models import (
+    Category,
+    ImportCheckpoint,
+    Product,
+    Shop,
+    update_search_vector,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "import products from a csv or jsonl file in chunks. "
+        "columns: shop, category, name, description, price, image_url (optional). "
+        "it can be run again after a crash and continues from the checkpoint"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path")
+        parser.add_argument("--format", choices=["csv", "jsonl"])
+        parser.add_argument("--chunk-size", type=int, default=1000)
+        parser.add_argument(
+            "--checkpoint",
+            help="name of the checkpoint of the import (default: absolute path)",
+        )
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        if not os.path.exists(path):
+            raise CommandError(f"{path} does not exist")
+        file_format = options["format"] or (
+            "csv" if path.endswith(".csv") else "jsonl"
+        )
+        chunk_size = options["chunk_size"]
+        checkpoint = options["checkpoint"] or os.path.abspath(path)
+
+        # only ids are kept in memory, not model objects
+        self.shop_ids = set(Shop.objects.values_list("id", flat=True))
+        self.category_ids = set(Category.objects.values_list("id", flat=True))
+
+        done = self.read_checkpoint(checkpoint)
+        if done:
+            self.stdout.write(f"resuming after row {done}")
+
+        started = time.monotonic()
+        imported = skipped = 0
+        chunk = []
+        row_number = 0
+        with open(path, newline="", encoding="utf-8") as file:
+            for row_number, row in enumerate(self.read_rows(file, file_format), 1):
+                if row_number <= done:
+                    continue
+                product = self.build_product(row_number, row)
+                if product is None:
+                    skipped += 1
+                else:
+                    chunk.append(product)
+
+                if len(chunk) >= chunk_size:
+                    imported += self.save_chunk(chunk, checkpoint, row_number)
+                    chunk = []
+                    self.report(imported, started)
+
+        imported += self.save_chunk(chunk, checkpoint, row_number)
+        self.report(imported, started)
+        ImportCheckpoint.objects.filter(name=checkpoint).delete()
+        self.stdout.write(
+            self.style.SUCCESS(f"imported {imported} products, skipped {skipped} rows")
+        )
+
+    def read_rows(self, file, file_format):
+        if file_format == "csv":
+            yield from csv.DictReader(file)
+            return
+        for line in file:
+            line = line.strip()
+            if line:
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    yield None
+
+    def build_product(self, row_number, row):
+        try:
+            shop_id = int(row["shop"])
+            category_id = int(row["category"])
+            values = {
+                "name": row["name"],
+                "description": row.get("description") or "",
+                "price": row["price"],
+                "image_url": row.get("image_url") or None,
+            }
+        except (KeyError, TypeError, ValueError, AttributeError):
+            self.stderr.write(f"row {row_number}: invalid row")
+            return None
+
+        if shop_id not in self.shop_ids:
+            self.stderr.write(f"row {row_number}: shop {shop_id} does not exist")
+            return None
+        if category_id not in self.category_ids:
+            self.stderr.write(
+                f"row {row_number}: category {category_id} does not exist"
+            )
+            return None
+
+        # checked like the model field (max_length, max_digits, NaN...) so a
+        # bad value is skipped here instead of failing the whole chunk
+        for field in ["name", "price", "image_url"]:
+            try:
+                values[field] = Product._meta.get_field(field).clean(
+                    values[field], None
+                )
+            except ValidationError as error:
+                self.stderr.write(
+                    f"row {row_number}: invalid {field} ({' '.join(error.messages)})"
+                )
+                return None
+        if values["price"] < 0:
+            self.stderr.write(f"row {row_number}: invalid price (negative)")
+            return None
+
+        return Product(shop_id=shop_id, category_id=category_id, **values)
+
+    def save_chunk(self, chunk, checkpoint, row_number):
+        # products and checkpoint are committed together, a resumed run
+        # never inserts a chunk twice
+        with transaction.atomic():
+            if chunk:
+                products = Product.objects.bulk_create(chunk)
+                update_search_vector(
+                    Product.objects.filter(pk__in=[product.pk for product in products])
+                )
+            ImportCheckpoint.objects.update_or_create(
+                name=checkpoint, defaults={"rows": row_number}
+            )
+        return len(chunk)
+
+    def read_checkpoint(self, checkpoint):
+        return (
+            ImportCheckpoint.objects.filter(name=checkpoint)
+            .values_list("rows", flat=True)
+            .first()
+            or 0
+        )
+
+    def report(self, imported, started):
+        elapsed = time.monotonic() - started
+        rate = imported / elapsed if elapsed else 0
+        self.stdout.write(f"{imported} products, {rate:.0f} rows/s")
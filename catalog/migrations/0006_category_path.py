@@ -0,0 +1,43 @@
+# Generated by Django 4.2 on 2026-10-18 19:25
+
+from django.db import migrations, models
+
+
+def fill_category_path(apps, schema_editor):
+    # walk the existing tree level by level from the roots
+    Category = apps.get_model("catalog", "Category")
+    level = list(Category.objects.filter(parent=None))
+    paths = {}
+    depth = 0
+    while level:
+        for category in level:
+            parent_path = paths.get(category.parent_id, "/")
+            category.path = f"{parent_path}{category.pk}/"
+            category.depth = depth
+            paths[category.pk] = category.path
+        Category.objects.bulk_update(level, ["path", "depth"])
+        level = list(Category.objects.filter(parent__in=[c.pk for c in level]))
+        depth += 1
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("catalog", "0005_wishlist_is_active"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="category",
+            name="depth",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name="category",
+            name="path",
+            field=models.CharField(
+                db_index=True, default="", editable=False, max_length=255
+            ),
+        ),
+        migrations.RunPython(fill_category_path, migrations.RunPython.noop),
+    ]
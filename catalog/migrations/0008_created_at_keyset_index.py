@@ -0,0 +1,23 @@
+# Generated by Django 4.2 on 2026-10-18 19:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("catalog", "0007_product_search_vector"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="product",
+            index=models.Index(
+                fields=["-created_at", "-id"], name="product_created_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="shop",
+            index=models.Index(fields=["-created_at", "-id"], name="shop_created_idx"),
+        ),
+    ]
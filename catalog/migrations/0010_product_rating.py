@@ -0,0 +1,75 @@
+# Generated by Django 4.2 on 2026-10-18 23:05
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+INDEXES = [
+    models.Index(
+        models.OrderBy(models.F("rating_avg"), descending=True, nulls_last=True),
+        models.OrderBy(models.F("id"), descending=True),
+        name="product_top_rated_idx",
+    ),
+    models.Index(
+        models.OrderBy(models.F("rating_count"), descending=True, nulls_last=True),
+        models.OrderBy(models.F("id"), descending=True),
+        name="product_most_rated_idx",
+    ),
+]
+
+
+def add_indexes(apps, schema_editor):
+    # sqlite cant build an index with NULLS LAST
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    Product = apps.get_model("catalog", "Product")
+    for index in INDEXES:
+        schema_editor.add_index(Product, index)
+
+
+def remove_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    Product = apps.get_model("catalog", "Product")
+    for index in INDEXES:
+        schema_editor.remove_index(Product, index)
+
+
+def copy_ratings(apps, schema_editor):
+    Product = apps.get_model("catalog", "Product")
+    ProductRating = apps.get_model("interactions", "ProductRating")
+    stats = ProductRating.objects.filter(product=OuterRef("pk"), rating_count__gt=0)
+    Product.objects.filter(rating__isnull=False).update(
+        rating_count=Subquery(stats.values("rating_count")),
+        rating_avg=Subquery(stats.values("rating_avg")),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("catalog", "0009_product_stock"),
+        ("interactions", "0005_product_rating_avg_nulls_last"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="product",
+            name="rating_avg",
+            field=models.DecimalField(
+                blank=True, decimal_places=2, editable=False, max_digits=3, null=True
+            ),
+        ),
+        migrations.AddField(
+            model_name="product",
+            name="rating_count",
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AddIndex(model_name="product", index=index)
+                for index in INDEXES
+            ],
+            database_operations=[migrations.RunPython(add_indexes, remove_indexes)],
+        ),
+        migrations.RunPython(copy_ratings, migrations.RunPython.noop),
+    ]
@@ -1,4 +1,8 @@
-from django.db import models
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVector, SearchVectorField
+from django.db import connection, models
+from django.db.models import F, Value
+from django.db.models.functions import Concat, Substr
 from django.contrib.auth import get_user_model
 from accounts.models import Time
 
@@ -13,15 +17,60 @@ class Category(models.Model):
     )
 
     def __str__(self):
-        full_path = [self.name]
-        k = self.parent
-        while k is not None:
-            full_path.append(k.name)
-            k = k.parent
-        return " / ".join(full_path[::-1])
+        return " / ".join(category.name for category in self.breadcrumbs())
 
     is_active = models.BooleanField(default=True)
 
+    # materialized path of ids from root to this node, like "/1/4/9/"
+    # kept up to date in save() so subtree and breadcrumbs need no recursion
+    path = models.CharField(max_length=255, db_index=True, editable=False, default="")
+    depth = models.PositiveIntegerField(default=0, editable=False)
+
+    def save(self, *args, **kwargs):
+        old_path = self.path
+        super().save(*args, **kwargs)
+
+        parent_path = self.parent.path if self.parent_id else "/"
+        new_path = f"{parent_path}{self.pk}/"
+        if new_path != old_path:
+            depth = new_path.count("/") - 2
+            Category.objects.filter(pk=self.pk).update(path=new_path, depth=depth)
+
+            # moved: rewrite the path prefix of the whole subtree in one update
+            if old_path:
+                Category.objects.filter(path__startswith=old_path).exclude(
+                    pk=self.pk
+                ).update(
+                    path=Concat(
+                        Value(new_path), Substr("path", len(old_path) + 1)
+                    ),
+                    depth=F("depth") + (depth - self.depth),
+                )
+            self.path, self.depth = new_path, depth
+
+        # deactivating a category deactivates its subtree too
+        if not self.is_active:
+            self.get_descendants().filter(is_active=True).update(is_active=False)
+
+    def get_ancestor_ids(self):
+        return [int(pk) for pk in self.path.strip("/").split("/") if pk]
+
+    def get_descendants(self, include_self=False):
+        queryset = Category.objects.filter(path__startswith=self.path)
+        if not include_self:
+            queryset = queryset.exclude(pk=self.pk)
+        return queryset
+
+    def breadcrumbs(self):
+        """
+        list of categories from root to this one (one query)
+        """
+        if not self.path:
+            return [self]
+        return list(
+            Category.objects.filter(pk__in=self.get_ancestor_ids()).order_by("depth")
+        )
+
 
 class Shop(Time):
     STATUS_CHOICES = (
@@ -35,6 +84,10 @@ class Shop(Time):
     address = models.ForeignKey(Address, on_delete=models.CASCADE, related_name="shops")
     is_active = models.BooleanField(default=True)
 
+    class Meta:
+        # keyset pagination (core.pagination)
+        indexes = [models.Index(fields=["-created_at", "-id"], name="shop_created_idx")]
+
 
 class Product(Time):
     shop = models.ForeignKey(Shop, on_delete=models.CASCADE, related_name="products")
@@ -46,6 +99,53 @@ class Product(Time):
     price = models.DecimalField(decimal_places=2, max_digits=10)
     is_active = models.BooleanField(default=True)
     image_url = models.CharField(max_length=200, null=True, blank=True)
+    # units left to sell, None when stock is not tracked for the product
+    # (units held by pending orders are already taken out, see orders.stock)
+    stock = models.PositiveIntegerField(null=True, blank=True)
+    # copy of interactions.ProductRating (ProductRating.copy_to_products) so
+    # ProductList orders by rating without a join, NULL until the first rate
+    rating_avg = models.DecimalField(
+        max_digits=3, decimal_places=2, null=True, blank=True, editable=False
+    )
+    rating_count = models.PositiveIntegerField(null=True, blank=True, editable=False)
+
+    # full text index of name (weight A) and description (weight B), postgres only
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    class Meta:
+        indexes = [
+            GinIndex(fields=["search_vector"], name="product_search_idx"),
+            # keyset pagination (core.pagination)
+            models.Index(fields=["-created_at", "-id"], name="product_created_idx"),
+            # ?ordering=-rating_avg / -rating_count (catalog.filters), NULLS
+            # LAST like the ORDER BY. built on postgres only, see 0010
+            models.Index(
+                F("rating_avg").desc(nulls_last=True),
+                F("id").desc(),
+                name="product_top_rated_idx",
+            ),
+            models.Index(
+                F("rating_count").desc(nulls_last=True),
+                F("id").desc(),
+                name="product_most_rated_idx",
+            ),
+        ]
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        update_search_vector(Product.objects.filter(pk=self.pk))
+
+
+def update_search_vector(queryset):
+    """
+    rebuild search_vector for the products in queryset (does nothing out of postgres)
+    """
+    if connection.vendor != "postgresql":
+        return 0
+    return queryset.update(
+        search_vector=SearchVector("name", weight="A")
+        + SearchVector("description", weight="B")
+    )
 
 
 class Wishlist(Time):
@@ -61,3 +161,16 @@ class Wishlist(Time):
 
     def __str__(self):
         return f"{self.user.username} -> {self.product.name}"
+
+
+class ImportCheckpoint(Time):
+    """
+    rows of one file the import_products command has saved, written in the
+    transaction of every chunk so a crash cant keep one without the other
+    """
+
+    name = models.CharField(max_length=255, unique=True)
+    rows = models.PositiveBigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.name}: {self.rows} rows"
@@ -0,0 +1,28 @@
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db import connection
+from django.db.models import F
+from rest_framework.filters import SearchFilter
+
+
+class ProductSearchFilter(SearchFilter):
+    """
+    full text search on Product.search_vector, ranked (name before description).
+    out of postgres (like sqlite in tests) it falls back to the normal SearchFilter
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        if connection.vendor != "postgresql":
+            return super().filter_queryset(request, queryset, view)
+
+        terms = " ".join(self.get_search_terms(request))
+        if not terms:
+            return queryset
+
+        query = SearchQuery(terms, search_type="websearch")
+        queryset = queryset.filter(search_vector=query).annotate(
+            rank=SearchRank(F("search_vector"), query)
+        )
+        # explicit ?ordering= from OrderingFilter wins over rank
+        if request.query_params.get("ordering"):
+            return queryset
+        return queryset.order_by("-rank", "-id")
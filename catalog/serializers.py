@@ -7,10 +7,19 @@ from .models import Product, Category, Shop, Wishlist
 
 class CategorySerializer(serializers.ModelSerializer):
     # parent = serializers.SerializerMethodField()
+    # relations used in to_representation (for core.prefetch)
+    nested_relations = {"parent": None}
+
     class Meta:
         model = Category
         fields = ["id", "name", "parent"]
 
+    def validate_parent(self, value):
+        # a category cant be moved under itself or one of its children
+        if value and self.instance and self.instance.pk in value.get_ancestor_ids():
+            raise serializers.ValidationError("category cant be its own parent")
+        return value
+
     def to_representation(self, instance):
         rep = super().to_representation(instance)
 
@@ -28,6 +37,7 @@ class CategorySerializer(serializers.ModelSerializer):
 class ShopSerializer(serializers.ModelSerializer):
     owner = UserSerializer(read_only=True)
     address = serializers.PrimaryKeyRelatedField(queryset=Address.objects.all())
+    nested_relations = {"address": AddressSerializer}
 
     class Meta:
         model = Shop
@@ -45,6 +55,11 @@ class ShopSerializer(serializers.ModelSerializer):
 class ProductSerializer(serializers.ModelSerializer):
     shop = serializers.PrimaryKeyRelatedField(queryset=Shop.objects.all())
     category = serializers.PrimaryKeyRelatedField(queryset=Category.objects.all())
+    nested_relations = {
+        "shop": ShopSerializer,
+        "category": CategorySerializer,
+        "rating": None,
+    }
 
     class Meta:
         model = Product
@@ -57,18 +72,106 @@ class ProductSerializer(serializers.ModelSerializer):
             "shop",
             "is_active",
             "image_url",
+            "stock",
         ]
-        extra_kwargs = {"is_active": {"read_only": True}}
+        # stock only changes with the F() updates of orders.stock
+        extra_kwargs = {
+            "is_active": {"read_only": True},
+            "stock": {"read_only": True},
+        }
+
+    def update(self, instance, validated_data):
+        # the row is saved without stock, a reservation made since it was
+        # read is not written back over
+        for field, value in validated_data.items():
+            setattr(instance, field, value)
+        instance.save(update_fields=[*validated_data, "updated_at"])
+        return instance
 
     def to_representation(self, instance):
         rep = super().to_representation(instance)
         rep["shop"] = ShopSerializer(instance.shop).data
         rep["category"] = CategorySerializer(instance.category).data
+        rep["rating"] = self.get_rating(instance)
         return rep
 
+    def get_rating(self, instance):
+        # stats row is created with the first rate of the product
+        rating = getattr(instance, "rating", None)
+        if rating is None:
+            return {"avg": 0, "count": 0, "histogram": {i: 0 for i in range(1, 6)}}
+        return {
+            "avg": rating.rating_avg,
+            "count": rating.rating_count,
+            "histogram": rating.histogram(),
+        }
+
+
+class BulkPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    """
+    looks the object up in a {pk: object} map from the serializer context
+    (one in_bulk query for the whole batch) instead of one query per row.
+    without the map in context it works like PrimaryKeyRelatedField
+    """
+
+    def __init__(self, context_key, **kwargs):
+        self.context_key = context_key
+        super().__init__(**kwargs)
+
+    def to_internal_value(self, data):
+        objects = self.context.get(self.context_key)
+        if objects is None:
+            return super().to_internal_value(data)
+        try:
+            return objects[int(data)]
+        except KeyError:
+            self.fail("does_not_exist", pk_value=data)
+        except (TypeError, ValueError):
+            self.fail("incorrect_type", data_type=type(data).__name__)
+
+
+class ProductBulkSerializer(ProductSerializer):
+    """
+    one row of product/bulk-create and product/bulk-update
+    """
+
+    shop = BulkPrimaryKeyRelatedField("shops", queryset=Shop.objects.all())
+    category = BulkPrimaryKeyRelatedField("categories", queryset=Category.objects.all())
+
+    class Meta(ProductSerializer.Meta):
+        pass
+
+    @staticmethod
+    def build_context(rows, request):
+        """
+        load every shop and category of the batch with one query each
+        """
+
+        def ids(name):
+            values = set()
+            for row in rows:
+                try:
+                    values.add(int(row[name]))
+                except (KeyError, TypeError, ValueError):
+                    pass
+            return values
+
+        return {
+            "request": request,
+            "shops": Shop.objects.in_bulk(ids("shop")),
+            "categories": Category.objects.in_bulk(ids("category")),
+        }
+
+    def validate_shop(self, value):
+        user = self.context["request"].user
+        if not user.is_staff and value.owner_id != user.id:
+            raise serializers.ValidationError("this shop is not yours")
+        return value
+
 
 class WishListSerializer(serializers.ModelSerializer):
     product = serializers.PrimaryKeyRelatedField(queryset=Product.objects.all())
+    nested_relations = {"user": UserSerializer, "product": ProductSerializer}
 
     class Meta:
         model = Wishlist
@@ -0,0 +1,24 @@
+from django.db.models.signals import post_delete, post_save
+
+from accounts.models import Address, City, User
+from .cache import invalidate
+from .models import Category, Product, Shop
+
+# rows that are part of the cached product representation (catalog/cache.py)
+CACHED_MODELS = {
+    Product: "product",
+    Shop: "shop",
+    Category: "category",
+    Address: "address",
+    City: "city",
+    User: "user",
+}
+
+
+def invalidate_product_cache(sender, instance, **kwargs):
+    invalidate(CACHED_MODELS[sender], instance.pk)
+
+
+for model in CACHED_MODELS:
+    post_save.connect(invalidate_product_cache, sender=model)
+    post_delete.connect(invalidate_product_cache, sender=model)
@@ -2,8 +2,12 @@ from django.urls import path
 from .views import (
     ProductList,
     ProductDetail,
+    ProductCacheStats,
+    ProductExport,
     ProductCreate,
     ProductUpdate,
+    ProductBulkCreate,
+    ProductBulkUpdate,
     ProductDelete,
     ShopList,
     ShopDelete,
@@ -11,7 +15,9 @@ from .views import (
     ShopUpdate,
     ShopDetail,
     CategoryList,
+    CategoryTree,
     CategoryDetail,
+    CategoryBreadcrumbs,
     CategoryCreate,
     CategoryUpdate,
     CategoryDelete,
@@ -29,7 +35,13 @@ urlpatterns = [
     path("product", ProductList.as_view(), name="product-list"),
     path("product/<int:pk>", ProductDetail.as_view(), name="product-detail"),
     path("product/create", ProductCreate.as_view(), name="product-create"),
+    path("product/export", ProductExport.as_view(), name="product-export"),
+    path(
+        "product/cache-stats", ProductCacheStats.as_view(), name="product-cache-stats"
+    ),
     path("product/update/<int:pk>", ProductUpdate.as_view(), name="product-update"),
+    path("product/bulk-create", ProductBulkCreate.as_view(), name="product-bulk-create"),
+    path("product/bulk-update", ProductBulkUpdate.as_view(), name="product-bulk-update"),
     path("product/delete/<int:pk>", ProductDelete.as_view(), name="product-delete"),
 
     #this urls is for shop
@@ -41,7 +53,13 @@ urlpatterns = [
 
     #this url is for category
     path("category", CategoryList.as_view(), name="category-list"),
+    path("category/tree", CategoryTree.as_view(), name="category-tree"),
     path("category/<int:pk>", CategoryDetail.as_view(), name="category-detail"),
+    path(
+        "category/<int:pk>/breadcrumbs",
+        CategoryBreadcrumbs.as_view(),
+        name="category-breadcrumbs",
+    ),
     path("category/create", CategoryCreate.as_view(), name="category-create"),
     path("category/update/<int:pk>", CategoryUpdate.as_view(), name="category-update"),
     path("category/delete/<int:pk>", CategoryDelete.as_view(), name="category-delete"),
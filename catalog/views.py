@@ -1,17 +1,33 @@
+from django.http import HttpResponse, HttpResponseNotModified
 from django.shortcuts import get_object_or_404
+from django.db import transaction
+from django.utils import timezone
+from django.utils.http import parse_etags
 from rest_framework.permissions import IsAuthenticated, IsAdminUser
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework import status
-from .models import Category, Product, Shop, Wishlist
+from .models import Category, Product, Shop, Wishlist, update_search_vector
+from .cache import (
+    get_cache_stats,
+    get_category_tree,
+    get_product_data,
+    invalidate_category_tree,
+    invalidate_many,
+)
+from .filters import ProductFilter, ProductOrderingFilter
+from .search import ProductSearchFilter
 from .serializers import (
     CategorySerializer,
+    ProductBulkSerializer,
     ProductSerializer,
     ShopSerializer,
     WishListSerializer,
 )
-from accounts.views import get_current_user_from_token
 from core.permissions import *
+from core.export import export_response
+from core.pagination import OptionalCursorPagination
+from core.prefetch import optimize_queryset
 from rest_framework.generics import ListAPIView
 from drf_spectacular.utils import extend_schema
 from django_filters.rest_framework import DjangoFilterBackend
@@ -23,15 +39,16 @@ class ProductList(ListAPIView):
 
     serializer_class = ProductSerializer
     permission_classes = [IsAuthenticated]
-    queryset = Product.objects.all()
+    queryset = optimize_queryset(ProductSerializer)
+    pagination_class = OptionalCursorPagination
 
-    filter_backends = [DjangoFilterBackend, OrderingFilter, SearchFilter]
+    filter_backends = [DjangoFilterBackend, ProductOrderingFilter, ProductSearchFilter]
 
     search_fields = ["description", "name"]
 
     ordering_fields = ["created_at", "updated_at"]
 
-    filterset_fields = ["category", "is_active", "created_at", "updated_at"]
+    filterset_class = ProductFilter
 
 
 @extend_schema(tags=["products"])
@@ -44,9 +61,45 @@ class ProductDetail(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request, pk):
-        queryset = get_object_or_404(Product, pk=pk)
-        srz_data = self.serializer_class(queryset)
-        return Response(srz_data.data)
+        # served from cache, see catalog/cache.py
+        return Response(get_product_data(pk))
+
+
+@extend_schema(tags=["products"])
+class ProductExport(APIView):
+    """
+    stream all products as ndjson (or ?output=csv for gzip csv)
+    """
+
+    permission_classes = [IsAdminUser]
+    fields = [
+        "id",
+        "shop_id",
+        "category_id",
+        "name",
+        "description",
+        "price",
+        "is_active",
+        "image_url",
+        "stock",
+        "created_at",
+        "updated_at",
+    ]
+
+    def get(self, request):
+        return export_response(request, Product.objects.all(), self.fields, "products")
+
+
+@extend_schema(tags=["products"])
+class ProductCacheStats(APIView):
+    """
+    hit and miss counters of the product detail cache
+    """
+
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return Response(get_cache_stats())
 
 
 @extend_schema(tags=["products"])
@@ -66,6 +119,113 @@ class ProductCreate(APIView):
         return Response(srz_data.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
+# max rows in one bulk request
+PRODUCT_BULK_MAX_ROWS = 5000
+
+
+def _check_bulk_rows(rows):
+    if not isinstance(rows, list) or not rows:
+        return "expected a non empty list of products"
+    if len(rows) > PRODUCT_BULK_MAX_ROWS:
+        return f"no more than {PRODUCT_BULK_MAX_ROWS} products in one request"
+    return None
+
+
+@extend_schema(tags=["products"])
+class ProductBulkCreate(APIView):
+    """
+    create many products in one request (for seller catalog sync).
+    nothing is saved if one row is invalid, errors are returned per row
+    """
+
+    permission_classes = [IsSellerOrAdmin]
+    serializer_class = ProductBulkSerializer
+
+    def post(self, request):
+        rows = request.data
+        error = _check_bulk_rows(rows)
+        if error:
+            return Response({"detail": error}, status=status.HTTP_400_BAD_REQUEST)
+
+        context = self.serializer_class.build_context(rows, request)
+        products, errors = [], []
+        for row in rows:
+            srz_data = self.serializer_class(data=row, context=context)
+            if srz_data.is_valid():
+                products.append(Product(**srz_data.validated_data))
+                errors.append({})
+            else:
+                errors.append(srz_data.errors)
+
+        if any(errors):
+            return Response({"errors": errors}, status=status.HTTP_400_BAD_REQUEST)
+
+        with transaction.atomic():
+            products = Product.objects.bulk_create(products, batch_size=500)
+            ids = [product.id for product in products]
+            update_search_vector(Product.objects.filter(pk__in=ids))
+        return Response({"ids": ids}, status=status.HTTP_201_CREATED)
+
+
+@extend_schema(tags=["products"])
+class ProductBulkUpdate(APIView):
+    """
+    update many products in one request, every row needs the product "id".
+    nothing is saved if one row is invalid, errors are returned per row
+    """
+
+    permission_classes = [IsSellerOrAdmin]
+    serializer_class = ProductBulkSerializer
+
+    def put(self, request):
+        rows = request.data
+        error = _check_bulk_rows(rows)
+        if error:
+            return Response({"detail": error}, status=status.HTTP_400_BAD_REQUEST)
+
+        context = self.serializer_class.build_context(rows, request)
+        ids = [row.get("id") for row in rows if isinstance(row, dict)]
+        instances = Product.objects.select_related("shop").in_bulk(
+            [pk for pk in ids if isinstance(pk, int)]
+        )
+
+        products, fields, errors = [], {"updated_at"}, []
+        now = timezone.now()
+        for row in rows:
+            pk = row.get("id") if isinstance(row, dict) else None
+            product = instances.get(pk) if isinstance(pk, int) else None
+            if product is None:
+                errors.append({"id": ["product not found"]})
+                continue
+            if not request.user.is_staff and product.shop.owner_id != request.user.id:
+                errors.append({"id": ["this product is not yours"]})
+                continue
+
+            srz_data = self.serializer_class(
+                product, data=row, partial=True, context=context
+            )
+            if not srz_data.is_valid():
+                errors.append(srz_data.errors)
+                continue
+
+            for field, value in srz_data.validated_data.items():
+                setattr(product, field, value)
+            fields.update(srz_data.validated_data)
+            product.updated_at = now
+            products.append(product)
+            errors.append({})
+
+        if any(errors):
+            return Response({"errors": errors}, status=status.HTTP_400_BAD_REQUEST)
+
+        ids = [product.id for product in products]
+        with transaction.atomic():
+            Product.objects.bulk_update(products, sorted(fields), batch_size=500)
+            update_search_vector(Product.objects.filter(pk__in=ids))
+            invalidate_many("product", ids)
+        return Response({"ids": ids}, status=status.HTTP_200_OK)
+
+
 @extend_schema(tags=["products"])
 class ProductUpdate(APIView):
     """
@@ -98,7 +258,7 @@ class ProductDelete(APIView):
         product = get_object_or_404(Product, pk=pk)
         self.check_object_permissions(request, product)
         product.is_active = False
-        product.save()
+        product.save(update_fields=["is_active", "updated_at"])
         serializer = self.serializer_class(product)
         return Response(serializer.data, status=status.HTTP_200_OK)
 
@@ -111,7 +271,8 @@ class ShopList(ListAPIView):
 
     serializer_class = ShopSerializer
     permission_classes = [IsAuthenticated]
-    queryset = Shop.objects.all()
+    queryset = optimize_queryset(ShopSerializer)
+    pagination_class = OptionalCursorPagination
 
 
 @extend_schema(tags=["shops"])
@@ -124,7 +285,7 @@ class ShopDetail(APIView):
     serializer_class = ShopSerializer
 
     def get(self, request, pk):
-        shop = get_object_or_404(Shop, pk=pk)
+        shop = get_object_or_404(optimize_queryset(self.serializer_class), pk=pk)
         self.check_object_permissions(request, shop)
         srz_data = self.serializer_class(shop)
         return Response(srz_data.data)
@@ -141,7 +302,7 @@ class ShopCreate(APIView):
 
     def post(self, request):
         #using token from user to create shop(you can know who create)
-        current_user = get_current_user_from_token(request)
+        current_user = request.user
         self.check_object_permissions(request, request)
         srz_data = self.serializer_class(data=request.data)
         if srz_data.is_valid():
@@ -197,12 +358,31 @@ class CategoryList(APIView):
     serializer_class = CategorySerializer
 
     def get(self, request):
-        queryset = Category.objects.all()
+        queryset = optimize_queryset(self.serializer_class)
         self.check_object_permissions(request, queryset)
         srz_data = CategorySerializer(queryset, many=True)
         return Response(srz_data.data)
 
 
+@extend_schema(tags=["categories"])
+class CategoryTree(APIView):
+    """
+    whole category tree (cached, answers 304 when If-None-Match matches)
+    """
+
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        etag, body = get_category_tree()
+        if_none_match = parse_etags(request.headers.get("If-None-Match", ""))
+        if etag in if_none_match or "*" in if_none_match:
+            response = HttpResponseNotModified()
+        else:
+            response = HttpResponse(body, content_type="application/json")
+        response["ETag"] = etag
+        return response
+
+
 @extend_schema(tags=["categories"])
 class CategoryDetail(APIView):
     """
@@ -213,11 +393,26 @@ class CategoryDetail(APIView):
     serializer_class = CategorySerializer
 
     def get(self, request, pk):
-        category = get_object_or_404(Category, pk=pk)
+        category = get_object_or_404(optimize_queryset(self.serializer_class), pk=pk)
         srz_data = self.serializer_class(category)
         return Response(srz_data.data)
 
 
+@extend_schema(tags=["categories"])
+class CategoryBreadcrumbs(APIView):
+    """
+    path of a category from the root
+    """
+
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, pk):
+        category = get_object_or_404(Category, pk=pk)
+        return Response(
+            [{"id": item.id, "name": item.name} for item in category.breadcrumbs()]
+        )
+
+
 @extend_schema(tags=["categories"])
 class CategoryCreate(APIView):
     """
@@ -231,6 +426,7 @@ class CategoryCreate(APIView):
         srz_data = self.serializer_class(data=request.data)
         if srz_data.is_valid():
             srz_data.save()
+            invalidate_category_tree()
             return Response(srz_data.data, status=status.HTTP_201_CREATED)
         return Response(srz_data.errors, status=status.HTTP_400_BAD_REQUEST)
 
@@ -249,6 +445,7 @@ class CategoryUpdate(APIView):
         srz_data = self.serializer_class(queryset, data=request.data, partial=True)
         if srz_data.is_valid():
             srz_data.save()
+            invalidate_category_tree()
             return Response(srz_data.data, status=status.HTTP_200_OK)
         return Response(srz_data.errors, status=status.HTTP_400_BAD_REQUEST)
 
@@ -266,6 +463,7 @@ class CategoryDelete(APIView):
         category = get_object_or_404(Category, pk=pk)
         category.is_active = False
         category.save()
+        invalidate_category_tree()
         serializer = self.serializer_class(category)
         return Response(serializer.data, status=status.HTTP_200_OK)
 
@@ -273,14 +471,17 @@ class CategoryDelete(APIView):
 @extend_schema(tags=["wishlist"])
 class WishlistList(APIView):
     """
-    list all wishlist
+    list wishlists of the user (every wishlist for admins)
     """
 
-    permission_classes = [IsOwnerOrAdmin]
+    permission_classes = [IsAuthenticated]
     serializer_class = WishListSerializer
+    owner_path = OwnerPath("user")
 
     def get(self, request):
-        queryset = Wishlist.objects.all()
+        queryset = self.owner_path.scope(
+            optimize_queryset(self.serializer_class), request.user
+        )
         srz_data = self.serializer_class(queryset, many=True)
         return Response(srz_data.data)
 
@@ -295,7 +496,7 @@ class WishlistCreate(APIView):
     serializer_class = WishListSerializer
 
     def post(self, request):
-        current_user = get_current_user_from_token(request)
+        current_user = request.user
         queryset = self.serializer_class(data=request.data)
         self.check_object_permissions(request, queryset)
 
@@ -324,7 +525,7 @@ class WishListDetail(APIView):
     serializer_class = WishListSerializer
 
     def get(self, request, pk):
-        wishlist = get_object_or_404(Wishlist, pk=pk)
+        wishlist = get_object_or_404(optimize_queryset(self.serializer_class), pk=pk)
         srz_data = self.serializer_class(wishlist)
         return Response(srz_data.data)
 
@@ -337,6 +538,7 @@ class WishlistDelete(APIView):
 
     permission_classes = [IsOwnerOrAdmin]
     serializer_class = WishListSerializer
+    owner_path = OwnerPath("user")
 
     def delete(self, request, pk):
         wishlist = get_object_or_404(Wishlist, pk=pk)
@@ -0,0 +1,166 @@
+"""
+JWT authentication without a user query on every request.
+
+simplejwt decodes the token once per request and sets request.user, views
+read the user from there. the user row behind a token is cached twice:
+
+    per process  USER_LOCAL_TTL seconds, no network at all
+    redis        USER_CACHE_TIMEOUT seconds, shared by every worker
+
+saving or deleting a user drops both entries (accounts.signals), other
+processes see the change when their short local entry expires. the password
+hash is never cached: a cached user has it deferred (reading it queries the
+row) and only its md5, the value simplejwt puts into tokens, is kept for the
+revoke check.
+
+with settings.JWT_CLAIMS_ONLY the user is built from the claims of the token
+(user id, username, role, is_staff, is_superuser, see
+RoleTokenObtainPairSerializer) and permission checks need no lookup at all.
+the claims are as old as the token, so this trades instant deactivation and
+role changes for zero lookups.
+"""
+
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+from accounts.models import User
+
+USER_CACHE_TIMEOUT = 60 * 5
+USER_LOCAL_TTL = 5
+USER_CACHE_PREFIX = "auth:user:v2"
+
+# claims a token carries for claims-only authentication
+USER_CLAIMS = ("username", "role", "is_staff", "is_superuser")
+
+# key of the md5 of the password hash in a cached entry
+PASSWORD_MD5 = "password_md5"
+
+# user id -> (expires at, field values)
+_local = {}
+
+
+def _cache_key(user_id):
+    return f"{USER_CACHE_PREFIX}:{user_id}"
+
+
+def _dump(user):
+    values = {field.attname: getattr(user, field.attname) for field in _fields()}
+    if api_settings.CHECK_REVOKE_TOKEN:
+        values[PASSWORD_MD5] = get_md5_hash_password(user.password)
+    return values
+
+
+def _load(values):
+    fields = _fields()
+    user = User.from_db(
+        "default",
+        [field.attname for field in fields],
+        [values[field.attname] for field in fields],
+    )
+    user._password_md5 = values.get(PASSWORD_MD5)
+    return user
+
+
+def _fields():
+    return [field for field in User._meta.concrete_fields if field.name != "password"]
+
+
+def get_cached_user(user_id):
+    """
+    user of a token from the process cache, redis or the database (in that
+    order), None when there is no such user. every call gets its own instance
+    """
+    entry = _local.get(user_id)
+    if entry is not None and entry[0] > time.monotonic():
+        return _load(entry[1])
+
+    values = cache.get(_cache_key(user_id))
+    if values is None:
+        user = User.objects.filter(pk=user_id).first()
+        if user is None:
+            return None
+        values = _dump(user)
+        cache.set(_cache_key(user_id), values, USER_CACHE_TIMEOUT)
+
+    _local[user_id] = (time.monotonic() + USER_LOCAL_TTL, values)
+    return _load(values)
+
+
+def invalidate_user(user_id):
+    _local.pop(user_id, None)
+    cache.delete(_cache_key(user_id))
+
+
+def clear_local_cache():
+    _local.clear()
+
+
+def user_from_claims(token):
+    """
+    user built from the token claims alone, None when the token was issued
+    without them
+    """
+    if any(claim not in token for claim in USER_CLAIMS):
+        return None
+    user = User(
+        pk=token[api_settings.USER_ID_CLAIM],
+        is_active=True,
+        **{claim: token[claim] for claim in USER_CLAIMS},
+    )
+    user._state.adding = False
+    user._state.db = "default"
+    return user
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    simplejwt authentication that looks the user up through the user cache,
+    or not at all with settings.JWT_CLAIMS_ONLY
+    """
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+
+        if getattr(settings, "JWT_CLAIMS_ONLY", False):
+            user = user_from_claims(validated_token)
+            if user is not None:
+                return user
+
+        user = get_cached_user(user_id)
+        if user is None:
+            raise AuthenticationFailed(_("User not found"), code="user_not_found")
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+        if api_settings.CHECK_REVOKE_TOKEN:
+            password_md5 = getattr(user, "_password_md5", None)
+            if password_md5 is None:
+                password_md5 = get_md5_hash_password(user.password)
+            if validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != password_md5:
+                raise AuthenticationFailed(
+                    _("The user's password has been changed."), code="password_changed"
+                )
+        return user
+
+
+class RoleTokenObtainPairSerializer(TokenObtainPairSerializer):
+    """
+    login tokens carry the claims of claims-only authentication
+    """
+
+    @classmethod
+    def get_token(cls, user):
+        token = super().get_token(user)
+        for claim in USER_CLAIMS:
+            token[claim] = getattr(user, claim)
+        return token
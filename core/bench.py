@@ -0,0 +1,136 @@
+"""
+latency, query and memory benchmark of the hot endpoints.
+
+every endpoint is requested through the whole stack (middleware, jwt,
+view, serializer) with a test client: first `warmup` requests that are not
+counted (caches fill), then `runs` timed ones, then one more under
+tracemalloc for the peak memory of a request. the requests pick their
+product at random, so cached and uncached reads mix like they do in
+production.
+"""
+
+import math
+import statistics
+import time
+import tracemalloc
+from collections import Counter
+
+from django.urls import reverse
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from accounts.models import User
+
+from .authentication import invalidate_user
+from .instrumentation import record_queries
+
+
+def product_list(seeder):
+    return "get", reverse("catalog:product-list"), None
+
+
+def product_detail(seeder):
+    pk = seeder.product_ids[seeder.pick_product()]
+    return "get", reverse("catalog:product-detail", kwargs={"pk": pk}), None
+
+
+def order_create(seeder):
+    product = seeder.pick_product()
+    data = {
+        "shop": seeder.product_shops[product],
+        "address": seeder.address_ids[seeder.buyer_ids[0]],
+        "items": [{"product": seeder.product_ids[product], "count": 1}],
+    }
+    return "post", reverse("orders:order-create"), data
+
+
+def comment_list(seeder):
+    return "get", reverse("interactions:comment-list"), None
+
+
+def wishlist_list(seeder):
+    return "get", reverse("catalog:wishlist-list"), None
+
+
+def category_list(seeder):
+    return "get", reverse("catalog:category-list"), None
+
+
+ENDPOINTS = {
+    "ProductList": product_list,
+    "ProductDetail": product_detail,
+    "OrderCreate": order_create,
+    "CommentListView": comment_list,
+    "WishlistList": wishlist_list,
+    "CategoryList": category_list,
+}
+
+
+def percentile(values, percent):
+    """
+    nearest-rank percentile of values
+    """
+    values = sorted(values)
+    return values[max(0, math.ceil(percent / 100 * len(values)) - 1)]
+
+
+def client_for(user_id):
+    client = APIClient()
+    token = AccessToken.for_user(User.objects.get(pk=user_id))
+    client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+    return client
+
+
+def request(client, seeder, endpoint):
+    method, url, data = ENDPOINTS[endpoint](seeder)
+    if method == "get":
+        return client.get(url)
+    return client.post(url, data, format="json")
+
+
+def bench_endpoint(client, seeder, endpoint, runs, warmup):
+    for _ in range(warmup):
+        request(client, seeder, endpoint)
+
+    latencies = []
+    queries = []
+    statuses = Counter()
+    for _ in range(runs):
+        with record_queries() as stats:
+            started = time.perf_counter()
+            response = request(client, seeder, endpoint)
+            latencies.append((time.perf_counter() - started) * 1000)
+        queries.append(stats.count)
+        statuses[response.status_code] += 1
+
+    tracemalloc.start()
+    try:
+        request(client, seeder, endpoint)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "runs": runs,
+        "status": dict(statuses),
+        "p50_ms": round(percentile(latencies, 50), 2),
+        "p95_ms": round(percentile(latencies, 95), 2),
+        "mean_ms": round(statistics.fmean(latencies), 2),
+        "max_ms": round(max(latencies), 2),
+        "queries": max(queries),
+        "peak_memory_kb": round(peak / 1024, 1),
+    }
+
+
+def run_benchmarks(seeder, endpoints=None, runs=50, warmup=5):
+    """
+    {endpoint: numbers} for the endpoints (all by default), requested as the
+    first buyer of the seeded data
+    """
+    # bulk_create sends no signals, drop what an earlier run cached for the id
+    invalidate_user(seeder.buyer_ids[0])
+    client = client_for(seeder.buyer_ids[0])
+    return {
+        endpoint: bench_endpoint(client, seeder, endpoint, runs, warmup)
+        for endpoint in endpoints or ENDPOINTS
+    }
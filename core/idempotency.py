@@ -0,0 +1,120 @@
+"""
+Idempotency-Key support for POST views.
+
+the first response for a key is kept in the cache (redis) and a retry with
+the same key gets it back without the view running again. while the first
+request is still running, a duplicate waits for its response instead of
+racing it. keys are scoped to the user and the view; reusing a key with a
+different body is rejected.
+"""
+
+import functools
+import hashlib
+import json
+import time
+
+from django.core.cache import cache
+from rest_framework import status
+from rest_framework.response import Response
+
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+REPLAYED_HEADER = "Idempotent-Replayed"
+
+# how long a stored response can be replayed
+IDEMPOTENCY_TIMEOUT = 60 * 60 * 24
+# how long a running request holds its key (if it dies the key frees itself)
+IDEMPOTENCY_LOCK_TIMEOUT = 30
+# how long a duplicate waits for the running request
+IDEMPOTENCY_WAIT = 10
+POLL_INTERVAL = 0.05
+
+
+def _cache_key(request, view, key):
+    user = request.user.pk if request.user.is_authenticated else "anonymous"
+    return f"idempotency:{type(view).__name__}:{user}:{key}"
+
+
+def _fingerprint(request):
+    body = json.dumps(request.data, sort_keys=True, default=str)
+    return hashlib.sha256(body.encode()).hexdigest()
+
+
+def _wait_for(key):
+    deadline = time.monotonic() + IDEMPOTENCY_WAIT
+    while time.monotonic() < deadline:
+        stored = cache.get(key)
+        if stored is not None:
+            return stored
+        time.sleep(POLL_INTERVAL)
+    return None
+
+
+def _replay(stored, fingerprint):
+    if stored["fingerprint"] != fingerprint:
+        return Response(
+            {"error": "این کلید برای درخواست دیگری استفاده شده است"},
+            status=status.HTTP_422_UNPROCESSABLE_ENTITY,
+        )
+    return Response(
+        stored["data"], status=stored["status"], headers={REPLAYED_HEADER: "true"}
+    )
+
+
+def idempotent(method):
+    """
+    decorator for the post() of an APIView, requests without the
+    Idempotency-Key header are not touched
+    """
+
+    @functools.wraps(method)
+    def wrapper(self, request, *args, **kwargs):
+        key = request.headers.get(IDEMPOTENCY_HEADER)
+        if not key:
+            return method(self, request, *args, **kwargs)
+        if len(key) > 255:
+            return Response(
+                {"error": f"{IDEMPOTENCY_HEADER} is too long"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        result_key = _cache_key(request, self, key)
+        lock_key = f"{result_key}:lock"
+        fingerprint = _fingerprint(request)
+
+        stored = cache.get(result_key)
+        if stored is not None:
+            return _replay(stored, fingerprint)
+
+        # cache.add is atomic, only one request with the key gets to run
+        if not cache.add(lock_key, fingerprint, IDEMPOTENCY_LOCK_TIMEOUT):
+            stored = _wait_for(result_key)
+            if stored is None:
+                return Response(
+                    {"error": "درخواست دیگری با این کلید در حال اجراست"},
+                    status=status.HTTP_409_CONFLICT,
+                )
+            return _replay(stored, fingerprint)
+
+        try:
+            # the first request may have finished between get and add
+            stored = cache.get(result_key)
+            if stored is not None:
+                return _replay(stored, fingerprint)
+
+            response = method(self, request, *args, **kwargs)
+            # server errors are not stored, the client can retry them
+            if response.status_code < 500:
+                cache.set(
+                    result_key,
+                    {
+                        "fingerprint": fingerprint,
+                        "status": response.status_code,
+                        "data": response.data,
+                    },
+                    IDEMPOTENCY_TIMEOUT,
+                )
+            return response
+        finally:
+            cache.delete(lock_key)
+
+    return wrapper
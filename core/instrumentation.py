@@ -0,0 +1,174 @@
+"""
+per-request SQL and latency numbers.
+
+record_queries() hooks connection.execute_wrapper and counts the queries
+run inside it, their total time and how often each query shape (the sql
+with literals and IN lists folded) ran. the same query shape running many
+times in one request is what an N+1 looks like.
+
+InstrumentationMiddleware records every request and
+
+    logs one json line to the "core.instrumentation" logger (a warning when
+    the request runs more than settings.INSTRUMENTATION_QUERY_BUDGET queries
+    or repeats a query shape)
+    adds a Server-Timing header (db, view, total) when settings.DEBUG is on
+
+a streamed response (the exports) is recorded until its body is read to
+the end, its line is logged then with "streamed": true and it gets no
+Server-Timing header (the headers are sent before the body).
+
+tests assert budgets with the query_budget fixture (tests/conftest.py).
+"""
+
+import json
+import logging
+import re
+import time
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+# a query shape running this many times in one request is reported
+DUPLICATE_THRESHOLD = 2
+# how many duplicate shapes a log line keeps
+DUPLICATES_LOGGED = 5
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+_PLACEHOLDERS = re.compile(r"\((?:\s*(?:%s|\?)\s*,)+\s*(?:%s|\?)\s*\)")
+_SPACE = re.compile(r"\s+")
+
+
+def fingerprint(sql):
+    """
+    shape of a query: literals become ? and IN lists of any length are equal
+    """
+    sql = _STRING.sub("?", sql)
+    sql = _NUMBER.sub("?", sql)
+    sql = sql.replace("%s", "?")
+    sql = _PLACEHOLDERS.sub("(...)", sql)
+    return _SPACE.sub(" ", sql).strip()
+
+
+class QueryStats:
+    def __init__(self):
+        self.count = 0
+        self.db_time = 0.0
+        self.shapes = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - start
+            self.count += 1
+            self.shapes[fingerprint(sql)] += 1
+
+    def duplicates(self, threshold=DUPLICATE_THRESHOLD):
+        """
+        [(query shape, times it ran)] of the shapes that ran threshold times
+        or more, most repeated first
+        """
+        return [
+            (shape, count)
+            for shape, count in self.shapes.most_common()
+            if count >= threshold
+        ]
+
+
+@contextmanager
+def record_queries(stats=None):
+    """
+    QueryStats of every query run inside the block, on every database
+    (added to `stats` when given)
+    """
+    stats = QueryStats() if stats is None else stats
+    with ExitStack() as stack:
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(stats))
+        yield stats
+
+
+class RecordedStream:
+    """
+    streaming_content that goes on recording into `stats` while the body is
+    read and calls finish() once, when the body is exhausted or the response
+    is closed (client gone, body never read)
+    """
+
+    def __init__(self, content, stats, finish):
+        self.content = content
+        self.stats = stats
+        self.finish = finish
+        self.finished = False
+
+    def __iter__(self):
+        try:
+            with record_queries(self.stats):
+                yield from self.content
+        finally:
+            self.close()
+
+    def close(self):
+        if self.finished:
+            return
+        self.finished = True
+        if hasattr(self.content, "close"):
+            self.content.close()
+        self.finish()
+
+
+class InstrumentationMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        start = time.perf_counter()
+        with record_queries() as stats:
+            response = self.get_response(request)
+
+        if response.streaming and not getattr(response, "is_async", False):
+            # exports run their queries while the body is read, the line is
+            # logged when it is done
+            response.streaming_content = RecordedStream(
+                response.streaming_content,
+                stats,
+                lambda: self.log(request, response, stats, start),
+            )
+            return response
+
+        record = self.log(request, response, stats, start)
+        if settings.DEBUG:
+            response["Server-Timing"] = (
+                f'db;dur={record["db_ms"]};desc="{stats.count} queries", '
+                f'view;dur={record["view_ms"]}, total;dur={record["total_ms"]}'
+            )
+        return response
+
+    def log(self, request, response, stats, start):
+        total = time.perf_counter() - start
+        record = {
+            "method": request.method,
+            "path": request.path,
+            "view": getattr(request.resolver_match, "view_name", None),
+            "status": response.status_code,
+            "streamed": response.streaming,
+            "queries": stats.count,
+            "db_ms": round(stats.db_time * 1000, 2),
+            "view_ms": round((total - stats.db_time) * 1000, 2),
+            "total_ms": round(total * 1000, 2),
+            "duplicates": [
+                {"sql": shape, "count": count}
+                for shape, count in stats.duplicates()[:DUPLICATES_LOGGED]
+            ],
+        }
+        budget = getattr(settings, "INSTRUMENTATION_QUERY_BUDGET", None)
+        over_budget = budget is not None and stats.count > budget
+        level = logging.WARNING if over_budget or record["duplicates"] else logging.INFO
+        logger.log(level, json.dumps(record, ensure_ascii=False))
+        return record
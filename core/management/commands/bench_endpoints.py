@@ -0,0 +1,120 @@
+import json
+import logging
+import subprocess
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import override_settings
+from django.utils import timezone
+
+from core.bench import ENDPOINTS, run_benchmarks
+from core.seeding import Seeder
+
+
+class Command(BaseCommand):
+    help = (
+        "seed --size products, orders, comments and rates (10000, 100000 or "
+        "1000000 for the usual runs) and measure p50/p95 latency, queries and "
+        "peak memory of the hot endpoints. results are written as json, "
+        "--compare prints the change against an earlier run. the seeded rows "
+        "are rolled back unless --keep. run it against a database and redis "
+        "of its own"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--size", type=int, default=10000)
+        parser.add_argument("--runs", type=int, default=50)
+        parser.add_argument("--warmup", type=int, default=5)
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--endpoints", nargs="+", choices=list(ENDPOINTS))
+        parser.add_argument("--output", default="bench-results.json")
+        parser.add_argument("--compare", help="json results of an earlier run")
+        parser.add_argument("--keep", action="store_true")
+
+    def handle(self, *args, **options):
+        if options["runs"] < 1:
+            raise CommandError("--runs has to be at least 1")
+        previous = self.read(options["compare"]) if options["compare"] else None
+
+        seeder = Seeder(options["seed"])
+        with transaction.atomic():
+            started = time.monotonic()
+            counts = seeder.seed(options["size"])
+            self.stdout.write(
+                f"seeded {sum(counts.values())} rows in "
+                f"{time.monotonic() - started:.1f}s"
+            )
+            results = self.bench(seeder, options)
+            transaction.set_rollback(not options["keep"])
+
+        report = {
+            "commit": self.commit(),
+            "created_at": timezone.now().isoformat(),
+            "database": connection.vendor,
+            "size": options["size"],
+            "seed": options["seed"],
+            "rows": counts,
+            "endpoints": results,
+        }
+        with open(options["output"], "w") as file:
+            json.dump(report, file, indent=2)
+
+        for endpoint, numbers in results.items():
+            self.stdout.write(
+                f"{endpoint:16} p50 {numbers['p50_ms']:8.2f}ms  "
+                f"p95 {numbers['p95_ms']:8.2f}ms  queries {numbers['queries']:3}  "
+                f"peak {numbers['peak_memory_kb']:8.1f}kb"
+                + self.change(previous, endpoint, numbers)
+            )
+        self.stdout.write(self.style.SUCCESS(f"results written to {options['output']}"))
+
+    def bench(self, seeder, options):
+        # requests go through the test client, its host has to be allowed.
+        # only warnings (over budget, repeated queries) of every request
+        logger = logging.getLogger("core.instrumentation")
+        level = logger.level
+        logger.setLevel(logging.WARNING)
+        try:
+            with override_settings(
+                ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, "testserver"]
+            ):
+                return run_benchmarks(
+                    seeder,
+                    endpoints=options["endpoints"],
+                    runs=options["runs"],
+                    warmup=options["warmup"],
+                )
+        finally:
+            logger.setLevel(level)
+
+    def read(self, path):
+        try:
+            with open(path) as file:
+                return json.load(file)
+        except (OSError, ValueError) as error:
+            raise CommandError(f"can not read {path}: {error}")
+
+    def change(self, previous, endpoint, numbers):
+        old = (previous or {}).get("endpoints", {}).get(endpoint)
+        if not old:
+            return ""
+        p95 = (
+            (numbers["p95_ms"] - old["p95_ms"]) / old["p95_ms"] * 100
+            if old["p95_ms"]
+            else 0
+        )
+        return f"  (p95 {p95:+.0f}%, queries {numbers['queries'] - old['queries']:+d})"
+
+    def commit(self):
+        try:
+            return subprocess.run(
+                ["git", "rev-parse", "HEAD"],
+                capture_output=True,
+                text=True,
+                check=True,
+                cwd=settings.BASE_DIR,
+            ).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
@@ -0,0 +1,93 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.seeding import BATCH_SIZE, Seeder
+
+
+class Command(BaseCommand):
+    help = (
+        "fill the database with synthetic data shaped like production: "
+        "category trees, shops per seller, zipf product popularity, multi "
+        "item orders, threaded comments, rates and wishlists. the same --seed "
+        "gives the same shape of data (names get a random prefix so runs do "
+        "not collide). orders, comments and rates default to "
+        "--products, users and sellers to a share of it"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--products", type=int, default=10000)
+        parser.add_argument("--orders", type=int)
+        parser.add_argument("--comments", type=int)
+        parser.add_argument("--rates", type=int)
+        parser.add_argument("--wishlists", type=int)
+        parser.add_argument("--users", type=int)
+        parser.add_argument("--sellers", type=int)
+        parser.add_argument("--shops-per-seller", type=int, default=2)
+        parser.add_argument("--category-roots", type=int, default=8)
+        parser.add_argument("--category-depth", type=int, default=3)
+        parser.add_argument("--category-children", type=int, default=4)
+        parser.add_argument(
+            "--zipf", type=float, default=1.1, help="popularity exponent, 0 is uniform"
+        )
+        parser.add_argument("--max-cart", type=int, default=5)
+        parser.add_argument("--thread-depth", type=int, default=3)
+        parser.add_argument(
+            "--history-days",
+            type=int,
+            default=365,
+            help="orders and comments are created over this many days",
+        )
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        for option in [
+            "products",
+            "shops_per_seller",
+            "category_roots",
+            "category_depth",
+            "category_children",
+            "max_cart",
+            "batch_size",
+        ]:
+            if options[option] < 1:
+                raise CommandError(f"--{option.replace('_', '-')} has to be at least 1")
+        if options["zipf"] < 0 or options["thread_depth"] < 0:
+            raise CommandError("--zipf and --thread-depth can not be negative")
+        if options["history_days"] < 0:
+            raise CommandError("--history-days can not be negative")
+
+        seeder = Seeder(
+            options["seed"],
+            batch_size=options["batch_size"],
+            category_depth=options["category_depth"],
+            category_children=options["category_children"],
+            shops_per_seller=options["shops_per_seller"],
+            zipf=options["zipf"],
+            max_cart=options["max_cart"],
+            thread_depth=options["thread_depth"],
+            history_days=options["history_days"],
+        )
+        started = time.monotonic()
+        counts = seeder.seed(
+            options["products"],
+            orders=options["orders"],
+            comments=options["comments"],
+            rates=options["rates"],
+            users=options["users"],
+            sellers=options["sellers"],
+            wishlists=options["wishlists"],
+            category_roots=options["category_roots"],
+        )
+        elapsed = time.monotonic() - started
+
+        for label, count in counts.items():
+            self.stdout.write(f"{label:24} {count}")
+        total = sum(counts.values())
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"seeded {total} rows in {elapsed:.1f}s ({total / elapsed:.0f} rows/s), "
+                f"prefix {seeder.prefix}"
+            )
+        )
@@ -0,0 +1,61 @@
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+from rest_framework.settings import api_settings
+
+
+class CreatedAtCursorPagination(CursorPagination):
+    """
+    keyset pagination on (created_at, id), no COUNT(*) and no OFFSET scan.
+    needs a (created_at, id) index on the model
+    """
+
+    ordering = ("-created_at", "-id")
+    page_size_query_param = "page_size"
+    max_page_size = 100
+
+    def get_ordering(self, request, queryset, view):
+        # the keyset is always (created_at, id), ?ordering= does not apply here
+        return self.ordering
+
+
+class OptionalCursorPagination(PageNumberPagination):
+    """
+    page number pagination by default, keyset pagination when the client
+    asks for it with ?pagination=cursor (or follows a ?cursor= link)
+    """
+
+    cursor_pagination_class = CreatedAtCursorPagination
+
+    def use_cursor(self, request):
+        return (
+            "cursor" in request.query_params
+            or request.query_params.get("pagination") == "cursor"
+        )
+
+    def check_ordering(self, request):
+        # the keyset order can not be changed, any other ?ordering= (rating,
+        # name...) would be silently dropped
+        keyset = list(self.cursor_pagination_class.ordering)
+        ordering = request.query_params.get(api_settings.ORDERING_PARAM, "")
+        terms = [term.strip() for term in ordering.split(",") if term.strip()]
+        if terms != keyset[: len(terms)]:
+            raise ValidationError(
+                {
+                    api_settings.ORDERING_PARAM: [
+                        f"cursor pagination is ordered by {','.join(keyset)} only"
+                    ]
+                }
+            )
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.cursor_paginator = None
+        if self.use_cursor(request):
+            self.check_ordering(request)
+            self.cursor_paginator = self.cursor_pagination_class()
+            return self.cursor_paginator.paginate_queryset(queryset, request, view)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.cursor_paginator is not None:
+            return self.cursor_paginator.get_paginated_response(data)
+        return super().get_paginated_response(data)
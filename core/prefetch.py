@@ -0,0 +1,86 @@
+"""
+building select_related / prefetch_related lookups from the serializer tree.
+
+nested serializers are found in two ways:
+ - declared fields that are serializers (like `owner = UserSerializer()`)
+ - `nested_relations` on the serializer class, for relations that are
+   rendered by hand inside to_representation. the value is the serializer
+   used for the related object, None when only the object itself is read,
+   or "self" for recursive relations (like comment.parent)
+"""
+
+from functools import lru_cache
+
+from rest_framework import serializers
+
+# how many times one serializer can show up in a single lookup path
+# (stops recursive relations like comment.parent from going forever)
+MAX_REPEAT = 2
+
+
+def _nested_relations(serializer_class):
+    relations = dict(getattr(serializer_class, "nested_relations", {}))
+
+    for name, field in serializer_class._declared_fields.items():
+        source = field.source or name
+        if isinstance(field, serializers.ListSerializer):
+            relations.setdefault(source, type(field.child))
+        elif isinstance(field, serializers.BaseSerializer):
+            relations.setdefault(source, type(field))
+
+    return relations
+
+
+def _walk(serializer_class, model, prefix, many, path, select, prefetch):
+    for name, child in _nested_relations(serializer_class).items():
+        if child == "self":
+            child = serializer_class
+
+        field = model._meta.get_field(name)
+        lookup = prefix + name
+        is_many = many or field.many_to_many or field.one_to_many
+
+        if is_many:
+            prefetch.append(lookup)
+        else:
+            select.append(lookup)
+
+        if child is None or path.count(child) >= MAX_REPEAT:
+            continue
+
+        _walk(
+            child,
+            field.related_model,
+            lookup + "__",
+            is_many,
+            path + (child,),
+            select,
+            prefetch,
+        )
+
+
+@lru_cache(maxsize=None)
+def plan_prefetch(serializer_class, model=None):
+    """
+    return (select_related, prefetch_related) lookups that serializer_class needs
+    """
+    model = model or serializer_class.Meta.model
+    select, prefetch = [], []
+    _walk(serializer_class, model, "", False, (serializer_class,), select, prefetch)
+    return tuple(select), tuple(prefetch)
+
+
+def optimize_queryset(serializer_class, queryset=None):
+    """
+    apply the planned select_related / prefetch_related to queryset
+    (default manager of the serializer model if queryset is not given)
+    """
+    if queryset is None:
+        queryset = serializer_class.Meta.model._default_manager.all()
+
+    select, prefetch = plan_prefetch(serializer_class, queryset.model)
+    if select:
+        queryset = queryset.select_related(*select)
+    if prefetch:
+        queryset = queryset.prefetch_related(*prefetch)
+    return queryset
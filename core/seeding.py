@@ -0,0 +1,412 @@
+"""
+synthetic rows shaped like the real tables, for benchmarks and load tests.
+
+Seeder(seed).seed(products) fills every table the hot endpoints read with
+bulk_create in batches:
+
+    category trees `category_depth` levels deep, products on the leaves
+    `shops_per_seller` shops for every seller
+    product popularity following a zipf law (exponent `zipf`, 0 is uniform),
+    orders, rates, wishlists and comments go to popular products first
+    orders of 1..`max_cart` products of one shop
+    comment threads up to `thread_depth` replies deep
+    orders and comments created over the last `history_days` days, a reply
+    after its parent
+
+rows are inserted parents first (categories level by level, then users,
+addresses, shops, products, orders before their items, comments level by
+level) so every foreign key points to a row that exists. the same seed
+gives the same shape of data, created_at as an offset from the start of the
+run (names carry a random prefix so runs do not collide). objects are built
+one batch at a time, only ids, shops, prices and popularity of the products
+are kept in memory.
+"""
+
+import bisect
+import itertools
+import random
+import uuid
+from array import array
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.db import transaction
+from django.utils import timezone
+
+from accounts.models import Address, City, Country, User
+from catalog.models import Category, Product, Shop, Wishlist, update_search_vector
+from interactions.models import Comment, Rate
+from orders.models import Order, OrderItem
+
+BATCH_SIZE = 5000
+
+
+def batches(iterable, size):
+    iterator = iter(iterable)
+    while batch := list(itertools.islice(iterator, size)):
+        yield batch
+
+
+def spread(total, parts):
+    """
+    total split into `parts` counts that differ by one at most
+    """
+    share, extra = divmod(total, parts)
+    return [share + (part < extra) for part in range(parts)]
+
+
+class Seeder:
+    def __init__(
+        self,
+        seed=0,
+        batch_size=BATCH_SIZE,
+        category_depth=1,
+        category_children=4,
+        shops_per_seller=1,
+        zipf=1.1,
+        max_cart=3,
+        thread_depth=2,
+        history_days=365,
+    ):
+        self.random = random.Random(seed)
+        self.batch_size = batch_size
+        self.category_depth = category_depth
+        self.category_children = category_children
+        self.shops_per_seller = shops_per_seller
+        self.zipf = zipf
+        self.max_cart = max_cart
+        self.thread_depth = thread_depth
+        self.history = timedelta(days=history_days)
+        self.now = timezone.now()
+        self.prefix = f"seed-{uuid.uuid4().hex[:8]}"
+        self.counts = {}
+
+    def create(self, model, objects):
+        """
+        bulk_create objects (any iterable) batch by batch, returns the ids
+        """
+        ids = []
+        for batch in batches(objects, self.batch_size):
+            ids += [obj.pk for obj in model.objects.bulk_create(batch)]
+        label = model._meta.label
+        self.counts[label] = self.counts.get(label, 0) + len(ids)
+        return ids
+
+    def backdate(self, model, ids, moments):
+        """
+        set created_at of the rows, bulk_create always writes now
+        (auto_now_add), updated_at stays the time of the insert
+        """
+        model.objects.bulk_update(
+            [model(pk=pk, created_at=moment) for pk, moment in zip(ids, moments)],
+            ["created_at"],
+            batch_size=self.batch_size,
+        )
+
+    def created_at(self, after=None):
+        """
+        a moment in the history window (after `after` when given)
+        """
+        start = self.now - self.history
+        if after is not None:
+            start = max(start, after)
+        return start + (self.now - start) * self.random.random()
+
+    def seed(
+        self,
+        products,
+        orders=None,
+        comments=None,
+        rates=None,
+        users=None,
+        sellers=None,
+        wishlists=None,
+        category_roots=None,
+    ):
+        """
+        seed `products` products and (by default) as many orders, comments
+        and rates in one transaction, returns {model label: rows created}
+        """
+        with transaction.atomic():
+            self.seed_users(
+                users or max(10, products // 100), sellers or max(2, products // 1000)
+            )
+            self.seed_categories(category_roots or max(5, products // 2000))
+            self.seed_shops()
+            self.seed_products(products)
+            self.seed_orders(products if orders is None else orders)
+            self.seed_comments(products if comments is None else comments)
+            self.seed_rates(products if rates is None else rates)
+            self.seed_wishlists(
+                max(10, products // 10) if wishlists is None else wishlists
+            )
+        return self.counts
+
+    def seed_users(self, buyers, sellers):
+        password = make_password(None)
+        country = Country.objects.create(name=self.prefix)
+        self.city_ids = self.create(
+            City, (City(name=f"{self.prefix}-{i}", country=country) for i in range(10))
+        )
+
+        def users(count, role):
+            for i in range(count):
+                name = f"{self.prefix}-{role.lower()}-{i}"
+                yield User(
+                    username=name,
+                    email=f"{name}@seed.local",
+                    phone=name,
+                    password=password,
+                    role=role,
+                )
+
+        self.buyer_ids = self.create(User, users(buyers, "USER"))
+        self.seller_ids = self.create(User, users(sellers, "SELLER"))
+        self.address_ids = dict(
+            zip(
+                self.buyer_ids + self.seller_ids,
+                self.create(
+                    Address,
+                    (
+                        Address(
+                            user_id=user_id,
+                            city_id=self.random.choice(self.city_ids),
+                            street=f"street {user_id}",
+                            zip_code=str(10000 + user_id % 90000),
+                        )
+                        for user_id in self.buyer_ids + self.seller_ids
+                    ),
+                ),
+            )
+        )
+
+    def seed_categories(self, roots):
+        # one level at a time, parents get their ids before the children
+        level = [(None, "/")] * roots
+        for depth in range(self.category_depth):
+            ids = self.create(
+                Category,
+                (
+                    Category(name=f"{self.prefix}-{depth}-{i}", parent_id=parent_id)
+                    for i, (parent_id, _) in enumerate(level)
+                ),
+            )
+            # bulk_create skips save(), the materialized path is set here
+            paths = [f"{parent_path}{pk}/" for pk, (_, parent_path) in zip(ids, level)]
+            Category.objects.bulk_update(
+                [
+                    Category(pk=pk, path=path, depth=depth)
+                    for pk, path in zip(ids, paths)
+                ],
+                ["path", "depth"],
+                batch_size=self.batch_size,
+            )
+            self.category_ids = ids
+            level = [
+                (pk, path)
+                for pk, path in zip(ids, paths)
+                for _ in range(self.category_children)
+            ]
+
+    def seed_shops(self):
+        self.shop_ids = self.create(
+            Shop,
+            (
+                Shop(
+                    owner_id=seller_id,
+                    name=f"{self.prefix}-shop-{seller_id}-{i}",
+                    address_id=self.address_ids[seller_id],
+                    status="APPROVED",
+                )
+                for seller_id in self.seller_ids
+                for i in range(self.shops_per_seller)
+            ),
+        )
+
+    def seed_products(self, count):
+        # id, shop and price in cents of every product, by position.
+        # products are on the leaf categories (self.category_ids)
+        self.product_ids = array("q")
+        self.product_shops = array("q")
+        self.prices = array("q")
+        self.shop_products = defaultdict(lambda: array("l"))
+        for batch in batches(range(count), self.batch_size):
+            products = []
+            for i in batch:
+                cents = self.random.randint(100, 100000)
+                products.append(
+                    Product(
+                        shop_id=self.random.choice(self.shop_ids),
+                        category_id=self.random.choice(self.category_ids),
+                        name=f"product {i}",
+                        description=f"{self.prefix} synthetic product number {i}",
+                        price=Decimal(cents) / 100,
+                    )
+                )
+                self.prices.append(cents)
+                self.shop_products[products[-1].shop_id].append(i)
+            self.product_ids.extend(self.create(Product, products))
+            self.product_shops.extend(product.shop_id for product in products)
+        update_search_vector(Product.objects.filter(shop_id__in=self.shop_ids))
+
+        # cumulative zipf weights, the product at position 0 is the most popular
+        self.popularity = array(
+            "d",
+            itertools.accumulate(
+                1 / (rank**self.zipf) for rank in range(1, len(self.product_ids) + 1)
+            ),
+        )
+
+    def pick_product(self):
+        """
+        position of a product in product_ids, popular products more often
+        """
+        position = bisect.bisect(
+            self.popularity, self.random.random() * self.popularity[-1]
+        )
+        return min(position, len(self.product_ids) - 1)
+
+    def pick_products(self, count):
+        """
+        positions of up to `count` distinct products
+        """
+        picked = set()
+        for _ in range(count * 3):
+            picked.add(self.pick_product())
+            if len(picked) == count:
+                break
+        return picked
+
+    def price(self, product, count=1):
+        return Decimal(self.prices[product] * count) / 100
+
+    def seed_orders(self, count):
+        for batch in batches(range(count), self.batch_size):
+            orders = []
+            carts = []
+            moments = []
+            for _ in batch:
+                # a popular product and more of the same shop
+                first = self.pick_product()
+                shop_id = self.product_shops[first]
+                shop_products = self.shop_products[shop_id]
+                cart = {first: self.random.randint(1, 3)}
+                for _ in range(self.random.randint(1, self.max_cart) - 1):
+                    product = shop_products[self.random.randrange(len(shop_products))]
+                    cart[product] = self.random.randint(1, 3)
+
+                subtotal = sum(self.price(pk, count) for pk, count in cart.items())
+                buyer_id = self.random.choice(self.buyer_ids)
+                orders.append(
+                    Order(
+                        shop_id=shop_id,
+                        user_id=buyer_id,
+                        address_id=self.address_ids[buyer_id],
+                        subtotal=subtotal,
+                        total_price=subtotal,
+                        item_count=sum(cart.values()),
+                        status=self.random.choices(
+                            ["PENDING", "COMPLETED", "CANCELLED"], weights=[2, 7, 1]
+                        )[0],
+                    )
+                )
+                carts.append(cart)
+                moments.append(self.created_at())
+            order_ids = self.create(Order, orders)
+            self.backdate(Order, order_ids, moments)
+            self.create(
+                OrderItem,
+                (
+                    OrderItem(
+                        order_id=order_id,
+                        product_id=self.product_ids[pk],
+                        count=count,
+                        row_price=self.price(pk, count),
+                    )
+                    for order_id, cart in zip(order_ids, carts)
+                    for pk, count in cart.items()
+                ),
+            )
+
+    def seed_comments(self, count):
+        # two thirds of a batch start threads, the rest answer them level by
+        # level (half of what is left on every level, the last level takes
+        # the rest) so a reply is always inserted after its parent. without
+        # replies (thread_depth 0) the whole batch starts threads
+        for batch in batches(range(count), self.batch_size):
+            split = max(1, len(batch) * 2 // 3) if self.thread_depth else len(batch)
+            level = [
+                Comment(
+                    product_id=self.product_ids[self.pick_product()],
+                    user_id=self.random.choice(self.buyer_ids),
+                    text=f"comment {i}",
+                )
+                for i in batch[:split]
+            ]
+            level_ids = self.create(Comment, level)
+            level_moments = [self.created_at() for _ in level]
+            self.backdate(Comment, level_ids, level_moments)
+            left = batch[split:]
+            for depth in range(1, self.thread_depth + 1):
+                if not left:
+                    break
+                take = len(left) if depth == self.thread_depth else -(-len(left) // 2)
+                replies = []
+                moments = []
+                for i in left[:take]:
+                    k = self.random.randrange(len(level))
+                    moments.append(self.created_at(after=level_moments[k]))
+                    replies.append(
+                        Comment(
+                            product_id=level[k].product_id,
+                            user_id=self.random.choice(self.buyer_ids),
+                            text=f"reply {i}",
+                            parent_id=level_ids[k],
+                        )
+                    )
+                level, level_ids, level_moments, left = (
+                    replies,
+                    self.create(Comment, replies),
+                    moments,
+                    left[take:],
+                )
+                self.backdate(Comment, level_ids, level_moments)
+
+    def user_products(self, count):
+        """
+        (user id, product position) pairs, `count` in total, spread over
+        the buyers without a product twice for one user
+        """
+        for user_id, share in zip(self.buyer_ids, spread(count, len(self.buyer_ids))):
+            for product in sorted(self.pick_products(share)):
+                yield user_id, product
+
+    def seed_rates(self, count):
+        self.create(
+            Rate,
+            (
+                Rate(
+                    user_id=user_id,
+                    product_id=self.product_ids[product],
+                    score=self.score(),
+                )
+                for user_id, product in self.user_products(count)
+            ),
+        )
+        call_command("reconcile_ratings", stdout=StringIO())
+
+    def score(self):
+        return self.random.choices(range(1, 6), weights=[1, 1, 2, 4, 5])[0]
+
+    def seed_wishlists(self, count):
+        self.create(
+            Wishlist,
+            (
+                Wishlist(user_id=user_id, product_id=self.product_ids[product])
+                for user_id, product in self.user_products(count)
+            ),
+        )
@@ -46,6 +46,7 @@ INSTALLED_APPS = [
     "catalog",
     "orders",
     "interactions",
+    "analytics",
     "ecommerce",
     "core",
     "drf_spectacular",
@@ -54,6 +55,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "core.instrumentation.InstrumentationMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -146,11 +148,41 @@ CACHES = {
 
 #celery configs
 CELERY_BROKER_URL = 'redis://redis:6379/0'
+# checkout work has its own queue (and worker) so it is not stuck behind emails
+CELERY_TASK_ROUTES = {
+    "orders.tasks.place_order": {"queue": "orders"},
+}
+CELERY_BEAT_SCHEDULE = {
+    "release-expired-stock": {
+        "task": "orders.tasks.release_expired_stock",
+        "schedule": 60.0,
+    },
+    "refresh-sales-rollups": {
+        "task": "analytics.tasks.refresh_sales",
+        "schedule": 300.0,
+    },
+    "reclaim-order-requests": {
+        "task": "orders.tasks.reclaim_order_requests",
+        "schedule": 60.0,
+    },
+}
+
+# how long checkout holds the stock of a pending order (orders.stock)
+STOCK_RESERVATION_TTL = timedelta(minutes=15)
+
+# how far behind now the sales rollups stop (analytics.rollup)
+SALES_ROLLUP_LAG = timedelta(minutes=1)
+
+# async checkouts still PROCESSING after this lost their worker (orders.tasks)
+ORDER_REQUEST_TIMEOUT = timedelta(minutes=5)
+
+# queue every OrderCreate for the orders worker, not only `Prefer: respond-async`
+ORDER_ASYNC_CHECKOUT = os.environ.get("ORDER_ASYNC_CHECKOUT", "False") == "True"
 
 
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": (
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
+        "core.authentication.CachedJWTAuthentication",
     ),
     "DEFAULT_SCHEMA_CLASS": "drf_spectacular.openapi.AutoSchema",
     "DEFAULT_RENDERER_CLASSES": [
@@ -169,6 +201,23 @@ REST_FRAMEWORK = {
 SIMPLE_JWT = {
     "ACCESS_TOKEN_LIFETIME": timedelta(days=60),
     "REFRESH_TOKEN_LIFETIME": timedelta(days=1),
+    "TOKEN_OBTAIN_SERIALIZER": "core.authentication.RoleTokenObtainPairSerializer",
+}
+
+# trust the role claims of the token instead of looking the user up
+# (core.authentication), role changes wait for the next login
+JWT_CLAIMS_ONLY = os.environ.get("JWT_CLAIMS_ONLY", "False") == "True"
+
+# requests running more queries are logged as warnings (core.instrumentation)
+INSTRUMENTATION_QUERY_BUDGET = 30
+
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "handlers": {"console": {"class": "logging.StreamHandler"}},
+    "loggers": {
+        "core.instrumentation": {"handlers": ["console"], "level": "INFO"},
+    },
 }
 
 SPECTACULAR_SETTINGS = {
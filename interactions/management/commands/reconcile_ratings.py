@@ -0,0 +1,69 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+
+from catalog.cache import invalidate_many
+from catalog.models import Product
+from interactions.models import ProductRating, Rate
+
+BATCH_SIZE = 1000
+
+HISTOGRAM_FIELDS = [f"score_{score}" for score in range(1, 6)]
+
+
+class Command(BaseCommand):
+    help = "rebuild product rating stats from the Rate table in bulk"
+
+    def handle(self, *args, **options):
+        stats = (
+            Rate.objects.order_by()
+            .values("product_id")
+            .annotate(
+                rating_count=Count("id"),
+                rating_sum=Sum("score"),
+                **{
+                    f"score_{score}": Count("id", filter=Q(score=score))
+                    for score in range(1, 6)
+                },
+            )
+        )
+
+        fields = ["rating_count", "rating_sum", "rating_avg"] + HISTOGRAM_FIELDS
+        total = 0
+        with transaction.atomic():
+            batch = []
+            for row in stats.iterator(chunk_size=BATCH_SIZE):
+                row["rating_avg"] = round(row["rating_sum"] / row["rating_count"], 2)
+                batch.append(ProductRating(**row))
+                if len(batch) >= BATCH_SIZE:
+                    total += self.save(batch, fields)
+                    batch = []
+            total += self.save(batch, fields)
+
+            # products whose rates are all gone
+            reset = ProductRating.objects.exclude(
+                product_id__in=Rate.objects.values("product_id")
+            ).update(**{field: 0 for field in fields})
+
+            # the copy on the product and its cached detail
+            products = Product.objects.filter(
+                Q(rating__isnull=False) | Q(rating_count__isnull=False)
+            )
+            ProductRating.copy_to_products(products)
+            ids = list(products.values_list("pk", flat=True))
+            for start in range(0, len(ids), BATCH_SIZE):
+                invalidate_many("product", ids[start : start + BATCH_SIZE])
+
+        self.stdout.write(
+            self.style.SUCCESS(f"reconciled {total} products, reset {reset}")
+        )
+
+    def save(self, batch, fields):
+        if batch:
+            ProductRating.objects.bulk_create(
+                batch,
+                update_conflicts=True,
+                unique_fields=["product"],
+                update_fields=fields,
+            )
+        return len(batch)
@@ -0,0 +1,47 @@
+# Generated by Django 4.2 on 2026-10-18 19:44
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("catalog", "0008_created_at_keyset_index"),
+        ("interactions", "0002_created_at_keyset_index"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ProductRating",
+            fields=[
+                (
+                    "product",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="rating",
+                        serialize=False,
+                        to="catalog.product",
+                    ),
+                ),
+                ("rating_count", models.PositiveIntegerField(default=0)),
+                ("rating_sum", models.PositiveIntegerField(default=0)),
+                (
+                    "rating_avg",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=3),
+                ),
+                ("score_1", models.PositiveIntegerField(default=0)),
+                ("score_2", models.PositiveIntegerField(default=0)),
+                ("score_3", models.PositiveIntegerField(default=0)),
+                ("score_4", models.PositiveIntegerField(default=0)),
+                ("score_5", models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name="productrating",
+            index=models.Index(
+                fields=["-rating_avg", "-rating_count"], name="product_rating_avg_idx"
+            ),
+        ),
+    ]
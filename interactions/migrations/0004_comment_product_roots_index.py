@@ -0,0 +1,21 @@
+# Generated by Django 4.2 on 2026-10-18 20:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("interactions", "0003_productrating"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="comment",
+            index=models.Index(
+                condition=models.Q(("parent", None)),
+                fields=["product", "-created_at", "-id"],
+                name="comment_product_roots_idx",
+            ),
+        ),
+    ]
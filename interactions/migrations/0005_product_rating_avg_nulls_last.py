@@ -0,0 +1,48 @@
+# Generated by Django 4.2 on 2026-10-18 21:16
+
+from django.db import migrations, models
+
+OLD_INDEX = models.Index(
+    fields=["-rating_avg", "-rating_count"], name="product_rating_avg_idx"
+)
+NEW_INDEX = models.Index(
+    models.OrderBy(models.F("rating_avg"), descending=True, nulls_last=True),
+    models.OrderBy(models.F("rating_count"), descending=True, nulls_last=True),
+    name="product_rating_avg_idx",
+)
+
+
+def swap_index(old, new):
+    # sqlite cant build an index with NULLS LAST, it keeps the old one
+    def swap(apps, schema_editor):
+        if schema_editor.connection.vendor != "postgresql":
+            return
+        ProductRating = apps.get_model("interactions", "ProductRating")
+        schema_editor.remove_index(ProductRating, old)
+        schema_editor.add_index(ProductRating, new)
+
+    return swap
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("interactions", "0004_comment_product_roots_index"),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.RemoveIndex(
+                    model_name="productrating",
+                    name="product_rating_avg_idx",
+                ),
+                migrations.AddIndex(model_name="productrating", index=NEW_INDEX),
+            ],
+            database_operations=[
+                migrations.RunPython(
+                    swap_index(OLD_INDEX, NEW_INDEX), swap_index(NEW_INDEX, OLD_INDEX)
+                ),
+            ],
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 4.2 on 2026-10-18 23:05
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("interactions", "0005_product_rating_avg_nulls_last"),
+        # ProductList orders by the copy on the product now
+        ("catalog", "0010_product_rating"),
+    ]
+
+    operations = [
+        # the index differs between postgres and sqlite (see 0005), dropped by
+        # name on both and not built again when going back
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.RemoveIndex(
+                    model_name="productrating",
+                    name="product_rating_avg_idx",
+                ),
+            ],
+            database_operations=[
+                migrations.RunSQL(
+                    "DROP INDEX IF EXISTS product_rating_avg_idx",
+                    migrations.RunSQL.noop,
+                ),
+            ],
+        ),
+    ]
@@ -1,4 +1,6 @@
 from django.db import models
+from django.db.models import DecimalField, F, OuterRef, Subquery
+from django.db.models.functions import Cast
 from accounts.models import User, Time
 from catalog.models import Product
 
@@ -25,5 +27,74 @@ class Comment(Time):
         "self", null=True, blank=True, on_delete=models.CASCADE, related_name="replies"
     )
 
+    class Meta:
+        # keyset pagination (core.pagination)
+        indexes = [
+            models.Index(fields=["-created_at", "-id"], name="comment_created_idx"),
+            # root comments of a product for CommentThreadView
+            models.Index(
+                fields=["product", "-created_at", "-id"],
+                name="comment_product_roots_idx",
+                condition=models.Q(parent=None),
+            ),
+        ]
+
     def __str__(self):
         return f"{self.user.username} on {self.product.name}"
+
+
+class ProductRating(models.Model):
+    """
+    rating stats of one product, updated with every new Rate
+    (reconcile_ratings command rebuilds them from the Rate table).
+    count and avg are copied to the product, ProductList orders by them
+    """
+
+    product = models.OneToOneField(
+        Product, on_delete=models.CASCADE, primary_key=True, related_name="rating"
+    )
+    rating_count = models.PositiveIntegerField(default=0)
+    rating_sum = models.PositiveIntegerField(default=0)
+    rating_avg = models.DecimalField(max_digits=3, decimal_places=2, default=0)
+    # histogram: number of rates with each score
+    score_1 = models.PositiveIntegerField(default=0)
+    score_2 = models.PositiveIntegerField(default=0)
+    score_3 = models.PositiveIntegerField(default=0)
+    score_4 = models.PositiveIntegerField(default=0)
+    score_5 = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.product_id}: {self.rating_avg} ({self.rating_count})"
+
+    def histogram(self):
+        return {score: getattr(self, f"score_{score}") for score in range(1, 6)}
+
+    @classmethod
+    def add_score(cls, product_id, score):
+        """
+        count one more rate in a single UPDATE (call inside the Rate transaction)
+        """
+        cls.objects.bulk_create([cls(product_id=product_id)], ignore_conflicts=True)
+        cls.objects.filter(product_id=product_id).update(
+            rating_count=F("rating_count") + 1,
+            rating_sum=F("rating_sum") + score,
+            # right side of an UPDATE sees the old row values
+            rating_avg=Cast(
+                (F("rating_sum") + score) * 1.0 / (F("rating_count") + 1),
+                DecimalField(max_digits=3, decimal_places=2),
+            ),
+            **{f"score_{score}": F(f"score_{score}") + 1},
+        )
+        cls.copy_to_products(Product.objects.filter(pk=product_id))
+
+    @classmethod
+    def copy_to_products(cls, products):
+        """
+        copy rating_count and rating_avg to the products in one UPDATE,
+        NULL for products without a rate
+        """
+        stats = cls.objects.filter(product=OuterRef("pk"), rating_count__gt=0)
+        return products.update(
+            rating_count=Subquery(stats.values("rating_count")),
+            rating_avg=Subquery(stats.values("rating_avg")),
+        )
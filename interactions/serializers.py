@@ -8,6 +8,7 @@ from catalog.serializers import ProductSerializer
 
 class RateSerializer(serializers.ModelSerializer):
     product = serializers.PrimaryKeyRelatedField(queryset=Product.objects.all())
+    nested_relations = {"product": ProductSerializer, "user": UserSerializer}
 
     class Meta:
         model = Rate
@@ -28,6 +29,7 @@ class RateSerializer(serializers.ModelSerializer):
 
 class CommentSerializer(serializers.ModelSerializer):
     product = serializers.PrimaryKeyRelatedField(queryset=Product.objects.all())
+    nested_relations = {"product": ProductSerializer, "parent": "self"}
 
     class Meta:
         model = Comment
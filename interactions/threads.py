@@ -0,0 +1,68 @@
+"""
+comment threads of a product.
+
+load_threads() reads whole threads (root comments and every reply below
+them) with one recursive query and builds the trees in memory. a node is
+only the comment itself, the product is the same for the whole thread:
+
+    {"id", "user", "username", "text", "created_at", "replies": [...]}
+"""
+
+from rest_framework import serializers
+
+from accounts.models import User
+
+from .models import Comment
+
+# replies deeper than this are not loaded (also stops a parent cycle)
+THREAD_MAX_DEPTH = 50
+
+THREAD_SQL = """
+WITH RECURSIVE thread (id, depth) AS (
+    SELECT id, 0 FROM {comment} WHERE id IN ({roots}) AND product_id = %s
+    UNION ALL
+    SELECT reply.id, thread.depth + 1
+    FROM {comment} reply JOIN thread ON reply.parent_id = thread.id
+    WHERE reply.product_id = %s AND thread.depth < %s
+)
+SELECT comment.id, comment.parent_id, comment.user_id, comment.text,
+       comment.created_at, commenter.username, thread.depth
+FROM thread
+JOIN {comment} comment ON comment.id = thread.id
+JOIN {user} commenter ON commenter.id = comment.user_id
+ORDER BY thread.depth, comment.created_at, comment.id
+"""
+
+_datetime = serializers.DateTimeField()
+
+
+def load_threads(product_id, root_ids):
+    """
+    trees of the root comments in root_ids (in that order), replies oldest
+    first. one query however deep the threads are
+    """
+    if not root_ids:
+        return []
+    sql = THREAD_SQL.format(
+        comment=Comment._meta.db_table,
+        user=User._meta.db_table,
+        roots=", ".join(["%s"] * len(root_ids)),
+    )
+    params = [*root_ids, product_id, product_id, THREAD_MAX_DEPTH]
+
+    nodes = {}
+    # ordered by depth, a parent is always seen before its replies
+    for comment in Comment.objects.raw(sql, params):
+        if comment.id in nodes:
+            continue
+        node = nodes[comment.id] = {
+            "id": comment.id,
+            "user": comment.user_id,
+            "username": comment.username,
+            "text": comment.text,
+            "created_at": _datetime.to_representation(comment.created_at),
+            "replies": [],
+        }
+        if comment.depth:
+            nodes[comment.parent_id]["replies"].append(node)
+    return [nodes[pk] for pk in root_ids if pk in nodes]
@@ -1,6 +1,7 @@
 from django.urls import path
 from .views import (
     CommentListView,
+    CommentThreadView,
     CommentDetailView,
     CommentCreateView,
     CommentUpdateView,
@@ -16,6 +17,11 @@ urlpatterns = [
     #this urls is for comment
     path("comments/", CommentListView.as_view(), name="comment-list"),
     path("comments/<int:pk>", CommentDetailView.as_view(), name="comment-detail"),
+    path(
+        "comments/product/<int:product_id>",
+        CommentThreadView.as_view(),
+        name="comment-threads",
+    ),
     path("comments/create", CommentCreateView.as_view(), name="comment-create"),
     path(
         "comments/update/<int:pk>", CommentUpdateView.as_view(), name="comment-update"
@@ -3,10 +3,15 @@ from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.permissions import IsAuthenticated, IsAdminUser
-from .models import Comment, Rate
+from django.db import transaction
+from catalog.cache import invalidate
+from .models import Comment, ProductRating, Rate
 from .serializers import CommentSerializer, RateSerializer
+from .threads import load_threads
 from core.permissions import IsSellerOrAdmin, IsOwnerOrAdmin
-from accounts.views import get_current_user_from_token
+from core.pagination import CreatedAtCursorPagination
+from core.prefetch import optimize_queryset
+from rest_framework.generics import ListAPIView
 from drf_spectacular.utils import extend_schema
 from interactions.models import Product
 
@@ -21,7 +26,7 @@ class CommentCreateView(APIView):
     serializer_class = CommentSerializer
 
     def post(self, request):
-        current_user = get_current_user_from_token(request)
+        current_user = request.user
         serializer = self.serializer_class(data=request.data)
         if serializer.is_valid():
             serializer.save(user=current_user)
@@ -30,18 +35,38 @@ class CommentCreateView(APIView):
 
 
 @extend_schema(tags=["comments"])
-class CommentListView(APIView):
+class CommentListView(ListAPIView):
     """
     all comments
     """
 
     permission_classes = [IsAuthenticated]
     serializer_class = CommentSerializer
+    queryset = optimize_queryset(CommentSerializer)
+    pagination_class = CreatedAtCursorPagination
 
-    def get(self, request):
-        comments = Comment.objects.all()
-        serializer = self.serializer_class(comments, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+
+@extend_schema(tags=["comments"])
+class CommentThreadView(ListAPIView):
+    """
+    comment threads of one product, newest thread first. every page has
+    the whole tree of its root comments without repeating the product
+    """
+
+    permission_classes = [IsAuthenticated]
+    pagination_class = CreatedAtCursorPagination
+
+    def get_queryset(self):
+        return Comment.objects.filter(
+            product_id=self.kwargs["product_id"], parent=None
+        ).only("id", "created_at")
+
+    def list(self, request, product_id):
+        roots = self.paginate_queryset(self.get_queryset())
+        threads = load_threads(product_id, [comment.pk for comment in roots])
+        response = self.get_paginated_response(threads)
+        response.data["product"] = product_id
+        return response
 
 
 @extend_schema(tags=["comments"])
@@ -54,7 +79,7 @@ class CommentDetailView(APIView):
     serializer_class = CommentSerializer
 
     def get(self, request, pk):
-        comment = get_object_or_404(Comment, pk=pk)
+        comment = get_object_or_404(optimize_queryset(self.serializer_class), pk=pk)
         serializer = self.serializer_class(comment)
         return Response(serializer.data, status=status.HTTP_200_OK)
 
@@ -148,8 +173,12 @@ class RateCreateView(APIView):
         }
         srz_data = self.serializer_class(data=data)
         if srz_data.is_valid():
-            srz_data.save(
-                user=user, product=product
-            )  # مقداردهی دستی به فیلدهای read_only
+            # rate and product rating stats are saved together
+            with transaction.atomic():
+                srz_data.save(
+                    user=user, product=product
+                )  # مقداردهی دستی به فیلدهای read_only
+                ProductRating.add_score(product.id, srz_data.validated_data["score"])
+            invalidate("product", product.id)
             return Response(srz_data.data, status=201)
         return Response(srz_data.errors, status=400)
@@ -1,6 +1,6 @@
 
 from django.contrib import admin
-from .models import Coupon, Order
+from .models import Coupon, CouponRedemption, Order, OrderRequest, StockReservation
 
 
 @admin.register(Coupon)
@@ -10,4 +10,11 @@ class CouponAdmin(admin.ModelAdmin):
     search_fields = ("code",)
 
 admin.site.register(Order)
+admin.site.register(CouponRedemption)
+admin.site.register(OrderRequest)
 
+
+@admin.register(StockReservation)
+class StockReservationAdmin(admin.ModelAdmin):
+    list_display = ("order", "product", "count", "status", "expires_at")
+    list_filter = ("status",)
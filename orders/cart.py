@@ -0,0 +1,123 @@
+"""
+server side cart kept in redis, one hash per user:
+
+    cart:<user id> -> {product id: count}
+
+adding, changing and removing a product is one HINCRBY / HSET / HDEL, the
+cart can hold products of many shops. checkout_cart() turns it into one
+order per shop in a single transaction, with every price read by one query.
+"""
+
+from collections import defaultdict
+
+from django.db import transaction
+from django_redis import get_redis_connection
+
+from catalog.models import Product
+
+from .models import Order, OrderItem
+from .stock import reserve_stock
+
+# carts nobody touched for a month are dropped
+CART_TIMEOUT = 60 * 60 * 24 * 30
+CART_MAX_PRODUCTS = 100
+
+
+class CartError(Exception):
+    pass
+
+
+class Cart:
+    def __init__(self, user):
+        self.key = f"cart:{user.pk}"
+        self.client = get_redis_connection("default")
+
+    def items(self):
+        """
+        {product id: count}
+        """
+        return {
+            int(product_id): int(count)
+            for product_id, count in self.client.hgetall(self.key).items()
+        }
+
+    def check_room(self, product_id):
+        """
+        raises CartError when product_id is new and the cart is already full
+        """
+        if not self.client.hexists(self.key, product_id):
+            if self.client.hlen(self.key) >= CART_MAX_PRODUCTS:
+                raise CartError(f"سبد خرید بیشتر از {CART_MAX_PRODUCTS} محصول ندارد")
+
+    def add(self, product_id, count=1):
+        self.check_room(product_id)
+        total = self.client.hincrby(self.key, product_id, count)
+        self.client.expire(self.key, CART_TIMEOUT)
+        return total
+
+    def set(self, product_id, count):
+        if count <= 0:
+            return self.remove(product_id)
+        self.check_room(product_id)
+        self.client.hset(self.key, product_id, count)
+        self.client.expire(self.key, CART_TIMEOUT)
+
+    def remove(self, product_id):
+        self.client.hdel(self.key, product_id)
+
+    def clear(self):
+        self.client.delete(self.key)
+
+
+def price_cart(items):
+    """
+    products of the cart with their current price, one query for all of them.
+    raises CartError when a product is gone or inactive
+    """
+    products = Product.objects.filter(is_active=True).in_bulk(items)
+    missing = sorted(set(items) - set(products))
+    if missing:
+        raise CartError(f"محصولات {missing} موجود نیستند")
+    return products
+
+
+def checkout_cart(user, address, items):
+    """
+    one order per shop for the cart items ({product id: count}), all orders,
+    items and stock reservations in one transaction. returns the orders
+    """
+    if not items:
+        raise CartError("سبد خرید خالی است")
+    products = price_cart(items)
+
+    by_shop = defaultdict(list)
+    for product_id, count in sorted(items.items()):
+        product = products[product_id]
+        by_shop[product.shop_id].append(
+            OrderItem(product=product, count=count, row_price=product.price * count)
+        )
+
+    orders = []
+    for shop_id, shop_items in sorted(by_shop.items()):
+        subtotal = sum(item.row_price for item in shop_items)
+        orders.append(
+            Order(
+                shop_id=shop_id,
+                user=user,
+                address=address,
+                subtotal=subtotal,
+                item_count=sum(item.count for item in shop_items),
+                total_price=subtotal,
+            )
+        )
+
+    with transaction.atomic():
+        Order.objects.bulk_create(orders)
+        order_items = []
+        for order in orders:
+            for item in by_shop[order.shop_id]:
+                item.order = order
+                order_items.append(item)
+        OrderItem.objects.bulk_create(order_items)
+        reserve_stock(order_items)
+    return orders
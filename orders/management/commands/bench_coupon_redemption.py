@@ -0,0 +1,93 @@
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+
+from accounts.models import Address, City, Country, User
+from catalog.models import Shop
+from orders.models import Coupon, CouponError, CouponRedemption, Order, redeem_coupon
+
+
+class Command(BaseCommand):
+    help = (
+        "concurrency benchmark of coupon redemption: many threads redeem one "
+        "coupon with fewer slots than requests, fails if it is ever oversold. "
+        "run it against postgres, it creates and deletes its own rows"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--redemptions", type=int, default=5000)
+        parser.add_argument("--max-usage", type=int, default=1000)
+        parser.add_argument("--threads", type=int, default=32)
+
+    def handle(self, *args, **options):
+        redemptions = options["redemptions"]
+        max_usage = options["max_usage"]
+
+        user, country, coupon = self.create_rows(redemptions, max_usage)
+        try:
+            orders = list(Order.objects.filter(user=user).only("pk"))
+
+            started = time.monotonic()
+            with ThreadPoolExecutor(max_workers=options["threads"]) as executor:
+                results = list(
+                    executor.map(lambda order: self.redeem(order, coupon.code), orders)
+                )
+            elapsed = time.monotonic() - started
+
+            coupon.refresh_from_db()
+            applied = sum(results)
+            recorded = CouponRedemption.objects.filter(coupon=coupon).count()
+            expected = min(redemptions, max_usage)
+
+            self.stdout.write(
+                f"{redemptions} requests in {elapsed:.2f}s "
+                f"({redemptions / elapsed:.0f} redemptions/s), "
+                f"applied {applied}, recorded {recorded}, "
+                f"usage_count {coupon.usage_count}/{coupon.max_usage}"
+            )
+            if not (applied == recorded == coupon.usage_count == expected):
+                raise CommandError("coupon was oversold or slots were lost")
+            self.stdout.write(self.style.SUCCESS("no overselling"))
+        finally:
+            # shop, address and orders go with the user
+            user.delete()
+            country.delete()
+            coupon.delete()
+
+    def create_rows(self, redemptions, max_usage):
+        name = f"bench-{uuid.uuid4().hex[:12]}"
+        user = User.objects.create_user(
+            username=name, email=f"{name}@bench.local", phone=name, password=None
+        )
+        country = Country.objects.create(name=name)
+        city = City.objects.create(name=name, country=country)
+        address = Address.objects.create(user=user, city=city, street=name, zip_code="0")
+        shop = Shop.objects.create(owner=user, name=name, address=address)
+        now = timezone.now()
+        coupon = Coupon.objects.create(
+            code=name,
+            discount_percent=10,
+            valid_from=now - timedelta(hours=1),
+            valid_to=now + timedelta(hours=1),
+            max_usage=max_usage,
+        )
+        Order.objects.bulk_create(
+            [Order(shop=shop, user=user, address=address) for _ in range(redemptions)],
+            batch_size=1000,
+        )
+        return user, country, coupon
+
+    def redeem(self, order, code):
+        try:
+            redeem_coupon(order, code)
+            return True
+        except CouponError:
+            return False
+        finally:
+            # every thread has its own connection
+            connection.close()
@@ -0,0 +1,132 @@
+import random
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError, connection
+from django.db.models import Sum
+from rest_framework.exceptions import ValidationError
+
+from accounts.models import Address, City, Country, User
+from catalog.models import Category, Product, Shop
+from orders.models import StockReservation
+from orders.serializers import OrderSerializer
+
+
+class Command(BaseCommand):
+    help = (
+        "flash sale benchmark of checkout: many threads buy the same few "
+        "products (carts list them in random order), reports checkouts/s and "
+        "fails on overselling or a deadlock. run it against postgres, it "
+        "creates and deletes its own rows"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--checkouts", type=int, default=2000)
+        parser.add_argument("--stock", type=int, default=500)
+        parser.add_argument("--products", type=int, default=1)
+        parser.add_argument("--cart-size", type=int, default=1)
+        parser.add_argument("--threads", type=int, default=32)
+
+    def handle(self, *args, **options):
+        if options["cart_size"] > options["products"]:
+            raise CommandError("--cart-size can not be more than --products")
+
+        user, country, category, shop, address, products = self.create_rows(
+            options["products"], options["stock"]
+        )
+        try:
+            ids = [product.id for product in products]
+            carts = [
+                random.sample(ids, options["cart_size"])
+                for _ in range(options["checkouts"])
+            ]
+
+            started = time.monotonic()
+            with ThreadPoolExecutor(max_workers=options["threads"]) as executor:
+                results = list(
+                    executor.map(
+                        lambda cart: self.checkout(user, shop, address, cart), carts
+                    )
+                )
+            elapsed = time.monotonic() - started
+
+            self.stdout.write(
+                f"{len(carts)} checkouts in {elapsed:.2f}s "
+                f"({len(carts) / elapsed:.0f} checkouts/s), "
+                f"placed {results.count('placed')}, "
+                f"out of stock {results.count('rejected')}, "
+                f"deadlocks {results.count('deadlock')}"
+            )
+            self.check_stock(products, options["stock"])
+            if "deadlock" in results:
+                raise CommandError("checkout deadlocked")
+            self.stdout.write(self.style.SUCCESS("no overselling, no deadlocks"))
+        finally:
+            # shop, products, orders and reservations go with the user
+            user.delete()
+            country.delete()
+            category.delete()
+
+    def create_rows(self, count, stock):
+        name = f"bench-{uuid.uuid4().hex[:12]}"
+        user = User.objects.create_user(
+            username=name, email=f"{name}@bench.local", phone=name, password=None
+        )
+        country = Country.objects.create(name=name)
+        city = City.objects.create(name=name, country=country)
+        address = Address.objects.create(user=user, city=city, street=name, zip_code="0")
+        shop = Shop.objects.create(owner=user, name=name, address=address)
+        category = Category.objects.create(name=name)
+        products = Product.objects.bulk_create(
+            [
+                Product(
+                    shop=shop,
+                    category=category,
+                    name=f"{name}-{i}",
+                    description=name,
+                    price=1,
+                    stock=stock,
+                )
+                for i in range(count)
+            ]
+        )
+        return user, country, category, shop, address, products
+
+    def checkout(self, user, shop, address, cart):
+        serializer = OrderSerializer(
+            data={
+                "shop": shop.id,
+                "address": address.id,
+                "items": [{"product": product_id, "count": 1} for product_id in cart],
+            }
+        )
+        try:
+            serializer.is_valid(raise_exception=True)
+            serializer.save(user=user)
+            return "placed"
+        except ValidationError:
+            return "rejected"
+        except DatabaseError as error:
+            if "deadlock" in str(error).lower():
+                return "deadlock"
+            raise
+        finally:
+            # every thread has its own connection
+            connection.close()
+
+    def check_stock(self, products, stock):
+        held = dict(
+            StockReservation.objects.filter(product__in=products, status="HELD")
+            .values("product")
+            .annotate(total=Sum("count"))
+            .values_list("product", "total")
+        )
+        for product in Product.objects.filter(pk__in=[p.id for p in products]):
+            taken = held.get(product.id, 0)
+            if product.stock + taken != stock or taken > stock:
+                raise CommandError(
+                    f"product {product.id}: stock {product.stock} + held {taken} "
+                    f"is not {stock}"
+                )
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Max
+
+from orders.models import Order, recompute_order_totals
+
+
+class Command(BaseCommand):
+    help = (
+        "recompute subtotal, item count, discount and total of every order "
+        "with set based UPDATEs, one id range at a time"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=10000)
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        last_id = Order.objects.aggregate(last=Max("id"))["last"] or 0
+
+        updated = 0
+        # short transactions over id ranges instead of locking the whole table
+        for start in range(0, last_id, batch_size):
+            with transaction.atomic():
+                updated += recompute_order_totals(
+                    Order.objects.filter(id__gt=start, id__lte=start + batch_size)
+                )
+
+        self.stdout.write(self.style.SUCCESS(f"recomputed {updated} orders"))
@@ -0,0 +1,18 @@
+# Generated by Django 4.2 on 2026-10-18 22:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("orders", "0010_order_updated_idx"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="orderrequest",
+            name="attempts",
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+    ]
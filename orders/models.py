@@ -1,12 +1,16 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Case, DecimalField, F, OuterRef, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce, Now, Round
 from accounts.models import User, Address, Time
 from catalog.models import Product, Shop
 from django.utils import timezone
-from decimal import Decimal
+from decimal import ROUND_HALF_UP, Decimal
 
 
 # orders/models.py
 
+MONEY = DecimalField(decimal_places=2, max_digits=10)
+
 class Coupon(models.Model):
     code = models.CharField(max_length=50, unique=True)
     discount_percent = models.PositiveIntegerField(help_text="persent of coupon")
@@ -22,7 +26,7 @@ class Coupon(models.Model):
 
     def is_valid(self,order_total: Decimal = None):
         now = timezone.now()
-        if not self.active and self.valid_from <= now <= self.valid_to and self.usage_count <= self.max_usage:
+        if not (self.active and self.valid_from <= now <= self.valid_to and self.usage_count < self.max_usage):
             return False
 
         if order_total is not None and order_total < self.min_order_amount:
@@ -34,31 +38,74 @@ class Coupon(models.Model):
     def __str__(self):
         return self.code
 
+    def take_slot(self):
+        """
+        use one redemption of the coupon with a conditional UPDATE,
+        False when it is used up (or expired) - never goes over max_usage
+        """
+        now = timezone.now()
+        return bool(
+            Coupon.objects.filter(
+                pk=self.pk,
+                active=True,
+                valid_from__lte=now,
+                valid_to__gte=now,
+                usage_count__lt=F("max_usage"),
+            ).update(usage_count=F("usage_count") + 1)
+        )
+
+
+class CouponError(Exception):
+    pass
+
 
 
 class Order(Time):
+    STATUS_CHOICES = (
+        ("PENDING", "pending"),
+        ("COMPLETED", "completed"),
+        ("CANCELLED", "cancelled"),
+    )
     shop = models.ForeignKey(Shop, on_delete=models.CASCADE)
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     address = models.ForeignKey(Address, on_delete=models.CASCADE)
     total_price = models.DecimalField(decimal_places=2, max_digits=10, default=0)
+    # snapshot of the items: sum of row prices and sum of counts
+    subtotal = models.DecimalField(decimal_places=2, max_digits=10, default=0)
+    item_count = models.PositiveIntegerField(default=0)
 
     coupon = models.ForeignKey(Coupon, null=True, blank=True, on_delete=models.SET_NULL)
     discount_amount = models.DecimalField(decimal_places=2, max_digits=10, default=0)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default="PENDING")
+
+    class Meta:
+        # keyset pagination (core.pagination)
+        indexes = [
+            models.Index(fields=["-created_at", "-id"], name="order_created_idx"),
+            # watermark of the sales rollups (analytics.rollup)
+            models.Index(fields=["updated_at"], name="order_updated_idx"),
+        ]
 
     def __str__(self):
         return f"Order #{self.id} by {self.user.username}"
 
     def calculate_total_price(self):
         # جمع کل محصولات
-        items_total = sum([
-            item.row_price * item.count for item in self.items.all()
-        ])
-
+        # row_price is already price * count, one aggregate query for all items
+        totals = self.items.aggregate(
+            subtotal=Coalesce(Sum("row_price"), Value(Decimal("0")), output_field=MONEY),
+            item_count=Coalesce(Sum("count"), 0),
+        )
+        self.subtotal = items_total = totals["subtotal"]
+        self.item_count = totals["item_count"]
 
         # محاسبه تخفیف به‌صورت Decimal امن
         if self.coupon and self.coupon.is_valid(order_total=items_total):
             discount_rate = Decimal(self.coupon.discount_percent) / Decimal('100')
-            self.discount_amount = items_total * discount_rate
+            # half up like ROUND() in recompute_order_totals
+            self.discount_amount = (items_total * discount_rate).quantize(
+                Decimal("0.01"), rounding=ROUND_HALF_UP
+            )
         else:
             self.discount_amount = Decimal('0')
 
@@ -69,6 +116,58 @@ class Order(Time):
 
 
 
+def recompute_order_totals(queryset):
+    """
+    recompute subtotal, item_count, discount_amount and total_price of every
+    order in queryset with three set based UPDATEs (no order is loaded)
+    """
+    items = OrderItem.objects.filter(order=OuterRef("pk")).order_by().values("order")
+    queryset.update(
+        subtotal=Coalesce(
+            Subquery(items.annotate(total=Sum("row_price")).values("total")),
+            Value(Decimal("0")),
+            output_field=MONEY,
+        ),
+        item_count=Coalesce(
+            Subquery(items.annotate(total=Sum("count")).values("total")), 0
+        ),
+    )
+
+    coupons = Coupon.objects.filter(pk=OuterRef("coupon_id"))
+    queryset.update(
+        discount_amount=Case(
+            When(
+                coupon__isnull=False,
+                subtotal__gte=Subquery(coupons.values("min_order_amount")),
+                # rounded here, not by the numeric(10,2) cast, so it is the
+                # same half up as calculate_total_price
+                then=Round(
+                    F("subtotal")
+                    * Subquery(coupons.values("discount_percent"))
+                    / Value(Decimal("100")),
+                    2,
+                ),
+            ),
+            default=Value(Decimal("0")),
+            output_field=MONEY,
+        )
+    )
+
+    # separate statement so it sees the new subtotal and discount,
+    # updated_at moves so the sales rollups pick the orders up again
+    return queryset.update(
+        total_price=F("subtotal") - F("discount_amount"), updated_at=Now()
+    )
+
+
+def touch_orders(order_ids):
+    """
+    move updated_at of the orders so the sales rollups rebuild their days,
+    items have no updated_at of their own (call it when an item changes)
+    """
+    return Order.objects.filter(pk__in=order_ids).update(updated_at=Now())
+
+
 class OrderItem(models.Model):
     order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name="items")
     product = models.ForeignKey(Product, on_delete=models.CASCADE)
@@ -91,4 +190,120 @@ class Delivery(models.Model):
         return f"Delivery for Order #{self.order.id} - {self.method}"
 
 
+class CouponRedemption(Time):
+    """
+    one coupon used on one order
+    """
 
+    coupon = models.ForeignKey(
+        Coupon, on_delete=models.CASCADE, related_name="redemptions"
+    )
+    order = models.OneToOneField(
+        Order, on_delete=models.CASCADE, related_name="redemption"
+    )
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    discount_amount = models.DecimalField(decimal_places=2, max_digits=10, default=0)
+
+    def __str__(self):
+        return f"{self.coupon.code} on Order #{self.order_id}"
+
+
+def redeem_coupon(order, code):
+    """
+    apply coupon `code` to order: the order row is locked, one slot of the
+    coupon is taken with a conditional UPDATE and the redemption is recorded,
+    all in one transaction. raises CouponError when it cant be applied
+    """
+    with transaction.atomic():
+        order = Order.objects.select_for_update().get(pk=order.pk)
+        if order.coupon_id:
+            raise CouponError("این سفارش قبلا کد تخفیف دارد")
+
+        coupon = Coupon.objects.filter(code=code).first()
+        if coupon is None:
+            raise CouponError("کد تخفیف نامعتبر است")
+
+        order.coupon = coupon
+        order.calculate_total_price()
+        if not coupon.is_valid(order_total=order.subtotal) or not coupon.take_slot():
+            raise CouponError("کد تخفیف معتبر نیست")
+
+        order.save(
+            update_fields=[
+                "coupon",
+                "subtotal",
+                "item_count",
+                "discount_amount",
+                "total_price",
+                "updated_at",
+            ]
+        )
+        CouponRedemption.objects.create(
+            coupon=coupon,
+            order=order,
+            user=order.user,
+            discount_amount=order.discount_amount,
+        )
+    return order
+
+
+class StockReservation(Time):
+    """
+    units of one product held for an order (ledger of orders.stock)
+    """
+
+    STATUS_CHOICES = (
+        ("HELD", "held"),
+        ("COMMITTED", "committed"),
+        ("RELEASED", "released"),
+    )
+    order = models.ForeignKey(
+        Order, on_delete=models.CASCADE, related_name="reservations"
+    )
+    product = models.ForeignKey(
+        Product, on_delete=models.CASCADE, related_name="reservations"
+    )
+    count = models.PositiveIntegerField()
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default="HELD")
+    expires_at = models.DateTimeField()
+
+    class Meta:
+        # release_expired_reservations looks up held rows past expires_at
+        indexes = [
+            models.Index(fields=["status", "expires_at"], name="reservation_expiry_idx")
+        ]
+
+    def __str__(self):
+        return f"{self.count} x {self.product_id} for Order #{self.order_id}"
+
+
+class OrderRequest(Time):
+    """
+    checkout queued for the orders celery worker (async OrderCreate),
+    payload is the validated request body
+    """
+
+    STATUS_CHOICES = (
+        ("QUEUED", "queued"),
+        ("PROCESSING", "processing"),
+        ("DONE", "done"),
+        ("FAILED", "failed"),
+    )
+    user = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name="order_requests"
+    )
+    payload = models.JSONField()
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default="QUEUED")
+    order = models.OneToOneField(
+        Order,
+        null=True,
+        blank=True,
+        on_delete=models.SET_NULL,
+        related_name="order_request",
+    )
+    errors = models.JSONField(null=True, blank=True)
+    # how many times a worker took the request (orders.tasks.place_order)
+    attempts = models.PositiveSmallIntegerField(default=0)
+
+    def __str__(self):
+        return f"OrderRequest #{self.id} ({self.status})"
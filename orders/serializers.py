@@ -1,7 +1,10 @@
+from django.db import transaction
 from rest_framework import serializers
 
 from catalog.models import Product
-from .models import Order, OrderItem, Delivery,Coupon
+from catalog.serializers import BulkPrimaryKeyRelatedField
+from .models import Order, OrderItem, Delivery,Coupon, OrderRequest
+from .stock import StockError, reserve_stock
 
 
 class ApplyCouponSerializer(serializers.Serializer):
@@ -22,13 +25,17 @@ class ApplyCouponSerializer(serializers.Serializer):
 
 
 class OrderItemSerializer(serializers.ModelSerializer):
-    product = serializers.PrimaryKeyRelatedField(queryset=Product.objects.all())
+    # in OrderSerializer the products come from one query for the whole cart
+    product = BulkPrimaryKeyRelatedField("products", queryset=Product.objects.all())
     order = serializers.PrimaryKeyRelatedField(read_only=True)
 
     class Meta:
         model = OrderItem
         fields = ["product", "count", "row_price", "order"]
-        extra_kwargs = {"row_price": {"read_only": True}}
+        extra_kwargs = {
+            "row_price": {"read_only": True},
+            "count": {"min_value": 1},
+        }
 
 
 class OrderSerializer(serializers.ModelSerializer):
@@ -36,28 +43,135 @@ class OrderSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Order
-        fields = ["shop", "user", "address", "items", "total_price"]
-        extra_kwargs = {"user": {"read_only": True}, "total_price": {"read_only": True}}
+        fields = [
+            "shop",
+            "user",
+            "address",
+            "items",
+            "subtotal",
+            "item_count",
+            "total_price",
+            "status",
+        ]
+        extra_kwargs = {
+            "user": {"read_only": True},
+            "status": {"read_only": True},
+            "subtotal": {"read_only": True},
+            "item_count": {"read_only": True},
+            "total_price": {"read_only": True},
+        }
+
+    def to_internal_value(self, data):
+        # load every product of the cart with one IN query
+        items = data.get("items") if hasattr(data, "get") else None
+        if isinstance(items, list):
+            ids = set()
+            for item in items:
+                try:
+                    ids.add(int(item["product"]))
+                except (KeyError, TypeError, ValueError):
+                    pass
+            self.context["products"] = Product.objects.in_bulk(ids)
+        return super().to_internal_value(data)
 
     def create(self, validated_data):
         items_data = validated_data.pop("items")
-        order = Order.objects.create(**validated_data)
-
-        total_price = 0
-        for item_data in items_data:
-            product = item_data["product"]
-            count = item_data["count"]
-            row_price = product.price * count
-            OrderItem.objects.create(
-                order=order, product=product, count=count, row_price=row_price
+
+        items = [
+            OrderItem(
+                product=item_data["product"],
+                count=item_data["count"],
+                row_price=item_data["product"].price * item_data["count"],
             )
-            total_price += row_price
+            for item_data in items_data
+        ]
+        subtotal = sum(item.row_price for item in items)
 
-        order.total_price = total_price
-        order.save()
+        # order, items and stock reservations are written together or not at all
+        try:
+            with transaction.atomic():
+                order = Order.objects.create(
+                    **validated_data,
+                    subtotal=subtotal,
+                    item_count=sum(item.count for item in items),
+                    total_price=subtotal,
+                )
+                for item in items:
+                    item.order = order
+                OrderItem.objects.bulk_create(items)
+                reserve_stock(items)
+        except StockError as error:
+            raise serializers.ValidationError({"items": [str(error)]})
         return order
 
 
+class OrderRequestItemSerializer(serializers.Serializer):
+    product = serializers.IntegerField(min_value=1)
+    count = serializers.IntegerField(min_value=1)
+
+
+class OrderRequestSerializer(serializers.ModelSerializer):
+    """
+    async checkout: only the shape of the body is checked here (no queries),
+    products, stock and coupon are checked by the worker (orders.tasks)
+    """
+
+    shop = serializers.IntegerField(min_value=1, write_only=True)
+    address = serializers.IntegerField(min_value=1, write_only=True)
+    items = OrderRequestItemSerializer(many=True, allow_empty=False, write_only=True)
+    coupon = serializers.CharField(required=False, write_only=True)
+    delivery = serializers.ChoiceField(
+        choices=Delivery.METHOD_CHOICES, required=False, write_only=True
+    )
+
+    class Meta:
+        model = OrderRequest
+        fields = [
+            "id",
+            "status",
+            "order",
+            "errors",
+            "created_at",
+            "shop",
+            "address",
+            "items",
+            "coupon",
+            "delivery",
+        ]
+        read_only_fields = ["status", "order", "errors"]
+
+    def create(self, validated_data):
+        user = validated_data.pop("user")
+        return OrderRequest.objects.create(user=user, payload=validated_data)
+
+
+class CartItemSerializer(serializers.Serializer):
+    product = serializers.IntegerField(min_value=1)
+    count = serializers.IntegerField(min_value=1, max_value=1000)
+
+
+class CartCheckoutSerializer(serializers.Serializer):
+    address = serializers.IntegerField(min_value=1)
+
+
+class CartOrderSerializer(serializers.ModelSerializer):
+    """
+    one of the per shop orders of a cart checkout
+    """
+
+    class Meta:
+        model = Order
+        fields = [
+            "id",
+            "shop",
+            "address",
+            "subtotal",
+            "item_count",
+            "total_price",
+            "status",
+        ]
+
+
 class DeliverySerializer(serializers.ModelSerializer):
     class Meta:
         model = Delivery
@@ -0,0 +1,137 @@
+"""
+stock reservations of checkout.
+
+product.stock is what is left to sell. reserve_stock() takes the units of
+new orders out with one conditional UPDATE per product (stock >= count, so it
+can never go below zero) and writes HELD reservations that expire after
+settings.STOCK_RESERVATION_TTL. complete_order() commits them,
+cancel_order() puts the units back; pending orders whose reservations
+expired are cancelled by release_expired_reservations().
+
+locks are always taken in the same order: the order row first, then the
+product rows in ascending id. two checkouts of the same products can wait
+on each other but never deadlock.
+"""
+
+from collections import Counter
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from catalog.cache import invalidate_many
+from catalog.models import Product
+
+from .models import Order, StockReservation
+
+
+class StockError(Exception):
+    pass
+
+
+def reserve_stock(items):
+    """
+    hold stock for the items (OrderItem objects, order and product set) of
+    new orders, has to run in the transaction that creates the orders.
+    items of several orders (cart checkout) are reserved in one pass so the
+    products are still locked in ascending id. products without stock
+    tracking are skipped. raises StockError when one product is short
+    """
+    counts = Counter()
+    held = Counter()
+    for item in items:
+        if item.product.stock is not None:
+            counts[item.product_id] += item.count
+            held[item.order_id, item.product_id] += item.count
+    if not counts:
+        return []
+
+    for product_id in sorted(counts):
+        taken = Product.objects.filter(
+            pk=product_id, stock__gte=counts[product_id]
+        ).update(stock=F("stock") - counts[product_id])
+        if not taken:
+            raise StockError(f"موجودی محصول {product_id} کافی نیست")
+
+    expires_at = timezone.now() + settings.STOCK_RESERVATION_TTL
+    reservations = StockReservation.objects.bulk_create(
+        [
+            StockReservation(
+                order_id=order_id,
+                product_id=product_id,
+                count=count,
+                expires_at=expires_at,
+            )
+            for (order_id, product_id), count in sorted(held.items())
+        ]
+    )
+    invalidate_many("product", list(counts))
+    return reservations
+
+
+def _lock_pending(order):
+    return (
+        Order.objects.select_for_update().filter(pk=order.pk, status="PENDING").first()
+    )
+
+
+def complete_order(order):
+    """
+    commit the held stock of a pending order and mark it completed,
+    False when the order is not pending anymore
+    """
+    with transaction.atomic():
+        order = _lock_pending(order)
+        if order is None:
+            return False
+
+        order.reservations.filter(status="HELD").update(status="COMMITTED")
+        order.status = "COMPLETED"
+        order.save(update_fields=["status", "updated_at"])
+    return True
+
+
+def cancel_order(order):
+    """
+    put the held stock of a pending order back and mark it cancelled,
+    False when the order is not pending anymore
+    """
+    with transaction.atomic():
+        order = _lock_pending(order)
+        if order is None:
+            return False
+
+        held = order.reservations.filter(status="HELD")
+        counts = Counter()
+        for product_id, count in held.values_list("product_id", "count"):
+            counts[product_id] += count
+
+        for product_id in sorted(counts):
+            Product.objects.filter(pk=product_id).update(
+                stock=F("stock") + counts[product_id]
+            )
+        held.update(status="RELEASED")
+        invalidate_many("product", list(counts))
+
+        order.status = "CANCELLED"
+        order.save(update_fields=["status", "updated_at"])
+    return True
+
+
+def release_expired_reservations():
+    """
+    cancel every pending order with an expired reservation, one short
+    transaction per order. returns how many orders were cancelled
+    """
+    order_ids = list(
+        StockReservation.objects.filter(
+            status="HELD", expires_at__lt=timezone.now(), order__status="PENDING"
+        )
+        .order_by("order_id")
+        .values_list("order_id", flat=True)
+        .distinct()
+    )
+    # cancel_order checks the status again under the lock, an order
+    # completed in the meantime is left alone
+    return sum(cancel_order(Order(pk=order_id)) for order_id in order_ids)
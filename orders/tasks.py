@@ -0,0 +1,119 @@
+from celery import shared_task
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+
+from .models import CouponError, Delivery, OrderRequest, redeem_coupon
+from .serializers import OrderSerializer
+from .stock import release_expired_reservations
+
+# a request is failed after this many workers took it
+PLACE_ORDER_MAX_ATTEMPTS = 3
+# seconds before the worker kills a checkout, has to stay well below
+# settings.ORDER_REQUEST_TIMEOUT so a reclaimed request is not still running
+PLACE_ORDER_TIME_LIMIT = 60
+
+PLACE_ORDER_ERROR = {"detail": ["checkout failed, please try again"]}
+
+
+@shared_task
+def release_expired_stock():
+    """
+    give back the stock of pending orders that were not completed in time
+    """
+    return release_expired_reservations()
+
+
+@shared_task(
+    bind=True,
+    max_retries=None,
+    default_retry_delay=10,
+    time_limit=PLACE_ORDER_TIME_LIMIT,
+)
+def place_order(self, order_request_id):
+    """
+    checkout of an async OrderCreate: pricing, stock reservation, coupon
+    and delivery, all in one transaction. runs on the "orders" queue
+    """
+    # the broker can deliver a task twice, only the worker that moves the
+    # request out of QUEUED runs it
+    if not OrderRequest.objects.filter(pk=order_request_id, status="QUEUED").update(
+        status="PROCESSING", attempts=F("attempts") + 1, updated_at=timezone.now()
+    ):
+        return None
+
+    try:
+        return checkout(order_request_id)
+    except Exception as error:
+        # database error, lost connection...: nothing was written, the request
+        # goes back to the queue and fails after the last attempt. when even
+        # this update fails the request is left to reclaim_order_requests
+        processing = OrderRequest.objects.filter(
+            pk=order_request_id, status="PROCESSING"
+        )
+        if processing.filter(attempts__lt=PLACE_ORDER_MAX_ATTEMPTS).update(
+            status="QUEUED", updated_at=timezone.now()
+        ):
+            raise self.retry(exc=error)
+        processing.update(
+            status="FAILED", errors=PLACE_ORDER_ERROR, updated_at=timezone.now()
+        )
+        raise
+
+
+def checkout(order_request_id):
+    order_request = OrderRequest.objects.select_related("user").get(pk=order_request_id)
+    payload = order_request.payload
+    serializer = OrderSerializer(
+        data={
+            "shop": payload["shop"],
+            "address": payload["address"],
+            "items": payload["items"],
+        }
+    )
+    fields = ["status", "order", "errors", "updated_at"]
+    try:
+        with transaction.atomic():
+            serializer.is_valid(raise_exception=True)
+            order = serializer.save(user=order_request.user)
+            if payload.get("coupon"):
+                order = redeem_coupon(order, payload["coupon"])
+            if payload.get("delivery"):
+                Delivery.objects.create(order=order, method=payload["delivery"])
+            # saved with the order, a request still PROCESSING never has one
+            order_request.status, order_request.order = "DONE", order
+            order_request.save(update_fields=fields)
+    except ValidationError as error:
+        order_request.status, order_request.errors = "FAILED", error.detail
+    except CouponError as error:
+        order_request.status, order_request.errors = "FAILED", {"coupon": [str(error)]}
+    else:
+        return order.id
+
+    order_request.save(update_fields=fields)
+    return None
+
+
+@shared_task
+def reclaim_order_requests():
+    """
+    requests still PROCESSING after settings.ORDER_REQUEST_TIMEOUT lost their
+    worker (killed, crashed), they are queued again or failed after the last
+    attempt. returns how many were queued again
+    """
+    now = timezone.now()
+    stuck = OrderRequest.objects.filter(
+        status="PROCESSING", updated_at__lt=now - settings.ORDER_REQUEST_TIMEOUT
+    )
+    stuck.filter(attempts__gte=PLACE_ORDER_MAX_ATTEMPTS).update(
+        status="FAILED", errors=PLACE_ORDER_ERROR, updated_at=now
+    )
+    ids = list(stuck.values_list("pk", flat=True))
+    OrderRequest.objects.filter(pk__in=ids, status="PROCESSING").update(
+        status="QUEUED", updated_at=now
+    )
+    for pk in ids:
+        place_order.delay(pk)
+    return len(ids)
@@ -4,9 +4,12 @@ from interactions.urls import app_name
 from .views import (
     OrderList,
     OrderDetail,
+    OrderExport,
     OrderCreate,
     OrderUpdate,
     OrderDelete,
+    OrderComplete,
+    OrderRequestDetail,
     OrderItemList,
     OrderItemDetail,
     OrderItemUpdate,
@@ -16,6 +19,10 @@ from .views import (
     DeliveryList,
     DeliveryDetail,
     CouponView,
+    CartDetail,
+    CartItemAdd,
+    CartItemDetail,
+    CartCheckout,
 )
 
 app_name = "orders"
@@ -26,10 +33,25 @@ urlpatterns = [
     path("order", OrderList.as_view(), name="order-list"),
     path("order/<int:pk>", OrderDetail.as_view(), name="order-detail"),
     path("order/create", OrderCreate.as_view(), name="order-create"),
+    path("order/export", OrderExport.as_view(), name="order-export"),
     path("order/update/<int:pk>", OrderUpdate.as_view(), name="order-update"),
     path("order/delete/<int:pk>", OrderDelete.as_view(), name="order-delete"),
+    path("order/complete/<int:pk>", OrderComplete.as_view(), name="order-complete"),
+    path(
+        "order/requests/<int:pk>",
+        OrderRequestDetail.as_view(),
+        name="order-request-detail",
+    ),
     path('orders/copen/<int:order_id>/', CouponView.as_view(), name='apply-coupon'),
 
+    #this url is for cart
+    path("cart", CartDetail.as_view(), name="cart-detail"),
+    path("cart/items", CartItemAdd.as_view(), name="cart-item-add"),
+    path(
+        "cart/items/<int:product_id>", CartItemDetail.as_view(), name="cart-item-detail"
+    ),
+    path("cart/checkout", CartCheckout.as_view(), name="cart-checkout"),
+
     #this url is for orderitem
     path("orderitem", OrderItemList.as_view(), name="orderitem-list"),
     path("orderitem/<int:pk>", OrderItemDetail.as_view(), name="orderitem-detail"),
@@ -2,35 +2,81 @@ from rest_framework import serializers
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
+from django.conf import settings
+from django.db import transaction
 from django.shortcuts import get_object_or_404
+from django.urls import reverse
 from rest_framework.permissions import IsAuthenticated, IsAdminUser
-from accounts.views import get_current_user_from_token
-from .models import Order, OrderItem, Delivery,Coupon
+from .models import (
+    Order,
+    OrderItem,
+    OrderRequest,
+    Delivery,
+    Coupon,
+    CouponError,
+    redeem_coupon,
+    touch_orders,
+)
 from .serializers import (
     OrderSerializer,
     OrderItem,
     DeliverySerializer,
     OrderItemSerializer,
     ApplyCouponSerializer,
+    OrderRequestSerializer,
+    CartItemSerializer,
+    CartCheckoutSerializer,
+    CartOrderSerializer,
 )
-from core.permissions import IsOwnerOrAdmin, IsSellerOrAdmin
+from .cart import Cart, CartError, checkout_cart
+from .stock import StockError
+from .tasks import place_order
+from accounts.models import Address
+from catalog.models import Product
+from .stock import cancel_order, complete_order
+from core.permissions import IsOwnerOrAdmin, IsSellerOrAdmin, OwnerPath
+from core.export import export_response
+from core.idempotency import idempotent
+from core.pagination import CreatedAtCursorPagination
+from core.prefetch import optimize_queryset
+from rest_framework.generics import ListAPIView
 from drf_spectacular.utils import extend_schema
 
 
 @extend_schema(tags=["order"])
-class OrderList(APIView):
+class OrderList(ListAPIView):
     """
     list all orders
     """
 
     permission_classes = [IsAdminUser]
     serializer_class = OrderSerializer
+    queryset = optimize_queryset(OrderSerializer)
+    pagination_class = CreatedAtCursorPagination
+
+
+@extend_schema(tags=["order"])
+class OrderExport(APIView):
+    """
+    stream all orders as ndjson (or ?output=csv for gzip csv)
+    """
+
+    permission_classes = [IsAdminUser]
+    fields = [
+        "id",
+        "shop_id",
+        "user_id",
+        "address_id",
+        "coupon_id",
+        "total_price",
+        "discount_amount",
+        "status",
+        "created_at",
+        "updated_at",
+    ]
 
     def get(self, request):
-        orders = Order.objects.all()
-        self.check_object_permissions(request, orders)
-        serializers = self.serializer_class(orders, many=True)
-        return Response(serializers.data)
+        return export_response(request, Order.objects.all(), self.fields, "orders")
 
 
 @extend_schema(tags=["order"])
@@ -41,9 +87,10 @@ class OrderDetail(APIView):
 
     permission_classes = [IsOwnerOrAdmin]
     serializer_class = OrderSerializer
+    owner_path = OwnerPath("user")
 
     def get(self, request, pk):
-        order = get_object_or_404(Order, pk=pk)
+        order = get_object_or_404(optimize_queryset(self.serializer_class), pk=pk)
         self.check_object_permissions(request, order)
         serializer = self.serializer_class(order)
         return Response(serializer.data)
@@ -52,20 +99,59 @@ class OrderDetail(APIView):
 @extend_schema(tags=["order"])
 class OrderCreate(APIView):
     """
-    create a new order
+    create a new order. with `Prefer: respond-async` (or ORDER_ASYNC_CHECKOUT)
+    the order is queued for the orders worker and 202 comes back with a status url
     """
 
     permission_classes = [IsAuthenticated]
     serializer_class = OrderSerializer
 
+    @idempotent
     def post(self, request):
-        currentUser = get_current_user_from_token(request)
+        if settings.ORDER_ASYNC_CHECKOUT or "respond-async" in request.headers.get(
+            "Prefer", ""
+        ):
+            return self.enqueue(request)
+
+        currentUser = request.user
         serializers = self.serializer_class(data=request.data)
         if serializers.is_valid():
             serializers.save(user=currentUser)
             return Response(serializers.data, status=status.HTTP_201_CREATED)
         return Response(serializers.errors, status=status.HTTP_400_BAD_REQUEST)
 
+    def enqueue(self, request):
+        serializer = OrderRequestSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        order_request = serializer.save(user=request.user)
+        transaction.on_commit(lambda: place_order.delay(order_request.pk))
+
+        url = reverse("orders:order-request-detail", kwargs={"pk": order_request.pk})
+        return Response(
+            {**serializer.data, "status_url": request.build_absolute_uri(url)},
+            status=status.HTTP_202_ACCEPTED,
+            headers={"Location": url},
+        )
+
+
+@extend_schema(tags=["order"])
+class OrderRequestDetail(APIView):
+    """
+    status of an async order create
+    """
+
+    permission_classes = [IsOwnerOrAdmin]
+    serializer_class = OrderRequestSerializer
+    owner_path = OwnerPath("user")
+
+    def get(self, request, pk):
+        order_request = get_object_or_404(OrderRequest, pk=pk)
+        self.check_object_permissions(request, order_request)
+        serializer = self.serializer_class(order_request)
+        return Response(serializer.data)
+
 
 @extend_schema(tags=["order"])
 class OrderUpdate(APIView):
@@ -75,6 +161,7 @@ class OrderUpdate(APIView):
 
     permission_classes = [IsOwnerOrAdmin]
     serializer_class = OrderSerializer
+    owner_path = OwnerPath("user")
 
     def put(self, request, pk):
         queryset = get_object_or_404(Order, pk=pk)
@@ -86,24 +173,182 @@ class OrderUpdate(APIView):
         return Response(serializers.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
+@extend_schema(tags=["order"])
+class OrderComplete(APIView):
+    """
+    complete a pending order, its held stock is committed
+    """
+
+    permission_classes = [IsAdminUser]
+    serializer_class = OrderSerializer
+
+    def post(self, request, pk):
+        order = get_object_or_404(Order, pk=pk)
+        if not complete_order(order):
+            return Response(
+                {"error": "سفارش در انتظار نیست"}, status=status.HTTP_400_BAD_REQUEST
+            )
+        order.refresh_from_db()
+        return Response(self.serializer_class(order).data, status=status.HTTP_200_OK)
+
+
 @extend_schema(tags=["order"])
 class OrderDelete(APIView):
     """
-    delete an order
+    cancel an order, its held stock goes back to the products
     """
 
     permission_classes = [IsOwnerOrAdmin]
     serializer_class = OrderSerializer
+    owner_path = OwnerPath("user")
 
     def delete(self, request, pk):
         object = get_object_or_404(Order, pk=pk)
         self.check_object_permissions(request, object)
-        object.is_active = False
-        object.save()
+        if not cancel_order(object):
+            return Response(
+                {"error": "سفارش در انتظار نیست"}, status=status.HTTP_400_BAD_REQUEST
+            )
+        object.refresh_from_db()
         srz_data = self.serializer_class(object)
         return Response(srz_data.data, status=status.HTTP_204_NO_CONTENT)
 
 
+@extend_schema(tags=["cart"])
+class CartDetail(APIView):
+    """
+    cart of the user grouped by shop, or empty it with delete
+    """
+
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        items = Cart(request.user).items()
+        products = Product.objects.filter(is_active=True).in_bulk(items)
+
+        shops = {}
+        for product_id, count in sorted(items.items()):
+            product = products.get(product_id)
+            if product is None:
+                continue
+            shop = shops.setdefault(
+                product.shop_id, {"shop": product.shop_id, "items": [], "subtotal": 0}
+            )
+            row_price = product.price * count
+            shop["items"].append(
+                {
+                    "product": product.id,
+                    "name": product.name,
+                    "price": product.price,
+                    "count": count,
+                    "row_price": row_price,
+                }
+            )
+            shop["subtotal"] += row_price
+
+        return Response(
+            {
+                "shops": list(shops.values()),
+                "total": sum(shop["subtotal"] for shop in shops.values()),
+                "unavailable": sorted(set(items) - set(products)),
+            }
+        )
+
+    def delete(self, request):
+        Cart(request.user).clear()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+@extend_schema(tags=["cart"])
+class CartItemAdd(APIView):
+    """
+    add a product to the cart (count is added to what is already there)
+    """
+
+    permission_classes = [IsAuthenticated]
+    serializer_class = CartItemSerializer
+
+    def post(self, request):
+        serializer = self.serializer_class(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        product_id, count = (
+            serializer.validated_data["product"],
+            serializer.validated_data["count"],
+        )
+        get_object_or_404(Product, pk=product_id, is_active=True)
+        try:
+            count = Cart(request.user).add(product_id, count)
+        except CartError as error:
+            return Response({"error": str(error)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(
+            {"product": product_id, "count": count}, status=status.HTTP_200_OK
+        )
+
+
+@extend_schema(tags=["cart"])
+class CartItemDetail(APIView):
+    """
+    change the count of a product in the cart, or remove it
+    """
+
+    permission_classes = [IsAuthenticated]
+    serializer_class = CartItemSerializer
+
+    def put(self, request, product_id):
+        serializer = self.serializer_class(
+            data={"product": product_id, "count": request.data.get("count")}
+        )
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        count = serializer.validated_data["count"]
+        # same checks as CartItemAdd, a zero count only removes the product
+        if count > 0:
+            get_object_or_404(Product, pk=product_id, is_active=True)
+        try:
+            Cart(request.user).set(product_id, count)
+        except CartError as error:
+            return Response({"error": str(error)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(serializer.data, status=status.HTTP_200_OK)
+
+    def delete(self, request, product_id):
+        Cart(request.user).remove(product_id)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+@extend_schema(tags=["cart"])
+class CartCheckout(APIView):
+    """
+    place the cart: one order per shop, created together in one transaction
+    """
+
+    permission_classes = [IsAuthenticated]
+    serializer_class = CartCheckoutSerializer
+
+    @idempotent
+    def post(self, request):
+        serializer = self.serializer_class(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        address = get_object_or_404(
+            Address, pk=serializer.validated_data["address"], user=request.user
+        )
+
+        cart = Cart(request.user)
+        try:
+            orders = checkout_cart(request.user, address, cart.items())
+        except (CartError, StockError) as error:
+            return Response({"error": str(error)}, status=status.HTTP_400_BAD_REQUEST)
+
+        cart.clear()
+        return Response(
+            {"orders": CartOrderSerializer(orders, many=True).data},
+            status=status.HTTP_201_CREATED,
+        )
+
+
 @extend_schema(tags=["orderitem"])
 class OrderItemList(APIView):
     """
@@ -112,11 +357,12 @@ class OrderItemList(APIView):
 
     permission_classes = [IsAdminUser]
     serializer_class = OrderItemSerializer
+    owner_path = OwnerPath("order__user")
 
     def get(self, request):
-        queryset = OrderItem.objects.all()
-        for obj in queryset:
-            self.check_object_permissions(request, obj)
+        queryset = self.owner_path.scope(
+            optimize_queryset(self.serializer_class), request.user
+        )
         srz_data = self.serializer_class(queryset, many=True)
         return Response(srz_data.data)
 
@@ -129,9 +375,12 @@ class OrderItemDetail(APIView):
 
     permission_classes = [IsOwnerOrAdmin]
     serializer_class = OrderItemSerializer
+    owner_path = OwnerPath("order__user")
 
     def get(self, request, pk):
-        orderitem = get_object_or_404(OrderItem, pk=pk)
+        orderitem = get_object_or_404(
+            self.owner_path.prepare(optimize_queryset(self.serializer_class)), pk=pk
+        )
         self.check_object_permissions(request, orderitem)
         serializers = self.serializer_class(orderitem)
         return Response(serializers.data)
@@ -145,13 +394,16 @@ class OrderItemUpdate(APIView):
 
     permission_classes = [IsOwnerOrAdmin]
     serializer_class = OrderItemSerializer
+    owner_path = OwnerPath("order__user")
 
     def put(self, request, pk):
-        queryset = get_object_or_404(OrderItem, pk=pk)
+        queryset = get_object_or_404(self.owner_path.prepare(OrderItem.objects), pk=pk)
         self.check_object_permissions(request, queryset)
         srz_data = self.serializer_class(queryset, data=request.data, partial=True)
         if srz_data.is_valid():
-            srz_data.save()
+            with transaction.atomic():
+                srz_data.save()
+                touch_orders([queryset.order_id])
             return Response(srz_data.data, status=status.HTTP_200_OK)
         return Response(srz_data.errors, status=status.HTTP_400_BAD_REQUEST)
 
@@ -164,12 +416,15 @@ class OrderItemDelete(APIView):
 
     permission_classes = [IsOwnerOrAdmin]
     serializer_class = OrderItemSerializer
+    owner_path = OwnerPath("order__user")
 
     def delete(self, request, pk):
-        object = get_object_or_404(OrderItem, pk=pk)
+        object = get_object_or_404(self.owner_path.prepare(OrderItem.objects), pk=pk)
         self.check_object_permissions(request, object)
         object.is_active = False
-        object.save()
+        with transaction.atomic():
+            object.save()
+            touch_orders([object.order_id])
         srz_data = self.serializer_class(object)
         return Response(srz_data.data, status=status.HTTP_200_OK)
 
@@ -177,14 +432,15 @@ class OrderItemDelete(APIView):
 @extend_schema(tags=["Delivery"])
 class DeliveryList(APIView):
     """
-    list all deliveries
+    list deliveries of the user's orders (every delivery for admins)
     """
 
     permission_classes = [IsAuthenticated]
     serializer_class = DeliverySerializer
+    owner_path = OwnerPath("order__user")
 
     def get(self, request):
-        queryset = Delivery.objects.all()
+        queryset = self.owner_path.scope(Delivery.objects.all(), request.user)
         srz_data = self.serializer_class(queryset, many=True)
         return Response(srz_data.data)
 
@@ -233,7 +489,9 @@ class DeliveryDelete(APIView):
     def delete(self, request, pk):
         object = get_object_or_404(Delivery, pk=pk)
         object.is_active = False
-        object.save()
+        with transaction.atomic():
+            object.save()
+            touch_orders([object.order_id])
         srz_data = self.serializer_class(object)
         return Response(srz_data.data, status=status.HTTP_200_OK)
 
@@ -243,22 +501,18 @@ class CouponView(APIView):
     serializer_class = ApplyCouponSerializer
     permission_classes = [IsAuthenticated]
 
+    @idempotent
     def post(self, request, order_id):
         serializer = self.serializer_class(data=request.data)
         if serializer.is_valid():
             code = serializer.validated_data['code']
             order = get_object_or_404(Order, id=order_id, user=request.user)
-            coupon = Coupon.objects.get(code=code)
-
-            if not coupon.is_valid():
-                return Response({"error": "کد تخفیف معتبر نیست"}, status=400)
-
-            order.coupon = coupon
-            order.calculate_total_price()  # محاسبه قیمت نهایی با تخفیف
-            order.save()
 
-            coupon.usage_count += 1
-            coupon.save()
+            # atomic: usage_count can not go over max_usage under concurrent requests
+            try:
+                order = redeem_coupon(order, code)  # محاسبه قیمت نهایی با تخفیف
+            except CouponError as error:
+                return Response({"error": str(error)}, status=400)
 
             return Response({
                 "message": "کد تخفیف با موفقیت اعمال شد",
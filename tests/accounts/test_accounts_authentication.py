@@ -0,0 +1,157 @@
+import pytest
+from django.core.cache import cache
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import AccessToken
+
+from core.authentication import (
+    RoleTokenObtainPairSerializer,
+    _cache_key,
+    get_cached_user,
+)
+
+
+@pytest.fixture
+def url():
+    # admin only, a regular user is rejected right after authentication
+    return reverse("analytics:sales")
+
+
+@pytest.fixture
+def claims_client(regular_user):
+    client = APIClient()
+    token = RoleTokenObtainPairSerializer.get_token(regular_user).access_token
+    client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+    return client
+
+
+@pytest.mark.django_db
+class TestCachedJWTAuthentication:
+    """
+    test the jwt user is cached between requests
+    """
+
+    def test_user_is_loaded_once(
+        self, token_regular_user_client, url, django_assert_num_queries
+    ):
+        with django_assert_num_queries(1):
+            token_regular_user_client.get(url)
+        with django_assert_num_queries(0):
+            response = token_regular_user_client.get(url)
+        assert response.status_code == status.HTTP_403_FORBIDDEN
+
+    # test the password hash is not kept in the cache
+    def test_password_is_not_cached(self, token_regular_user_client, regular_user, url):
+        token_regular_user_client.get(url)
+
+        values = cache.get(_cache_key(regular_user.pk))
+        assert "password" not in values
+        assert regular_user.password not in values.values()
+
+    # test a token of an old password is refused with the user cached
+    def test_revoked_token_with_cached_user(self, monkeypatch, regular_user, url):
+        # simplejwt modules keep the settings object they imported
+        monkeypatch.setattr(api_settings, "CHECK_REVOKE_TOKEN", True)
+        client = APIClient()
+        token = RoleTokenObtainPairSerializer.get_token(regular_user).access_token
+        client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+        assert client.get(url).status_code == status.HTTP_403_FORBIDDEN
+
+        regular_user.set_password("newstrongpass123")
+        regular_user.save()
+
+        assert client.get(url).status_code == status.HTTP_401_UNAUTHORIZED
+
+    # test user update drops the cached user
+    def test_update_drops_cached_user(self, token_regular_user_client, regular_user):
+        url = reverse("accounts:userupdate", kwargs={"pk": regular_user.pk})
+        token_regular_user_client.put(url, {"username": "first"}, format="json")
+        token_regular_user_client.put(url, {"username": "second"}, format="json")
+
+        assert get_cached_user(regular_user.pk).username == "second"
+
+    # test role changes are seen on the next request
+    def test_role_change_drops_cached_user(
+        self, token_regular_user_client, regular_user, url
+    ):
+        token_regular_user_client.get(url)
+        regular_user.is_staff = True
+        regular_user.save()
+
+        response = token_regular_user_client.get(url)
+        assert response.status_code == status.HTTP_200_OK
+
+    # test soft deleted user cant use his token anymore
+    def test_delete_drops_cached_user(self, token_regular_user_client, regular_user):
+        url = reverse("accounts:userdelete", kwargs={"pk": regular_user.pk})
+        token_regular_user_client.delete(url)
+
+        response = token_regular_user_client.get(url)
+        assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+    # test password change reads the row and drops the cached user
+    def test_change_password_with_cached_user(
+        self, token_regular_user_client, regular_user
+    ):
+        url = reverse("accounts:change-password")
+        data = {
+            "old_password": "userpass123",
+            "new_password": "newstrongpass123",
+            "new_password1": "newstrongpass123",
+        }
+        # caches the user
+        token_regular_user_client.put(url, {"old_password": "x"}, format="json")
+        response = token_regular_user_client.put(url, data, format="json")
+        assert response.status_code == status.HTTP_200_OK
+
+        data["old_password"] = "userpass123"
+        response = token_regular_user_client.put(url, data, format="json")
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        regular_user.refresh_from_db()
+        assert regular_user.check_password("newstrongpass123")
+
+
+@pytest.mark.django_db
+class TestClaimsOnlyAuthentication:
+    """
+    test role claims of the token with settings.JWT_CLAIMS_ONLY
+    """
+
+    def test_login_token_has_role(self, api_client, regular_user):
+        response = api_client.post(
+            reverse("accounts:token_obtain_pair"),
+            {"username": "user", "password": "userpass123"},
+        )
+        token = AccessToken(response.data["access"])
+        assert token["role"] == "USER"
+        assert token["is_staff"] is False
+
+    def test_permission_check_without_queries(
+        self, settings, claims_client, url, django_assert_num_queries
+    ):
+        settings.JWT_CLAIMS_ONLY = True
+        with django_assert_num_queries(0):
+            response = claims_client.get(url)
+        assert response.status_code == status.HTTP_403_FORBIDDEN
+
+    # test tokens issued before the claims are still looked up
+    def test_token_without_claims(
+        self, settings, token_regular_user_client, url, django_assert_num_queries
+    ):
+        settings.JWT_CLAIMS_ONLY = True
+        with django_assert_num_queries(1):
+            response = token_regular_user_client.get(url)
+        assert response.status_code == status.HTTP_403_FORBIDDEN
+
+    # test objects are saved for the user of the claims
+    def test_create_with_claims_user(self, settings, claims_client, regular_user, city):
+        settings.JWT_CLAIMS_ONLY = True
+        response = claims_client.post(
+            reverse("accounts:address-create"),
+            {"city": city.id, "street": "test", "zip_code": "123456"},
+            format="json",
+        )
+        assert response.status_code == status.HTTP_201_CREATED
+        assert regular_user.addresses.count() == 1
@@ -0,0 +1,103 @@
+import pytest
+from django.urls import reverse
+from rest_framework import status
+
+from accounts.models import City, Country
+
+
+@pytest.fixture
+def cities(city, country):
+    other = Country.objects.create(name="turkey")
+    return [
+        city,
+        City.objects.create(name="Tabriz", country=country),
+        City.objects.create(name="tehran", country=country),
+        City.objects.create(name="Trabzon", country=other),
+        City.objects.create(name="shiraz", country=country),
+    ]
+
+
+@pytest.mark.django_db
+class TestCityList:
+    """
+    test cached city list and its prefix search
+    """
+
+    @pytest.fixture
+    def url(self):
+        return reverse("accounts:city-list")
+
+    def test_city_list(self, token_regular_user_client, url, city, country):
+        response = token_regular_user_client.get(url)
+        assert response.status_code == status.HTTP_200_OK
+        assert response.json() == [
+            {
+                "id": city.id,
+                "name": "test",
+                "country": {"id": country.id, "name": "iran"},
+            }
+        ]
+
+    # test second read is served from the process without queries
+    def test_same_etag_gives_304(
+        self, token_regular_user_client, url, cities, django_assert_num_queries
+    ):
+        etag = token_regular_user_client.get(url)["ETag"]
+        with django_assert_num_queries(0):
+            response = token_regular_user_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == status.HTTP_304_NOT_MODIFIED
+
+    # test new city changes the version
+    def test_city_create_changes_etag(
+        self, token_regular_user_client, url, cities, country
+    ):
+        etag = token_regular_user_client.get(url)["ETag"]
+        City.objects.create(name="mashhad", country=country)
+
+        response = token_regular_user_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == status.HTTP_200_OK
+        assert response["ETag"] != etag
+        assert "mashhad" in [city["name"] for city in response.json()]
+
+    def test_prefix_search(self, token_regular_user_client, url, cities):
+        response = token_regular_user_client.get(url, {"q": "T"})
+        assert [city["name"] for city in response.json()] == [
+            "Tabriz",
+            "tehran",
+            "test",
+            "Trabzon",
+        ]
+
+    def test_prefix_search_in_country(
+        self, token_regular_user_client, url, cities, country
+    ):
+        response = token_regular_user_client.get(
+            url, {"q": "te", "country": country.id, "limit": 1}
+        )
+        assert [city["name"] for city in response.json()] == ["tehran"]
+
+    def test_invalid_country(self, token_regular_user_client, url):
+        response = token_regular_user_client.get(url, {"country": "iran"})
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+
+@pytest.mark.django_db
+class TestGeoSnapshot:
+    """
+    test countries and the whole snapshot
+    """
+
+    def test_country_list(self, token_regular_user_client, cities, country):
+        response = token_regular_user_client.get(reverse("accounts:country-list"))
+        assert response.json()[0] == {"id": country.id, "name": "iran"}
+        assert len(response.json()) == 2
+
+    def test_snapshot(self, token_regular_user_client, cities):
+        response = token_regular_user_client.get(reverse("accounts:geo"))
+        data = response.json()
+        assert response["ETag"] == f'"{data["version"]}"'
+        assert [len(country["cities"]) for country in data["countries"]] == [4, 1]
+
+    def test_unauthenticated_user_cant(self, api_client):
+        response = api_client.get(reverse("accounts:geo"))
+        assert response.status_code == status.HTTP_401_UNAUTHORIZED
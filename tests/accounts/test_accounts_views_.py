@@ -1,6 +1,9 @@
+import json
+
 import pytest
 from django.urls import reverse
 from rest_framework import status
+from accounts.models import Address
 from tests.conftest import token_admin_client, regular_user, address
 
 
@@ -29,6 +32,29 @@ class TestUserListView:
         assert response.status_code == status.HTTP_403_FORBIDDEN
 
 
+@pytest.mark.django_db
+class TestUserExportView:
+    @pytest.fixture
+    def url(self):
+        return reverse("accounts:users-export")
+
+    # admin can, passwords are not exported
+    def test_admin_can_export_users(self, url, token_admin_client, regular_user):
+        response = token_admin_client.get(url)
+        assert response.status_code == status.HTTP_200_OK
+        rows = [
+            json.loads(line)
+            for line in b"".join(response.streaming_content).decode().splitlines()
+        ]
+        assert regular_user.username in [row["username"] for row in rows]
+        assert all("password" not in row for row in rows)
+
+    # other users cant
+    def test_another_user_cannot_export_users(self, url, token_another_user_client):
+        response = token_another_user_client.get(url)
+        assert response.status_code == status.HTTP_403_FORBIDDEN
+
+
 @pytest.mark.django_db
 class TestUserDetailView:
     """
@@ -159,6 +185,15 @@ class TestAddressListView:
         response = token_regular_user_client.get(address_url)
         assert response.status_code == status.HTTP_403_FORBIDDEN
 
+    # list is cursor paginated
+    def test_address_list_is_cursor_paginated(
+        self, token_admin_client, address_url, address
+    ):
+        response = token_admin_client.get(address_url)
+        assert response.status_code == status.HTTP_200_OK
+        assert "count" not in response.data
+        assert [item["id"] for item in response.data["results"]] == [address.id]
+
 
 @pytest.mark.django_db
 class TestAddressDetailView:
@@ -266,3 +301,26 @@ class TestChangePasswordView:
         print("Response status:", response.status_code)
         print("Response data:", response.json())
         assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+
+@pytest.mark.django_db
+class TestAddressCreateView:
+    """
+    test address create with Idempotency-Key
+    """
+
+    @pytest.fixture
+    def url(self):
+        return reverse("accounts:address-create")
+
+    # retry with the same key gets the first address back
+    def test_retry_does_not_create_twice(self, token_regular_user_client, url, city):
+        data = {"city": city.id, "street": "test", "zip_code": "123456"}
+
+        first = token_regular_user_client.post(url, data, HTTP_IDEMPOTENCY_KEY="a1")
+        second = token_regular_user_client.post(url, data, HTTP_IDEMPOTENCY_KEY="a1")
+
+        assert first.status_code == second.status_code == status.HTTP_201_CREATED
+        assert second.data == first.data
+        assert second["Idempotent-Replayed"] == "true"
+        assert Address.objects.count() == 1
@@ -0,0 +1,104 @@
+import pytest
+from io import StringIO
+from datetime import timedelta
+from django.core.management import call_command
+from django.urls import reverse
+from django.utils import timezone
+
+from analytics.models import (
+    CategoryDailySales,
+    ProductDailySales,
+    RollupWatermark,
+    ShopDailySales,
+)
+from analytics.rollup import refresh_sales_rollups
+from orders.models import Order
+
+
+@pytest.mark.django_db
+class TestSalesRollup:
+    """
+    test incremental refresh of the sales rollups
+    """
+
+    @pytest.fixture
+    def today(self):
+        return timezone.localdate()
+
+    def test_refresh_builds_rollups(self, sales, shop, products, today):
+        days = refresh_sales_rollups(until=timezone.now())
+
+        assert days == [today - timedelta(days=1), today]
+        yesterday = ShopDailySales.objects.get(shop=shop, day=days[0])
+        assert yesterday.order_count == 2
+        assert yesterday.item_count == 6
+        assert yesterday.revenue == 600
+
+        product = ProductDailySales.objects.get(product=products[0], day=today)
+        assert product.units == 2
+        assert product.revenue == 200
+        assert product.shop_id == shop.id
+
+        category = CategoryDailySales.objects.get(day=today)
+        assert category.category_id == products[0].category_id
+        assert category.units == 3
+        assert category.revenue == 300
+
+    # only the day of the changed order is rebuilt
+    def test_refresh_is_incremental(self, sales, shop, today):
+        refresh_sales_rollups(until=timezone.now())
+
+        sales[0].status = "CANCELLED"
+        sales[0].save()
+        days = refresh_sales_rollups(until=timezone.now())
+
+        assert days == [today - timedelta(days=1)]
+        yesterday = ShopDailySales.objects.get(shop=shop, day=days[0])
+        assert yesterday.order_count == 1
+        assert yesterday.revenue == 300
+
+    def test_nothing_changed(self, sales):
+        refresh_sales_rollups(until=timezone.now())
+        assert refresh_sales_rollups(until=timezone.now()) == []
+
+    # orders newer than the watermark bound wait for the next refresh
+    def test_watermark_lag(self, sales, today):
+        until = timezone.now() - timedelta(minutes=1)
+        Order.objects.filter(pk=sales[2].pk).update(updated_at=timezone.now())
+
+        days = refresh_sales_rollups(until=until)
+
+        assert today not in days
+        assert RollupWatermark.objects.get(name="sales").value == until
+
+    # test full refresh drops days whose orders were deleted
+    def test_full_refresh(self, sales, today):
+        refresh_sales_rollups(until=timezone.now())
+        Order.objects.filter(pk=sales[2].pk).delete()
+
+        out = StringIO()
+        call_command("refresh_sales_rollups", full=True, stdout=out)
+
+        assert "rebuilt 2 days" in out.getvalue()
+        assert not ShopDailySales.objects.filter(day=today).exists()
+
+    # test the command keeps the watermark behind now like the beat task
+    def test_command_keeps_lag(self, settings, sales):
+        call_command("refresh_sales_rollups", stdout=StringIO())
+
+        watermark = RollupWatermark.objects.get(name="sales").value
+        assert watermark <= timezone.now() - settings.SALES_ROLLUP_LAG
+
+    # test an item change brings its order back to the next refresh
+    def test_item_update_touches_order(self, token_admin_client, sales, today):
+        refresh_sales_rollups(until=timezone.now())
+        item = sales[2].items.first()
+        Order.objects.filter(pk=sales[2].pk).update(
+            updated_at=timezone.now() - timedelta(hours=1)
+        )
+
+        token_admin_client.put(
+            reverse("orders:orderitem-update", kwargs={"pk": item.pk}), {"count": 3}
+        )
+
+        assert refresh_sales_rollups(until=timezone.now()) == [today]
@@ -0,0 +1,120 @@
+import pytest
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+
+from analytics.rollup import refresh_sales_rollups
+from orders.models import Order
+
+
+@pytest.fixture
+def rollups(sales):
+    refresh_sales_rollups(until=timezone.now())
+    return sales
+
+
+@pytest.mark.django_db
+class TestSalesReport:
+    """
+    test admin sales report
+    """
+
+    @pytest.fixture
+    def url(self):
+        return reverse("analytics:sales")
+
+    def test_admin_can_see_sales(self, token_admin_client, url, rollups):
+        response = token_admin_client.get(url)
+        assert response.status_code == status.HTTP_200_OK
+        assert [day["order_count"] for day in response.data["days"]] == [2, 1]
+        assert response.data["days"][0]["revenue"] == 600
+
+    def test_regular_user_cant_see_sales(self, token_regular_user_client, url):
+        response = token_regular_user_client.get(url)
+        assert response.status_code == status.HTTP_403_FORBIDDEN
+
+    def test_invalid_range(self, token_admin_client, url):
+        response = token_admin_client.get(
+            url, {"start": "2025-02-01", "end": "2025-01-01"}
+        )
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+
+@pytest.mark.django_db
+class TestShopReports:
+    """
+    test seller reports of one shop
+    """
+
+    def test_owner_can_see_shop_sales(self, token_regular_user_client, shop, rollups):
+        url = reverse("analytics:shop-sales", kwargs={"shop_id": shop.id})
+        response = token_regular_user_client.get(url)
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data["total"]["order_count"] == 3
+        assert response.data["total"]["revenue"] == 900
+
+    def test_another_user_cant_see_shop_sales(self, token_another_user_client, shop):
+        url = reverse("analytics:shop-sales", kwargs={"shop_id": shop.id})
+        response = token_another_user_client.get(url)
+        assert response.status_code == status.HTTP_403_FORBIDDEN
+
+    def test_top_products(self, token_regular_user_client, shop, products, rollups):
+        url = reverse("analytics:shop-products", kwargs={"shop_id": shop.id})
+        response = token_regular_user_client.get(url, {"limit": 1})
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data["products"] == [
+            {
+                "product": products[0].id,
+                "name": products[0].name,
+                "units": 6,
+                "revenue": 600,
+            }
+        ]
+
+    # report reads the rollups only, its queries dont grow with the orders
+    def test_report_queries_do_not_grow(
+        self,
+        token_regular_user_client,
+        shop,
+        address,
+        regular_user,
+        rollups,
+        django_assert_num_queries,
+    ):
+        url = reverse("analytics:shop-sales", kwargs={"shop_id": shop.id})
+        # jwt user, shop, total, days
+        with django_assert_num_queries(4):
+            token_regular_user_client.get(url)
+
+        Order.objects.bulk_create(
+            [Order(shop=shop, user=regular_user, address=address) for _ in range(20)]
+        )
+        refresh_sales_rollups(until=timezone.now())
+        # the jwt user is cached by now
+        with django_assert_num_queries(3):
+            response = token_regular_user_client.get(url)
+        assert response.data["total"]["order_count"] == 23
+
+
+@pytest.mark.django_db
+class TestCategorySalesReport:
+    """
+    test category report
+    """
+
+    @pytest.fixture
+    def url(self):
+        return reverse("analytics:category-sales")
+
+    def test_admin_can_see_categories(self, token_admin_client, url, products, rollups):
+        response = token_admin_client.get(url)
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data["categories"][0]["category"] == products[0].category_id
+        assert response.data["categories"][0]["revenue"] == 900
+
+    # parent category includes sales of its subtree
+    def test_category_subtree(self, token_admin_client, url, category, rollups):
+        response = token_admin_client.get(url, {"category": category.id})
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data["units"] == 9
+        assert response.data["revenue"] == 900
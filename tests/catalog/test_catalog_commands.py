@@ -0,0 +1,87 @@
+import json
+
+import pytest
+from django.core.management import call_command
+
+from catalog.models import ImportCheckpoint, Product
+
+
+@pytest.mark.django_db
+class TestImportProductsCommand:
+    """
+    test import_products management command
+    """
+
+    @pytest.fixture
+    def rows(self, shop, category):
+        return [
+            {
+                "shop": shop.id,
+                "category": category.id,
+                "name": f"sku {i}",
+                "description": "test",
+                "price": "12.50",
+            }
+            for i in range(7)
+        ]
+
+    # test import from jsonl in chunks
+    def test_import_jsonl(self, tmp_path, rows):
+        path = tmp_path / "products.jsonl"
+        path.write_text("\n".join(json.dumps(row) for row in rows))
+
+        call_command("import_products", str(path), chunk_size=3)
+
+        assert Product.objects.filter(name__startswith="sku").count() == 7
+        assert not ImportCheckpoint.objects.exists()
+
+    # test import from csv skips bad rows
+    def test_import_csv_skips_invalid_rows(self, tmp_path, rows):
+        rows[2]["category"] = 9999
+        rows[4]["price"] = "free"
+        path = tmp_path / "products.csv"
+        lines = ["shop,category,name,description,price"]
+        lines += [
+            f'{r["shop"]},{r["category"]},{r["name"]},{r["description"]},{r["price"]}'
+            for r in rows
+        ]
+        path.write_text("\n".join(lines))
+
+        call_command("import_products", str(path))
+
+        assert Product.objects.filter(name__startswith="sku").count() == 5
+
+    # test values the columns cant hold are skipped, not sent to the database
+    @pytest.mark.parametrize(
+        "field, value",
+        [
+            ("image_url", "https://example.com/" + "a" * 200),
+            ("price", "123456789.99"),
+            ("price", "-1"),
+            ("price", "NaN"),
+            ("price", "1.999"),
+            ("name", ""),
+        ],
+    )
+    def test_import_skips_invalid_values(self, tmp_path, rows, field, value):
+        rows[3][field] = value
+        path = tmp_path / "products.jsonl"
+        path.write_text("\n".join(json.dumps(row) for row in rows))
+
+        call_command("import_products", str(path), chunk_size=3)
+
+        names = set(Product.objects.values_list("name", flat=True))
+        assert len(names) == 6
+        assert "sku 3" not in names
+
+    # test import continues from checkpoint
+    def test_import_resumes_from_checkpoint(self, tmp_path, rows):
+        path = tmp_path / "products.jsonl"
+        path.write_text("\n".join(json.dumps(row) for row in rows))
+        ImportCheckpoint.objects.create(name=str(path), rows=4)
+
+        call_command("import_products", str(path))
+
+        names = set(Product.objects.values_list("name", flat=True))
+        assert names >= {"sku 4", "sku 5", "sku 6"}
+        assert "sku 3" not in names
@@ -33,6 +33,48 @@ class TestCategoryModel:
 
         assert str(sub_child) == "lavazem electronici / mobile / iphone"
 
+    # test path is set on insert
+    def test_category_path_on_create(self, category):
+        child = Category.objects.create(name="mobile", parent=category)
+        assert category.path == f"/{category.pk}/"
+        assert child.path == f"/{category.pk}/{child.pk}/"
+        assert child.depth == 1
+
+    # test moving a category moves its whole subtree
+    def test_category_move_updates_subtree(self, category):
+        other = Category.objects.create(name="digital")
+        child = Category.objects.create(name="mobile", parent=category)
+        sub_child = Category.objects.create(name="iphone", parent=child)
+
+        child.parent = other
+        child.save()
+
+        sub_child.refresh_from_db()
+        assert sub_child.path == f"/{other.pk}/{child.pk}/{sub_child.pk}/"
+        assert sub_child.depth == 2
+        assert list(other.get_descendants()) == [child, sub_child]
+        assert not category.get_descendants().exists()
+
+    # test deactivating a category deactivates its subtree
+    def test_category_deactivate_subtree(self, category):
+        child = Category.objects.create(name="mobile", parent=category)
+        sub_child = Category.objects.create(name="iphone", parent=child)
+
+        category.is_active = False
+        category.save()
+
+        sub_child.refresh_from_db()
+        assert sub_child.is_active is False
+
+    # test breadcrumbs are loaded with one query
+    def test_category_breadcrumbs(self, category, django_assert_num_queries):
+        child = Category.objects.create(name="mobile", parent=category)
+        sub_child = Category.objects.create(name="iphone", parent=child)
+        sub_child = Category.objects.get(pk=sub_child.pk)
+
+        with django_assert_num_queries(1):
+            assert sub_child.breadcrumbs() == [category, child, sub_child]
+
 
 @pytest.mark.django_db
 class TestShopModel:
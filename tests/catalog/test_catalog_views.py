@@ -1,6 +1,10 @@
+import gzip
+import json
+
 import pytest
 from django.urls import reverse
 from rest_framework import status
+from catalog import cache
 from catalog.models import Shop, Category, Wishlist, Product
 
 from tests.conftest import (
@@ -674,6 +678,43 @@ class TestWishlistDetailView:
         assert response.status_code == status.HTTP_401_UNAUTHORIZED
 
 
+@pytest.mark.django_db
+class TestWishlistListView:
+    """
+    test wishlist list is scoped to the user
+    """
+
+    @pytest.fixture
+    def url(self):
+        return reverse("catalog:wishlist-list")
+
+    @pytest.fixture
+    def wishlists(self, regular_user, another_user, products):
+        return [
+            Wishlist.objects.create(user=regular_user, product=products[0]),
+            Wishlist.objects.create(user=another_user, product=products[1]),
+        ]
+
+    # test user only sees own wishlist
+    def test_user_sees_own_wishlist(
+        self, token_regular_user_client, url, wishlists, django_assert_num_queries
+    ):
+        # jwt user, wishlists filtered in the same query
+        with django_assert_num_queries(2):
+            response = token_regular_user_client.get(url)
+        assert response.status_code == status.HTTP_200_OK
+        assert [row["id"] for row in response.data] == [wishlists[0].id]
+
+    # test admin sees every wishlist
+    def test_admin_sees_all(self, token_admin_client, url, wishlists):
+        response = token_admin_client.get(url)
+        assert len(response.data) == 2
+
+    def test_unauthenticated_user_cant_list_wishlist(self, client, url):
+        response = client.get(url)
+        assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+
 @pytest.mark.django_db
 class TestWishListDeleteView:
     """
@@ -713,3 +754,456 @@ class TestWishListDeleteView:
     ):
         response = token_another_user_client.delete(url)
         assert response.status_code == status.HTTP_403_FORBIDDEN
+
+
+@pytest.mark.django_db
+class TestCatalogQueryCount:
+    """
+    test number of queries does not grow with number of rows
+    (1 query for jwt user + count for paginated lists + the select itself)
+    """
+
+    @pytest.fixture
+    def wishlists(self, regular_user, products):
+        return [
+            Wishlist.objects.create(user=regular_user, product=product)
+            for product in products
+        ]
+
+    def test_product_list_queries(
+        self, token_regular_user_client, products, django_assert_num_queries
+    ):
+        with django_assert_num_queries(3):
+            response = token_regular_user_client.get(reverse("catalog:product-list"))
+        assert response.status_code == status.HTTP_200_OK
+        assert len(response.data["results"]) == len(products)
+
+    def test_product_detail_queries(
+        self, token_regular_user_client, products, django_assert_num_queries
+    ):
+        url = reverse("catalog:product-detail", kwargs={"pk": products[0].pk})
+        # ids of the cached rows, then the product with its relations
+        with django_assert_num_queries(3):
+            response = token_regular_user_client.get(url)
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data["category"]["parent"]["name"] == "lavazem electronici"
+
+    def test_shop_list_queries(
+        self, token_regular_user_client, shop, shop_seller_user, django_assert_num_queries
+    ):
+        with django_assert_num_queries(3):
+            response = token_regular_user_client.get(reverse("catalog:shop-list"))
+        assert response.status_code == status.HTTP_200_OK
+
+    def test_shop_detail_queries(
+        self, token_regular_user_client, shop, django_assert_num_queries
+    ):
+        url = reverse("catalog:shop-detail", kwargs={"pk": shop.pk})
+        with django_assert_num_queries(2):
+            response = token_regular_user_client.get(url)
+        assert response.status_code == status.HTTP_200_OK
+
+    def test_category_list_queries(
+        self, token_regular_user_client, products, django_assert_num_queries
+    ):
+        with django_assert_num_queries(2):
+            response = token_regular_user_client.get(reverse("catalog:category-list"))
+        assert response.status_code == status.HTTP_200_OK
+
+    def test_wishlist_list_queries(
+        self, token_admin_client, wishlists, django_assert_num_queries
+    ):
+        with django_assert_num_queries(2):
+            response = token_admin_client.get(reverse("catalog:wishlist-list"))
+        assert response.status_code == status.HTTP_200_OK
+        assert len(response.data) == len(wishlists)
+
+    def test_wishlist_detail_queries(
+        self, token_regular_user_client, wishlists, django_assert_num_queries
+    ):
+        url = reverse("catalog:wishlist-detail", kwargs={"pk": wishlists[0].pk})
+        with django_assert_num_queries(2):
+            response = token_regular_user_client.get(url)
+        assert response.status_code == status.HTTP_200_OK
+
+
+@pytest.mark.django_db
+class TestCategoryTreeViews:
+    """
+    test subtree filter and breadcrumbs
+    """
+
+    # test product list filtered by a category and its children
+    def test_product_list_filter_by_category_tree(
+        self, token_regular_user_client, product, products, category
+    ):
+        other = Category.objects.create(name="other")
+        Product.objects.create(
+            shop=product.shop, category=other, name="x", description="x", price=1
+        )
+        url = reverse("catalog:product-list")
+        response = token_regular_user_client.get(url, {"category_tree": category.id})
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data["count"] == len(products) + 1
+
+    # test breadcrumbs of a category
+    def test_category_breadcrumbs(self, token_regular_user_client, products, category):
+        sub_category = products[0].category
+        url = reverse("catalog:category-breadcrumbs", kwargs={"pk": sub_category.id})
+        response = token_regular_user_client.get(url)
+        assert response.status_code == status.HTTP_200_OK
+        assert [item["id"] for item in response.data] == [category.id, sub_category.id]
+
+    # test category cant be moved under its own child
+    def test_admin_cant_move_category_under_child(self, token_admin_client, category):
+        child = Category.objects.create(name="mobile", parent=category)
+        url = reverse("catalog:category-update", kwargs={"pk": category.id})
+        response = token_admin_client.put(url, data={"parent": child.id})
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+
+@pytest.mark.django_db
+class TestProductSearchView:
+    """
+    test product search (falls back to icontains out of postgres)
+    """
+
+    @pytest.fixture
+    def url(self):
+        return reverse("catalog:product-list")
+
+    # test search matches name and description
+    def test_search_product_by_name_and_description(
+        self, token_regular_user_client, url, products
+    ):
+        products[0].name = "iphone 15"
+        products[0].save()
+        products[1].description = "case for iphone"
+        products[1].save()
+
+        response = token_regular_user_client.get(url, {"search": "iphone"})
+        assert response.status_code == status.HTTP_200_OK
+        assert {item["id"] for item in response.data["results"]} == {
+            products[0].id,
+            products[1].id,
+        }
+
+    # test search with no result
+    def test_search_product_no_result(self, token_regular_user_client, url, products):
+        response = token_regular_user_client.get(url, {"search": "nothing"})
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data["count"] == 0
+
+
+@pytest.mark.django_db
+class TestProductListCursorPagination:
+    """
+    test opt in keyset pagination of product list
+    """
+
+    @pytest.fixture
+    def url(self):
+        return reverse("catalog:product-list")
+
+    # test page number pagination is still the default
+    def test_page_number_is_default(self, token_regular_user_client, url, products):
+        response = token_regular_user_client.get(url)
+        assert response.data["count"] == len(products)
+
+    # test walking all pages with the cursor
+    def test_cursor_pages(self, token_regular_user_client, url, products):
+        response = token_regular_user_client.get(
+            url, {"pagination": "cursor", "page_size": 2}
+        )
+        assert response.status_code == status.HTTP_200_OK
+        assert "count" not in response.data
+
+        ids = [item["id"] for item in response.data["results"]]
+        while response.data["next"]:
+            response = token_regular_user_client.get(response.data["next"])
+            ids += [item["id"] for item in response.data["results"]]
+
+        assert ids == [product.id for product in reversed(products)]
+
+    # test an ordering the keyset cant follow is rejected, not silently dropped
+    @pytest.mark.parametrize("ordering", ["-rating_avg", "updated_at", "created_at"])
+    def test_cursor_with_other_ordering(
+        self, token_regular_user_client, url, products, ordering
+    ):
+        response = token_regular_user_client.get(
+            url, {"pagination": "cursor", "ordering": ordering}
+        )
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert "ordering" in response.data
+
+    def test_cursor_with_keyset_ordering(self, token_regular_user_client, url, products):
+        response = token_regular_user_client.get(
+            url, {"pagination": "cursor", "ordering": "-created_at"}
+        )
+        assert response.status_code == status.HTTP_200_OK
+
+
+@pytest.mark.django_db
+class TestProductDetailCache:
+    """
+    test product detail cache and its invalidation
+    """
+
+    @pytest.fixture
+    def url(self, product):
+        return reverse("catalog:product-detail", kwargs={"pk": product.pk})
+
+    # test second read comes from cache (the jwt user is cached too)
+    def test_second_read_is_cached(
+        self, token_regular_user_client, url, django_assert_num_queries
+    ):
+        token_regular_user_client.get(url)
+        with django_assert_num_queries(0):
+            response = token_regular_user_client.get(url)
+        assert response.status_code == status.HTTP_200_OK
+
+    # test product update drops the cached product
+    def test_product_update_invalidates(
+        self, token_admin_client, url, product, django_capture_on_commit_callbacks
+    ):
+        token_admin_client.get(url)
+        update_url = reverse("catalog:product-update", kwargs={"pk": product.pk})
+        with django_capture_on_commit_callbacks(execute=True):
+            token_admin_client.put(update_url, data={"name": "new name"})
+        response = token_admin_client.get(url)
+        assert response.data["name"] == "new name"
+
+    # test changes of shop, category and address drop the cached product
+    def test_related_change_invalidates(self, token_admin_client, url, product):
+        token_admin_client.get(url)
+
+        product.shop.name = "new shop"
+        product.shop.save()
+        assert token_admin_client.get(url).data["shop"]["name"] == "new shop"
+
+        product.category.name = "new category"
+        product.category.save()
+        assert token_admin_client.get(url).data["category"]["name"] == "new category"
+
+        product.shop.address.street = "new street"
+        product.shop.address.save()
+        response = token_admin_client.get(url)
+        assert response.data["shop"]["address"]["street"] == "new street"
+
+        product.shop.address.city.name = "new city"
+        product.shop.address.city.save()
+        response = token_admin_client.get(url)
+        assert response.data["shop"]["address"]["city"]["name"] == "new city"
+
+    # test a change of the address user (not the shop owner) drops it too
+    def test_address_user_change_invalidates(
+        self, token_admin_client, url, product, another_user
+    ):
+        address = product.shop.address
+        address.user = another_user
+        address.save()
+        token_admin_client.get(url)
+
+        another_user.username = "new user"
+        another_user.save()
+        response = token_admin_client.get(url)
+        assert response.data["shop"]["address"]["user"]["name"] == "new user"
+
+    # test a change committed right after the row is read is not cached for good
+    def test_change_after_read_is_not_kept(
+        self, monkeypatch, token_admin_client, url, product
+    ):
+        def get_object_or_404(*args, load=cache.get_object_or_404, **kwargs):
+            loaded = load(*args, **kwargs)
+            Product.objects.filter(pk=product.pk).update(name="new name")
+            cache.invalidate("product", product.pk)
+            return loaded
+
+        monkeypatch.setattr(cache, "get_object_or_404", get_object_or_404)
+        assert token_admin_client.get(url).data["name"] == product.name
+        assert token_admin_client.get(url).data["name"] == "new name"
+
+    # test hit and miss counters
+    def test_cache_stats(self, token_admin_client, url):
+        token_admin_client.get(url)
+        token_admin_client.get(url)
+        response = token_admin_client.get(reverse("catalog:product-cache-stats"))
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data == {"hits": 1, "misses": 1}
+
+    # test regular user cant see counters
+    def test_regular_user_cant_see_cache_stats(self, token_regular_user_client):
+        response = token_regular_user_client.get(
+            reverse("catalog:product-cache-stats")
+        )
+        assert response.status_code == status.HTTP_403_FORBIDDEN
+
+
+@pytest.mark.django_db
+class TestCategoryTreeView:
+    """
+    test cached category tree
+    """
+
+    @pytest.fixture
+    def url(self):
+        return reverse("catalog:category-tree")
+
+    # test tree is nested
+    def test_category_tree(self, token_regular_user_client, url, products, category):
+        response = token_regular_user_client.get(url)
+        assert response.status_code == status.HTTP_200_OK
+        assert response.json() == [
+            {
+                "id": category.id,
+                "name": category.name,
+                "children": [
+                    {
+                        "id": products[0].category_id,
+                        "name": "mobile",
+                        "children": [],
+                    }
+                ],
+            }
+        ]
+
+    # test same etag gives 304 and the tree is served without a category query
+    def test_category_tree_not_modified(
+        self, token_regular_user_client, url, category, django_assert_num_queries
+    ):
+        etag = token_regular_user_client.get(url)["ETag"]
+        with django_assert_num_queries(0):
+            response = token_regular_user_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == status.HTTP_304_NOT_MODIFIED
+        assert response["ETag"] == etag
+
+    # test category create changes the tree
+    def test_category_create_rebuilds_tree(self, token_admin_client, url, category):
+        etag = token_admin_client.get(url)["ETag"]
+        token_admin_client.post(
+            reverse("catalog:category-create"),
+            data={"name": "mobile", "parent": category.id},
+        )
+        response = token_admin_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == status.HTTP_200_OK
+        assert response["ETag"] != etag
+        assert response.json()[0]["children"][0]["name"] == "mobile"
+
+    # test unauthenticated user cant
+    def test_unauthenticated_user_cant_see_category_tree(self, client, url):
+        response = client.get(url)
+        assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+
+@pytest.mark.django_db
+class TestProductBulkViews:
+    """
+    test bulk create and bulk update of products
+    """
+
+    @pytest.fixture
+    def rows(self, shop_seller_user, category):
+        return [
+            {
+                "shop": shop_seller_user.id,
+                "category": category.id,
+                "name": f"sku {i}",
+                "description": "test",
+                "price": "10.00",
+            }
+            for i in range(20)
+        ]
+
+    # test seller can create many products with constant number of queries
+    def test_seller_can_bulk_create(
+        self, token_seller_user_client, rows, django_assert_max_num_queries
+    ):
+        url = reverse("catalog:product-bulk-create")
+        with django_assert_max_num_queries(6):
+            response = token_seller_user_client.post(url, data=rows, format="json")
+        assert response.status_code == status.HTTP_201_CREATED
+        assert len(response.data["ids"]) == len(rows)
+        assert Product.objects.filter(name__startswith="sku").count() == len(rows)
+
+    # test one bad row rejects the batch and errors are per row
+    def test_bulk_create_errors_per_row(self, token_seller_user_client, rows, shop):
+        rows[1]["category"] = 9999
+        rows[3]["shop"] = shop.id  # shop of another user
+        url = reverse("catalog:product-bulk-create")
+        response = token_seller_user_client.post(url, data=rows, format="json")
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        errors = response.data["errors"]
+        assert errors[0] == {}
+        assert "category" in errors[1]
+        assert "shop" in errors[3]
+        assert not Product.objects.filter(name__startswith="sku").exists()
+
+    # test regular user cant
+    def test_regular_user_cant_bulk_create(self, token_regular_user_client, rows):
+        url = reverse("catalog:product-bulk-create")
+        response = token_regular_user_client.post(url, data=rows, format="json")
+        assert response.status_code == status.HTTP_403_FORBIDDEN
+
+    # test seller can update many of his products
+    def test_seller_can_bulk_update(
+        self, token_seller_user_client, product_seller_user
+    ):
+        url = reverse("catalog:product-bulk-update")
+        data = [{"id": product_seller_user.id, "price": "55.00", "name": "new"}]
+        response = token_seller_user_client.put(url, data=data, format="json")
+        assert response.status_code == status.HTTP_200_OK
+        product_seller_user.refresh_from_db()
+        assert product_seller_user.price == 55
+        assert product_seller_user.name == "new"
+
+    # test seller cant update products of other shops
+    def test_seller_cant_bulk_update_other_products(
+        self, token_seller_user_client, product, product_seller_user
+    ):
+        url = reverse("catalog:product-bulk-update")
+        data = [
+            {"id": product_seller_user.id, "price": "55.00"},
+            {"id": product.id, "price": "1.00"},
+            {"id": 9999, "price": "1.00"},
+        ]
+        response = token_seller_user_client.put(url, data=data, format="json")
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert response.data["errors"][0] == {}
+        assert "id" in response.data["errors"][1]
+        assert "id" in response.data["errors"][2]
+        product.refresh_from_db()
+        assert product.price == 100
+
+
+@pytest.mark.django_db
+class TestProductExportView:
+    """
+    test streaming product export
+    """
+
+    @pytest.fixture
+    def url(self):
+        return reverse("catalog:product-export")
+
+    # test admin gets one json object per line
+    def test_admin_can_export_ndjson(self, token_admin_client, url, products):
+        response = token_admin_client.get(url)
+        assert response.status_code == status.HTTP_200_OK
+        assert response.streaming
+        lines = b"".join(response.streaming_content).decode().splitlines()
+        rows = [json.loads(line) for line in lines]
+        assert [row["id"] for row in rows] == [product.id for product in products]
+
+    # test admin gets gzip csv
+    def test_admin_can_export_csv(self, token_admin_client, url, products):
+        response = token_admin_client.get(url, {"output": "csv"})
+        assert response.status_code == status.HTTP_200_OK
+        text = gzip.decompress(b"".join(response.streaming_content)).decode()
+        lines = text.splitlines()
+        assert lines[0].startswith("id,shop_id,category_id,name")
+        assert len(lines) == len(products) + 1
+
+    # test regular user cant
+    def test_regular_user_cant_export(self, token_regular_user_client, url):
+        response = token_regular_user_client.get(url)
+        assert response.status_code == status.HTTP_403_FORBIDDEN
@@ -1,8 +1,14 @@
 import pytest
+from contextlib import contextmanager
+from datetime import timedelta
 from _pytest.nodes import Item
+from django.utils import timezone
+from django.core.cache import cache
 from drf_yasg.openapi import Items
 from rest_framework.test import APIClient
 from rest_framework_simplejwt.tokens import AccessToken
+from core.authentication import clear_local_cache
+from core.instrumentation import record_queries
 from accounts.models import User, Address, City, Country
 from catalog.models import Shop, Category, Product
 from orders.models import Order, OrderItem, Delivery
@@ -269,3 +275,79 @@ def order_item(order, product):
     return OrderItem.objects.create(
         order=order, product=product, count=2, row_price=product.price * 2
     )
+
+
+# MORE THAN ONE ROW FOR QUERY COUNT TESTS (N+1 SHOWS UP ONLY WITH MANY ROWS)
+
+
+@pytest.fixture
+def products(db, shop, category):
+    sub_category = Category.objects.create(name="mobile", parent=category)
+    return [
+        Product.objects.create(
+            shop=shop,
+            category=sub_category,
+            name=f"test {i}",
+            description="test",
+            price=100,
+            is_active=True,
+        )
+        for i in range(5)
+    ]
+
+
+@pytest.fixture
+def sales(shop, address, regular_user, products):
+    """
+    two orders yesterday and one today, each with 2 x products[0] and 1 x products[1]
+    """
+    now = timezone.now()
+    orders = []
+    for created_at in [now - timedelta(days=1), now - timedelta(days=1), now]:
+        order = Order.objects.create(
+            shop=shop,
+            user=regular_user,
+            address=address,
+            subtotal=300,
+            item_count=3,
+            total_price=300,
+        )
+        OrderItem.objects.bulk_create(
+            [
+                OrderItem(order=order, product=products[0], count=2, row_price=200),
+                OrderItem(order=order, product=products[1], count=1, row_price=100),
+            ]
+        )
+        Order.objects.filter(pk=order.pk).update(created_at=created_at)
+        order.refresh_from_db()
+        orders.append(order)
+    return orders
+
+
+# TESTS USE LOCAL MEMORY CACHE INSTEAD OF REDIS
+
+
+@pytest.fixture(autouse=True)
+def locmem_cache(settings):
+    settings.CACHES = {
+        "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}
+    }
+    cache.clear()
+    # user ids are reused between tests, drop users cached by earlier ones
+    clear_local_cache()
+
+
+# QUERY BUDGETS: with query_budget(5): ... FAILS ON MORE QUERIES OR AN N+1
+
+
+@pytest.fixture
+def query_budget():
+    @contextmanager
+    def budget(queries, duplicates=False):
+        with record_queries() as stats:
+            yield stats
+        assert stats.count <= queries, f"{stats.count} queries, budget is {queries}"
+        if not duplicates:
+            assert not stats.duplicates(), f"repeated queries: {stats.duplicates()}"
+
+    return budget
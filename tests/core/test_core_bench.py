@@ -0,0 +1,68 @@
+import json
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+
+from catalog.models import Product
+from core.bench import ENDPOINTS, percentile
+
+
+def test_percentile():
+    values = list(range(1, 101))
+    assert percentile(values, 50) == 50
+    assert percentile(values, 95) == 95
+    assert percentile([7], 95) == 7
+
+
+@pytest.mark.django_db
+class TestBenchEndpoints:
+    """
+    test benchmark command
+    """
+
+    def test_results_json(self, tmp_path):
+        output = tmp_path / "bench.json"
+        out = StringIO()
+        call_command(
+            "bench_endpoints",
+            size=20,
+            runs=3,
+            warmup=1,
+            output=str(output),
+            stdout=out,
+        )
+
+        report = json.loads(output.read_text())
+        assert set(report["endpoints"]) == set(ENDPOINTS)
+        for endpoint, numbers in report["endpoints"].items():
+            assert set(numbers["status"]) <= {"200", "201"}, endpoint
+            assert numbers["p50_ms"] <= numbers["p95_ms"]
+            assert numbers["queries"] > 0
+        # seeded rows are rolled back
+        assert not Product.objects.exists()
+        assert "results written" in out.getvalue()
+
+    def test_compare(self, tmp_path):
+        first = tmp_path / "first.json"
+        call_command(
+            "bench_endpoints",
+            size=10,
+            runs=1,
+            warmup=1,
+            endpoints=["CategoryList"],
+            output=str(first),
+            stdout=StringIO(),
+        )
+        out = StringIO()
+        call_command(
+            "bench_endpoints",
+            size=10,
+            runs=1,
+            warmup=1,
+            endpoints=["CategoryList"],
+            output=str(tmp_path / "second.json"),
+            compare=str(first),
+            stdout=out,
+        )
+        assert "queries +0" in out.getvalue()
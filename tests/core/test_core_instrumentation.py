@@ -0,0 +1,123 @@
+import json
+import logging
+
+import pytest
+from django.urls import reverse
+
+from accounts.models import User
+from catalog.models import Wishlist
+from core.instrumentation import fingerprint, record_queries
+
+
+class TestFingerprint:
+    """
+    test queries of one shape have one fingerprint
+    """
+
+    def test_literals_and_in_lists_are_folded(self):
+        assert fingerprint(
+            "SELECT * FROM t WHERE id IN (%s, %s, %s) AND name = 'a'"
+        ) == fingerprint("SELECT *  FROM t WHERE id IN (%s, %s) AND name = 'b'")
+
+    def test_other_shapes_differ(self):
+        assert fingerprint("SELECT * FROM t WHERE id = %s") != fingerprint(
+            "SELECT * FROM u WHERE id = %s"
+        )
+
+
+@pytest.mark.django_db
+class TestRecordQueries:
+    """
+    test queries are counted and repeated ones are found
+    """
+
+    def test_duplicates(self, regular_user, another_user):
+        with record_queries() as stats:
+            User.objects.get(pk=regular_user.pk)
+            User.objects.get(pk=another_user.pk)
+            User.objects.count()
+
+        assert stats.count == 3
+        assert stats.db_time > 0
+        [(shape, count)] = stats.duplicates()
+        assert count == 2
+        assert "WHERE" in shape
+
+
+@pytest.mark.django_db
+class TestInstrumentationMiddleware:
+    """
+    test every request is logged with its numbers
+    """
+
+    @pytest.fixture
+    def wishlists(self, regular_user, products):
+        return [
+            Wishlist.objects.create(user=regular_user, product=product)
+            for product in products
+        ]
+
+    def test_request_is_logged(self, token_regular_user_client, wishlists, caplog):
+        with caplog.at_level(logging.INFO, logger="core.instrumentation"):
+            token_regular_user_client.get(reverse("catalog:wishlist-list"))
+
+        record = json.loads(caplog.records[-1].getMessage())
+        assert record["view"] == "catalog:wishlist-list"
+        assert record["status"] == 200
+        assert record["queries"] > 0
+        assert record["duplicates"] == []
+        assert caplog.records[-1].levelno == logging.INFO
+
+    def test_over_budget_is_a_warning(
+        self, token_regular_user_client, wishlists, settings, caplog
+    ):
+        settings.INSTRUMENTATION_QUERY_BUDGET = 1
+        with caplog.at_level(logging.INFO, logger="core.instrumentation"):
+            token_regular_user_client.get(reverse("catalog:wishlist-list"))
+        assert caplog.records[-1].levelno == logging.WARNING
+
+    # test export queries run while the body is read are counted
+    def test_streamed_response_is_logged_when_read(
+        self, token_admin_client, products, settings, caplog
+    ):
+        settings.DEBUG = True
+        with caplog.at_level(logging.INFO, logger="core.instrumentation"):
+            response = token_admin_client.get(reverse("catalog:product-export"))
+            assert not caplog.records
+            body = b"".join(response.streaming_content)
+
+        [log] = caplog.records
+        record = json.loads(log.getMessage())
+        assert len(body.splitlines()) == len(products)
+        assert record["streamed"] is True
+        assert record["view"] == "catalog:product-export"
+        # jwt user, then the export reads the products
+        assert record["queries"] >= 2
+        assert "Server-Timing" not in response
+
+    # test a body that is never read is still logged when the response closes
+    def test_unread_stream_is_logged_on_close(self, token_admin_client, caplog):
+        with caplog.at_level(logging.INFO, logger="core.instrumentation"):
+            token_admin_client.get(reverse("catalog:product-export")).close()
+
+        [log] = caplog.records
+        assert json.loads(log.getMessage())["streamed"] is True
+
+    def test_server_timing_in_debug(self, token_regular_user_client, settings):
+        settings.DEBUG = True
+        response = token_regular_user_client.get(reverse("catalog:wishlist-list"))
+        assert response["Server-Timing"].startswith("db;dur=")
+        assert "total;dur=" in response["Server-Timing"]
+
+    def test_no_server_timing_in_production(self, token_regular_user_client):
+        response = token_regular_user_client.get(reverse("catalog:wishlist-list"))
+        assert "Server-Timing" not in response
+
+    # wishlists nest user and product, they must not load one by one
+    def test_wishlist_list_budget(
+        self, token_regular_user_client, wishlists, query_budget
+    ):
+        with query_budget(6) as stats:
+            response = token_regular_user_client.get(reverse("catalog:wishlist-list"))
+        assert len(response.data) == len(wishlists)
+        assert stats.count > 0
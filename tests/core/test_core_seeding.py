@@ -0,0 +1,150 @@
+from datetime import timedelta
+from io import StringIO
+
+import pytest
+from django.core.management import CommandError, call_command
+from django.db.models import Count, Max
+
+from catalog.models import Category, Product, Shop
+from core.seeding import Seeder, spread
+from interactions.models import Comment, ProductRating, Rate
+from orders.models import Order, OrderItem
+
+
+def test_spread():
+    assert spread(10, 3) == [4, 3, 3]
+    assert spread(2, 4) == [1, 1, 0, 0]
+
+
+@pytest.mark.django_db
+class TestSeeder:
+    """
+    test synthetic data is consistent
+    """
+
+    def test_seed(self):
+        counts = Seeder(seed=1, batch_size=7).seed(30)
+
+        assert counts["catalog.Product"] == Product.objects.count() == 30
+        assert counts["orders.Order"] == 30
+        assert counts["interactions.Comment"] == Comment.objects.count() == 30
+        assert counts["interactions.Rate"] == Rate.objects.count()
+        assert ProductRating.objects.count() == (
+            Rate.objects.values("product").distinct().count()
+        )
+        assert not Category.objects.filter(path="").exists()
+
+    # order totals match their items, every item is of the order shop
+    def test_order_totals(self):
+        Seeder(seed=1, max_cart=5).seed(30)
+        for order in Order.objects.prefetch_related("items__product"):
+            items = list(order.items.all())
+            assert order.subtotal == sum(item.row_price for item in items)
+            assert order.item_count == sum(item.count for item in items)
+            assert {item.product.shop_id for item in items} == {order.shop_id}
+        assert OrderItem.objects.count() > Order.objects.count()
+
+    def test_category_tree(self):
+        Seeder(category_depth=3, category_children=2).seed(10, category_roots=2)
+
+        assert Category.objects.count() == 2 + 4 + 8
+        leaf = Category.objects.filter(depth=2).first()
+        assert len(leaf.breadcrumbs()) == 3
+        # products are on the leaves
+        assert set(Product.objects.values_list("category__depth", flat=True)) == {2}
+
+    def test_threaded_comments(self):
+        Seeder(thread_depth=3).seed(10, comments=90)
+
+        replies = Comment.objects.exclude(parent=None).select_related("parent")
+        assert all(reply.product_id == reply.parent.product_id for reply in replies)
+        assert replies.filter(parent__parent__parent__isnull=False).exists()
+
+    # orders and comments are spread over the history window
+    def test_created_at_spread(self):
+        seeder = Seeder(seed=1, history_days=30)
+        seeder.seed(30, comments=60)
+
+        for model in (Order, Comment):
+            created = list(model.objects.values_list("created_at", flat=True))
+            assert min(created) >= seeder.now - timedelta(days=30)
+            assert max(created) <= seeder.now
+            assert max(created) - min(created) > timedelta(days=7)
+        replies = Comment.objects.exclude(parent=None).select_related("parent")
+        assert all(reply.created_at >= reply.parent.created_at for reply in replies)
+
+    # popular products get most of the orders
+    # without replies every comment starts a thread
+    def test_flat_comments(self):
+        counts = Seeder(seed=1, thread_depth=0).seed(30, comments=30)
+
+        assert counts["interactions.Comment"] == 30
+        assert Comment.objects.filter(parent=None).count() == 30
+
+    def test_zipf_popularity(self):
+        seeder = Seeder(zipf=1.5, max_cart=1)
+        seeder.seed(100, orders=500)
+
+        top = seeder.product_ids[0]
+        ordered = (
+            OrderItem.objects.values("product")
+            .annotate(orders=Count("id"))
+            .aggregate(most=Max("orders"))["most"]
+        )
+        assert OrderItem.objects.filter(product=top).count() == ordered
+        assert ordered > 500 // 10
+
+    # the same seed gives the same data
+    def test_deterministic(self):
+        def shape(seed):
+            seeder = Seeder(seed=seed)
+            seeder.seed(20)
+            first = min(seeder.product_ids)
+            ages = [
+                seeder.now - created_at
+                for created_at in Order.objects.filter(shop_id__in=seeder.shop_ids)
+                .order_by("id")
+                .values_list("created_at", flat=True)
+            ]
+            return sorted(
+                OrderItem.objects.filter(order__shop_id__in=seeder.shop_ids)
+                .values_list("product_id", "count")
+                .order_by("id")
+            ), first, ages
+
+        items, first, ages = shape(3)
+        again, again_first, again_ages = shape(3)
+        assert [(pk - first, count) for pk, count in items] == [
+            (pk - again_first, count) for pk, count in again
+        ]
+        assert ages == again_ages
+
+
+@pytest.mark.django_db
+class TestSeedScaleCommand:
+    """
+    test seed_scale command
+    """
+
+    def test_seed_scale(self):
+        out = StringIO()
+        call_command(
+            "seed_scale",
+            products=40,
+            sellers=3,
+            shops_per_seller=2,
+            category_roots=2,
+            category_depth=2,
+            batch_size=16,
+            stdout=out,
+        )
+
+        assert Product.objects.count() == 40
+        assert Shop.objects.count() == 6
+        assert Category.objects.filter(depth=1).count() == 8
+        assert "catalog.Product          40" in out.getvalue()
+        assert "seeded" in out.getvalue()
+
+    def test_invalid_option(self):
+        with pytest.raises(CommandError, match="--max-cart"):
+            call_command("seed_scale", max_cart=0, stdout=StringIO())
@@ -0,0 +1,45 @@
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+from django.urls import reverse
+
+from interactions.models import ProductRating, Rate
+
+
+@pytest.mark.django_db
+class TestReconcileRatingsCommand:
+    """
+    test reconcile_ratings management command
+    """
+
+    # test stats are rebuilt from the rates
+    def test_reconcile_ratings(self, product, products, regular_user, another_user):
+        Rate.objects.create(user=regular_user, product=product, score=2)
+        Rate.objects.create(user=another_user, product=product, score=5)
+        # stats that drifted and stats of a product with no rate
+        ProductRating.objects.create(product=product, rating_count=10)
+        ProductRating.objects.create(product=products[0], rating_count=3)
+
+        call_command("reconcile_ratings")
+
+        rating = ProductRating.objects.get(product=product)
+        assert rating.rating_count == 2
+        assert rating.rating_avg == 3.5
+        assert rating.histogram() == {1: 0, 2: 1, 3: 0, 4: 0, 5: 1}
+        assert ProductRating.objects.get(product=products[0]).rating_count == 0
+
+        product.refresh_from_db()
+        products[0].refresh_from_db()
+        assert (product.rating_count, product.rating_avg) == (2, 3.5)
+        assert (products[0].rating_count, products[0].rating_avg) == (None, None)
+
+    # test cached product details show the rebuilt stats
+    def test_reconcile_drops_cached_products(self, token_regular_user_client, product):
+        url = reverse("catalog:product-detail", kwargs={"pk": product.pk})
+        ProductRating.objects.create(product=product, rating_count=10)
+        assert token_regular_user_client.get(url).data["rating"]["count"] == 10
+
+        call_command("reconcile_ratings", stdout=StringIO())
+
+        assert token_regular_user_client.get(url).data["rating"]["count"] == 0
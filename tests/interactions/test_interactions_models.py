@@ -1,6 +1,7 @@
 import pytest
 from django.db import IntegrityError
-from interactions.models import Rate, Comment
+from decimal import Decimal
+from interactions.models import Rate, Comment, ProductRating
 
 
 @pytest.mark.django_db
@@ -50,3 +51,26 @@ class TestCommentModel:
         )
         assert replay_comment.parent == parent_comment
         assert replay_comment in parent_comment.replies.all()
+
+
+@pytest.mark.django_db
+class TestProductRatingModel:
+    """
+    test product rating stats
+    """
+
+    def test_add_score(self, product):
+        ProductRating.add_score(product.id, 5)
+        ProductRating.add_score(product.id, 4)
+        ProductRating.add_score(product.id, 4)
+
+        rating = ProductRating.objects.get(product=product)
+        assert rating.rating_count == 3
+        assert rating.rating_sum == 13
+        assert rating.rating_avg == Decimal("4.33")
+        assert rating.histogram() == {1: 0, 2: 0, 3: 0, 4: 2, 5: 1}
+
+        # the copy ProductList orders by
+        product.refresh_from_db()
+        assert product.rating_count == 3
+        assert product.rating_avg == Decimal("4.33")
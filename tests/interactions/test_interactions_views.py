@@ -2,7 +2,7 @@ import pytest
 from django.urls import reverse
 from rest_framework import status
 
-from interactions.models import Comment, Rate
+from interactions.models import Comment, ProductRating, Rate
 from tests.conftest import comment, regular_user
 
 
@@ -210,3 +210,167 @@ class TestRateCreateView:
         data = {"product": 9999, "score": 3}
         response = token_regular_user_client.post(url, data=data)
         assert response.status_code == status.HTTP_404_NOT_FOUND
+
+
+@pytest.mark.django_db
+class TestCommentQueryCount:
+    """
+    test number of queries does not grow with number of comments
+    """
+
+    @pytest.fixture
+    def comments(self, regular_user, products):
+        comments = []
+        for product in products:
+            comment = Comment.objects.create(
+                product=product, user=regular_user, text="comment"
+            )
+            reply = Comment.objects.create(
+                product=product, user=regular_user, text="reply", parent=comment
+            )
+            comments += [comment, reply]
+        return comments
+
+    def test_comment_list_queries(
+        self, token_regular_user_client, comments, django_assert_num_queries
+    ):
+        with django_assert_num_queries(2):
+            response = token_regular_user_client.get(
+                reverse("interactions:comment-list")
+            )
+        assert response.status_code == status.HTTP_200_OK
+        assert len(response.data["results"]) == len(comments)
+
+    def test_comment_detail_queries(
+        self, token_regular_user_client, comments, django_assert_num_queries
+    ):
+        url = reverse("interactions:comment-detail", kwargs={"pk": comments[1].pk})
+        with django_assert_num_queries(2):
+            response = token_regular_user_client.get(url)
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data["parent"]["id"] == comments[0].pk
+
+
+@pytest.mark.django_db
+class TestCommentThreadView:
+    """
+    test comment threads of one product
+    """
+
+    @pytest.fixture
+    def url(self, product):
+        return reverse(
+            "interactions:comment-threads", kwargs={"product_id": product.id}
+        )
+
+    @pytest.fixture
+    def thread(self, comment, product, regular_user, another_user):
+        reply = Comment.objects.create(
+            product=product, user=another_user, text="reply", parent=comment
+        )
+        deep = Comment.objects.create(
+            product=product, user=regular_user, text="deep", parent=reply
+        )
+        return comment, reply, deep
+
+    def test_thread_tree(self, token_regular_user_client, url, thread, product):
+        comment, reply, deep = thread
+        response = token_regular_user_client.get(url)
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data["product"] == product.id
+        [root] = response.data["results"]
+        assert root["id"] == comment.id
+        assert "product" not in root
+        assert root["replies"][0]["username"] == "anotheruser"
+        assert root["replies"][0]["replies"][0]["id"] == deep.id
+
+    # whole threads load with one query however deep they are
+    def test_thread_queries(
+        self,
+        token_regular_user_client,
+        url,
+        thread,
+        product,
+        regular_user,
+        django_assert_num_queries,
+    ):
+        parent = thread[-1]
+        for _ in range(10):
+            parent = Comment.objects.create(
+                product=product, user=regular_user, text="deeper", parent=parent
+            )
+        # jwt user, root comments, threads
+        with django_assert_num_queries(3):
+            response = token_regular_user_client.get(url)
+        assert response.status_code == status.HTTP_200_OK
+
+    # page size counts threads, not replies
+    def test_threads_paginated(
+        self, token_regular_user_client, url, thread, product, regular_user
+    ):
+        Comment.objects.create(product=product, user=regular_user, text="newest")
+
+        response = token_regular_user_client.get(url, {"page_size": 1})
+        assert [root["text"] for root in response.data["results"]] == ["newest"]
+
+        response = token_regular_user_client.get(response.data["next"])
+        assert [root["id"] for root in response.data["results"]] == [thread[0].id]
+        assert len(response.data["results"][0]["replies"]) == 1
+
+    # other products comments are not in the thread
+    def test_other_product(self, token_regular_user_client, thread, products):
+        url = reverse(
+            "interactions:comment-threads", kwargs={"product_id": products[1].id}
+        )
+        response = token_regular_user_client.get(url)
+        assert response.data["results"] == []
+
+
+@pytest.mark.django_db
+class TestProductRatingStats:
+    """
+    test rating stats are kept by rate create and used by product list
+    """
+
+    # test new rate updates the stats shown in product detail
+    def test_rate_updates_product_rating(
+        self, token_regular_user_client, token_another_user_client, product
+    ):
+        url = reverse("interactions:rate-create")
+        token_regular_user_client.post(url, data={"product": product.id, "score": 5})
+        token_another_user_client.post(url, data={"product": product.id, "score": 2})
+
+        detail_url = reverse("catalog:product-detail", kwargs={"pk": product.id})
+        rating = token_regular_user_client.get(detail_url).data["rating"]
+        assert rating["count"] == 2
+        assert float(rating["avg"]) == 3.5
+        assert rating["histogram"][5] == 1
+
+    # test product list can be ordered by rating, not rated products last
+    def test_product_list_ordering_by_rating(
+        self, token_regular_user_client, products
+    ):
+        ProductRating.add_score(products[1].id, 3)
+        ProductRating.add_score(products[3].id, 5)
+
+        url = reverse("catalog:product-list")
+        response = token_regular_user_client.get(url, {"ordering": "-rating_avg"})
+        ids = [item["id"] for item in response.data["results"]]
+        assert ids[:2] == [products[3].id, products[1].id]
+
+        response = token_regular_user_client.get(url, {"ordering": "rating_avg"})
+        ids = [item["id"] for item in response.data["results"]]
+        assert ids[:2] == [products[1].id, products[3].id]
+
+    # test equal ratings and unrated products keep one order, newest id first
+    def test_rating_ordering_is_stable(self, token_regular_user_client, products):
+        ProductRating.add_score(products[1].id, 4)
+        ProductRating.add_score(products[3].id, 4)
+
+        response = token_regular_user_client.get(
+            reverse("catalog:product-list"), {"ordering": "-rating_avg"}
+        )
+        ids = [item["id"] for item in response.data["results"]]
+        order = [products[3], products[1], products[4], products[2], products[0]]
+        assert ids == [product.id for product in order]
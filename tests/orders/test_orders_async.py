@@ -0,0 +1,201 @@
+import pytest
+from datetime import timedelta
+from django.db import DatabaseError
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+
+from orders.models import Coupon, Delivery, Order, OrderRequest, StockReservation
+from orders import tasks
+from orders.tasks import place_order, reclaim_order_requests
+
+
+@pytest.mark.django_db
+class TestAsyncOrderCreate:
+    """
+    test OrderCreate with Prefer: respond-async and the place_order task
+    """
+
+    @pytest.fixture
+    def url(self):
+        return reverse("orders:order-create")
+
+    @pytest.fixture
+    def queued(self, monkeypatch):
+        # no broker in tests, collect what would be sent to the orders queue
+        sent = []
+        monkeypatch.setattr(place_order, "delay", sent.append)
+        return sent
+
+    @pytest.fixture
+    def data(self, shop, address, product):
+        return {
+            "shop": shop.id,
+            "address": address.id,
+            "items": [{"product": product.id, "count": 2}],
+        }
+
+    def post(self, client, url, data):
+        return client.post(url, data=data, format="json", HTTP_PREFER="respond-async")
+
+    def test_order_is_queued(
+        self,
+        token_regular_user_client,
+        url,
+        data,
+        queued,
+        django_capture_on_commit_callbacks,
+    ):
+        with django_capture_on_commit_callbacks(execute=True):
+            response = self.post(token_regular_user_client, url, data)
+
+        assert response.status_code == status.HTTP_202_ACCEPTED
+        order_request = OrderRequest.objects.get()
+        assert response["Location"] == reverse(
+            "orders:order-request-detail", kwargs={"pk": order_request.pk}
+        )
+        assert response.data["status_url"].endswith(response["Location"])
+        assert response.data["status"] == "QUEUED"
+        assert queued == [order_request.pk]
+        assert not Order.objects.exists()
+
+    # only the body shape is checked, no lookups in the web request
+    def test_enqueue_queries(
+        self, token_regular_user_client, url, data, queued, django_assert_num_queries
+    ):
+        # jwt user, insert of the request
+        with django_assert_num_queries(2):
+            response = self.post(token_regular_user_client, url, data)
+        assert response.status_code == status.HTTP_202_ACCEPTED
+
+    def test_invalid_body(self, token_regular_user_client, url, shop, queued):
+        response = self.post(
+            token_regular_user_client, url, {"shop": shop.id, "items": []}
+        )
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert not OrderRequest.objects.exists()
+
+    # worker prices the order, applies the coupon and creates the delivery
+    def test_place_order(self, token_regular_user_client, url, data, queued, product):
+        now = timezone.now()
+        Coupon.objects.create(
+            code="OFF10",
+            discount_percent=10,
+            valid_from=now - timedelta(days=1),
+            valid_to=now + timedelta(days=1),
+        )
+        product.stock = 5
+        product.save()
+        data.update(coupon="OFF10", delivery="POST")
+        self.post(token_regular_user_client, url, data)
+        order_request = OrderRequest.objects.get()
+
+        place_order(order_request.pk)
+
+        order_request.refresh_from_db()
+        order = order_request.order
+        assert order_request.status == "DONE"
+        assert order.total_price == 180
+        assert order.coupon.code == "OFF10"
+        assert Delivery.objects.get(order=order).method == "POST"
+        assert StockReservation.objects.get(order=order).count == 2
+
+        # a second delivery of the task does nothing
+        assert place_order(order_request.pk) is None
+        assert Order.objects.count() == 1
+
+    # out of stock fails the request and nothing is written
+    def test_place_order_fails(self, data, product, regular_user):
+        product.stock = 1
+        product.save()
+        order_request = OrderRequest.objects.create(user=regular_user, payload=data)
+
+        place_order(order_request.pk)
+
+        order_request.refresh_from_db()
+        assert order_request.status == "FAILED"
+        assert "items" in order_request.errors
+        assert not Order.objects.exists()
+
+    def test_place_order_bad_coupon(self, data, regular_user):
+        order_request = OrderRequest.objects.create(
+            user=regular_user, payload={**data, "coupon": "NOPE"}
+        )
+
+        place_order(order_request.pk)
+
+        order_request.refresh_from_db()
+        assert order_request.status == "FAILED"
+        assert "coupon" in order_request.errors
+        assert not Order.objects.exists()
+
+    # test an unexpected error puts the request back in the queue
+    def test_place_order_retries(self, monkeypatch, data, regular_user):
+        calls = []
+
+        def checkout(order_request_id, checkout=tasks.checkout):
+            calls.append(order_request_id)
+            if len(calls) == 1:
+                raise DatabaseError("connection lost")
+            return checkout(order_request_id)
+
+        monkeypatch.setattr(tasks, "checkout", checkout)
+        order_request = OrderRequest.objects.create(user=regular_user, payload=data)
+
+        place_order.apply(args=[order_request.pk])
+
+        order_request.refresh_from_db()
+        assert len(calls) == 2
+        assert order_request.status == "DONE"
+        assert order_request.attempts == 2
+        assert Order.objects.count() == 1
+
+    # test the request fails after the last attempt instead of staying PROCESSING
+    def test_place_order_gives_up(self, monkeypatch, data, regular_user):
+        def checkout(order_request_id):
+            raise DatabaseError("connection lost")
+
+        monkeypatch.setattr(tasks, "checkout", checkout)
+        order_request = OrderRequest.objects.create(user=regular_user, payload=data)
+
+        result = place_order.apply(args=[order_request.pk])
+
+        order_request.refresh_from_db()
+        assert result.failed()
+        assert order_request.status == "FAILED"
+        assert order_request.attempts == tasks.PLACE_ORDER_MAX_ATTEMPTS
+        assert order_request.errors == tasks.PLACE_ORDER_ERROR
+
+    def test_reclaim_order_requests(self, queued, data, regular_user):
+        lost, last, running = [
+            OrderRequest.objects.create(
+                user=regular_user, payload=data, status="PROCESSING", attempts=attempts
+            )
+            for attempts in [1, tasks.PLACE_ORDER_MAX_ATTEMPTS, 1]
+        ]
+        OrderRequest.objects.filter(pk__in=[lost.pk, last.pk]).update(
+            updated_at=timezone.now() - timedelta(minutes=10)
+        )
+
+        assert reclaim_order_requests() == 1
+
+        assert queued == [lost.pk]
+        statuses = dict(OrderRequest.objects.values_list("pk", "status"))
+        assert statuses == {
+            lost.pk: "QUEUED",
+            last.pk: "FAILED",
+            running.pk: "PROCESSING",
+        }
+
+    def test_status_view(
+        self, token_regular_user_client, token_another_user_client, data, regular_user
+    ):
+        order_request = OrderRequest.objects.create(user=regular_user, payload=data)
+        url = reverse("orders:order-request-detail", kwargs={"pk": order_request.pk})
+
+        response = token_regular_user_client.get(url)
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data["status"] == "QUEUED"
+
+        response = token_another_user_client.get(url)
+        assert response.status_code == status.HTTP_403_FORBIDDEN
@@ -0,0 +1,216 @@
+import pytest
+from django.urls import reverse
+from rest_framework import status
+
+from catalog.models import Product, Shop
+from orders.cart import CART_MAX_PRODUCTS
+from orders.models import Order, OrderItem
+
+
+class HashStore:
+    """
+    the redis hash commands the cart uses (there is no redis in tests)
+    """
+
+    def __init__(self):
+        self.data = {}
+
+    def hgetall(self, key):
+        return {
+            field.encode(): str(value).encode()
+            for field, value in self.data.get(key, {}).items()
+        }
+
+    def hexists(self, key, field):
+        return str(field) in self.data.get(key, {})
+
+    def hlen(self, key):
+        return len(self.data.get(key, {}))
+
+    def hincrby(self, key, field, amount):
+        fields = self.data.setdefault(key, {})
+        fields[str(field)] = fields.get(str(field), 0) + amount
+        return fields[str(field)]
+
+    def hset(self, key, field, value):
+        self.data.setdefault(key, {})[str(field)] = int(value)
+
+    def hdel(self, key, field):
+        self.data.get(key, {}).pop(str(field), None)
+
+    def expire(self, key, seconds):
+        pass
+
+    def delete(self, key):
+        self.data.pop(key, None)
+
+
+@pytest.fixture
+def redis_store(monkeypatch):
+    store = HashStore()
+    monkeypatch.setattr("orders.cart.get_redis_connection", lambda alias: store)
+    return store
+
+
+@pytest.fixture
+def other_shop_product(address, another_user, category):
+    shop = Shop.objects.create(owner=another_user, name="other", address=address)
+    return Product.objects.create(
+        shop=shop, category=category, name="other", description="other", price=50
+    )
+
+
+@pytest.mark.django_db
+class TestCartViews:
+    """
+    test server side cart
+    """
+
+    def add(self, client, product, count):
+        return client.post(
+            reverse("orders:cart-item-add"),
+            {"product": product.id, "count": count},
+            format="json",
+        )
+
+    def test_add_to_cart(self, token_regular_user_client, redis_store, product):
+        self.add(token_regular_user_client, product, 2)
+        response = self.add(token_regular_user_client, product, 3)
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data["count"] == 5
+
+    def test_add_unknown_product(self, token_regular_user_client, redis_store):
+        response = token_regular_user_client.post(
+            reverse("orders:cart-item-add"), {"product": 999, "count": 1}
+        )
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
+    # cart is grouped by shop with prices from one query
+    def test_cart_detail(
+        self,
+        token_regular_user_client,
+        redis_store,
+        product,
+        other_shop_product,
+        django_assert_num_queries,
+    ):
+        self.add(token_regular_user_client, product, 2)
+        self.add(token_regular_user_client, other_shop_product, 1)
+
+        # products (the jwt user is cached by the first requests)
+        with django_assert_num_queries(1):
+            response = token_regular_user_client.get(reverse("orders:cart-detail"))
+
+        assert response.status_code == status.HTTP_200_OK
+        assert [shop["subtotal"] for shop in response.data["shops"]] == [200, 50]
+        assert response.data["total"] == 250
+
+    def test_change_and_remove(self, token_regular_user_client, redis_store, product):
+        self.add(token_regular_user_client, product, 2)
+        url = reverse("orders:cart-item-detail", kwargs={"product_id": product.id})
+
+        token_regular_user_client.put(url, {"count": 7}, format="json")
+        assert redis_store.data == {
+            f"cart:{product.shop.owner_id}": {str(product.id): 7}
+        }
+
+        response = token_regular_user_client.delete(url)
+        assert response.status_code == status.HTTP_204_NO_CONTENT
+        response = token_regular_user_client.get(reverse("orders:cart-detail"))
+        assert response.data["shops"] == []
+
+    # test put checks the product like add does
+    def test_change_unknown_product(self, token_regular_user_client, redis_store):
+        url = reverse("orders:cart-item-detail", kwargs={"product_id": 999})
+        response = token_regular_user_client.put(url, {"count": 1}, format="json")
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+        assert redis_store.data == {}
+
+    # test put cant grow a full cart
+    def test_change_full_cart(self, token_regular_user_client, redis_store, product):
+        key = f"cart:{product.shop.owner_id}"
+        redis_store.data[key] = {str(-n): 1 for n in range(1, CART_MAX_PRODUCTS + 1)}
+        url = reverse("orders:cart-item-detail", kwargs={"product_id": product.id})
+
+        response = token_regular_user_client.put(url, {"count": 1}, format="json")
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert str(product.id) not in redis_store.data[key]
+
+
+@pytest.mark.django_db
+class TestCartCheckout:
+    """
+    test checkout splits the cart into one order per shop
+    """
+
+    @pytest.fixture
+    def url(self):
+        return reverse("orders:cart-checkout")
+
+    @pytest.fixture
+    def cart(
+        self, token_regular_user_client, redis_store, products, other_shop_product
+    ):
+        for product, count in [
+            (products[0], 2),
+            (products[1], 1),
+            (other_shop_product, 3),
+        ]:
+            token_regular_user_client.post(
+                reverse("orders:cart-item-add"),
+                {"product": product.id, "count": count},
+                format="json",
+            )
+        return redis_store
+
+    def test_checkout_splits_by_shop(
+        self,
+        token_regular_user_client,
+        url,
+        cart,
+        address,
+        shop,
+        other_shop_product,
+        django_assert_num_queries,
+    ):
+        # address, products, savepoint, orders, items, release savepoint
+        # (the jwt user is cached by the requests that filled the cart)
+        with django_assert_num_queries(6):
+            response = token_regular_user_client.post(
+                url, {"address": address.id}, format="json"
+            )
+
+        assert response.status_code == status.HTTP_201_CREATED
+        totals = {
+            order["shop"]: order["total_price"] for order in response.data["orders"]
+        }
+        assert totals == {shop.id: "300.00", other_shop_product.shop_id: "150.00"}
+        assert OrderItem.objects.count() == 3
+        assert cart.data == {}
+
+    def test_checkout_empty_cart(
+        self, token_regular_user_client, url, redis_store, address
+    ):
+        response = token_regular_user_client.post(url, {"address": address.id})
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    # short stock fails every order of the cart and keeps the cart
+    def test_checkout_out_of_stock(
+        self, token_regular_user_client, url, cart, address, other_shop_product
+    ):
+        other_shop_product.stock = 1
+        other_shop_product.save()
+
+        response = token_regular_user_client.post(url, {"address": address.id})
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert not Order.objects.exists()
+        assert cart.data != {}
+
+    def test_checkout_with_others_address(
+        self, token_another_user_client, url, redis_store, address
+    ):
+        response = token_another_user_client.post(url, {"address": address.id})
+        assert response.status_code == status.HTTP_404_NOT_FOUND
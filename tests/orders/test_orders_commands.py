@@ -0,0 +1,66 @@
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+
+from catalog.models import Product
+from orders.models import Coupon, OrderItem
+
+
+@pytest.mark.django_db
+class TestRecomputeOrderTotalsCommand:
+    """
+    test recompute_order_totals management command
+    """
+
+    def test_recompute_order_totals(self, order, product):
+        OrderItem.objects.create(order=order, product=product, count=3, row_price=300)
+
+        call_command("recompute_order_totals", batch_size=1)
+
+        order.refresh_from_db()
+        assert order.subtotal == 300
+        assert order.item_count == 3
+        assert order.total_price == 300
+
+
+@pytest.mark.django_db(transaction=True)
+class TestBenchCouponRedemptionCommand:
+    """
+    test bench_coupon_redemption management command
+    """
+
+    def test_bench_coupon_redemption(self):
+        out = StringIO()
+        call_command(
+            "bench_coupon_redemption",
+            redemptions=20,
+            max_usage=5,
+            threads=1,
+            stdout=out,
+        )
+
+        assert "no overselling" in out.getvalue()
+        assert not Coupon.objects.exists()
+
+
+@pytest.mark.django_db(transaction=True)
+class TestBenchStockReservationCommand:
+    """
+    test bench_stock_reservation management command
+    """
+
+    def test_bench_stock_reservation(self):
+        out = StringIO()
+        call_command(
+            "bench_stock_reservation",
+            checkouts=10,
+            stock=4,
+            products=2,
+            cart_size=2,
+            threads=1,
+            stdout=out,
+        )
+
+        assert "placed 4, out of stock 6, deadlocks 0" in out.getvalue()
+        assert not Product.objects.exists()
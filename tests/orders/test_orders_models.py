@@ -1,5 +1,17 @@
 import pytest
-from orders.models import OrderItem, Delivery
+from decimal import Decimal
+from datetime import timedelta
+from django.utils import timezone
+from orders.models import (
+    Coupon,
+    CouponError,
+    CouponRedemption,
+    Delivery,
+    Order,
+    OrderItem,
+    recompute_order_totals,
+    redeem_coupon,
+)
 
 
 @pytest.mark.django_db
@@ -16,6 +28,81 @@ class TestOrderModel:
         assert order.total_price == 100
 
 
+@pytest.mark.django_db
+class TestOrderTotals:
+    """
+    test order totals come from one aggregate of the items
+    """
+
+    @pytest.fixture
+    def coupon(self):
+        now = timezone.now()
+        return Coupon.objects.create(
+            code="OFF10",
+            discount_percent=10,
+            valid_from=now - timedelta(days=1),
+            valid_to=now + timedelta(days=1),
+            min_order_amount=50,
+        )
+
+    @pytest.fixture
+    def items(self, order, products):
+        return [
+            OrderItem.objects.create(
+                order=order, product=product, count=2, row_price=product.price * 2
+            )
+            for product in products[:3]
+        ]
+
+    # row_price is already price * count, it must not be multiplied again
+    def test_calculate_total_price(self, order, items, django_assert_num_queries):
+        with django_assert_num_queries(1):
+            total = order.calculate_total_price()
+        assert total == 600
+        assert order.subtotal == 600
+        assert order.item_count == 6
+        assert order.discount_amount == 0
+
+    def test_calculate_total_price_with_coupon(self, order, items, coupon):
+        order.coupon = coupon
+        assert order.calculate_total_price() == 540
+        assert order.discount_amount == 60
+
+    # test set based recompute fixes stored totals
+    def test_recompute_order_totals(self, order, items, coupon):
+        Order.objects.filter(pk=order.pk).update(coupon=coupon, total_price=1)
+
+        recompute_order_totals(Order.objects.all())
+
+        order.refresh_from_db()
+        assert order.subtotal == 600
+        assert order.item_count == 6
+        assert order.discount_amount == 60
+        assert order.total_price == 540
+
+    # test both paths round a half cent discount the same way (up)
+    def test_discount_rounding_matches(self, order, product, coupon):
+        OrderItem.objects.create(
+            order=order, product=product, count=1, row_price=Decimal("50.25")
+        )
+        order.coupon = coupon
+        order.calculate_total_price()
+        assert order.discount_amount == Decimal("5.03")
+
+        Order.objects.filter(pk=order.pk).update(coupon=coupon)
+        recompute_order_totals(Order.objects.all())
+        order.refresh_from_db()
+        assert order.discount_amount == Decimal("5.03")
+        assert order.total_price == Decimal("45.22")
+
+    # test order without items
+    def test_recompute_order_totals_no_items(self, order):
+        recompute_order_totals(Order.objects.all())
+        order.refresh_from_db()
+        assert order.subtotal == 0
+        assert order.total_price == 0
+
+
 @pytest.mark.django_db
 class TestOrderItemModel:
     """
@@ -42,3 +129,61 @@ class TestDeliveryModel:
         delivery = Delivery.objects.create(order=order, method="TPOX")
         assert delivery.method == "TPOX"
         assert delivery.order == order
+
+
+@pytest.mark.django_db
+class TestCouponRedemption:
+    """
+    test coupon slots can not be oversold
+    """
+
+    @pytest.fixture
+    def coupon(self):
+        now = timezone.now()
+        return Coupon.objects.create(
+            code="ONCE",
+            discount_percent=10,
+            valid_from=now - timedelta(days=1),
+            valid_to=now + timedelta(days=1),
+            max_usage=1,
+        )
+
+    # test used up coupon is not valid
+    def test_is_valid(self, coupon):
+        assert coupon.is_valid()
+        coupon.usage_count = 1
+        assert not coupon.is_valid()
+
+    # test inactive coupon is not valid
+    def test_inactive_coupon_is_not_valid(self, coupon):
+        coupon.active = False
+        assert not coupon.is_valid()
+
+    # test take_slot stops at max_usage
+    def test_take_slot(self, coupon):
+        assert coupon.take_slot()
+        assert not coupon.take_slot()
+        coupon.refresh_from_db()
+        assert coupon.usage_count == 1
+
+    def test_redeem_coupon(self, order, coupon):
+        order = redeem_coupon(order, "ONCE")
+
+        coupon.refresh_from_db()
+        assert order.coupon == coupon
+        assert coupon.usage_count == 1
+        assert CouponRedemption.objects.get(order=order).coupon == coupon
+
+    # test second order cant use the last slot again
+    def test_redeem_coupon_used_up(self, order, coupon, shop, address, regular_user):
+        redeem_coupon(order, "ONCE")
+        other = Order.objects.create(shop=shop, user=regular_user, address=address)
+
+        with pytest.raises(CouponError):
+            redeem_coupon(other, "ONCE")
+
+        coupon.refresh_from_db()
+        other.refresh_from_db()
+        assert coupon.usage_count == 1
+        assert other.coupon is None
+        assert not CouponRedemption.objects.filter(order=other).exists()
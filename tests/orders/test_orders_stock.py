@@ -0,0 +1,170 @@
+import pytest
+from datetime import timedelta
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+
+from catalog.models import Product
+from catalog.serializers import ProductSerializer
+from orders.models import Order, StockReservation
+from orders.stock import cancel_order, complete_order, release_expired_reservations
+
+
+@pytest.mark.django_db
+class TestStockReservation:
+    """
+    test checkout holds stock and never oversells
+    """
+
+    @pytest.fixture
+    def stocked(self, products):
+        for product in products[:2]:
+            product.stock = 3
+            product.save()
+        return products[:2]
+
+    def checkout(self, client, shop, address, *items):
+        return client.post(
+            reverse("orders:order-create"),
+            {
+                "shop": shop.id,
+                "address": address.id,
+                "items": [{"product": p.id, "count": count} for p, count in items],
+            },
+            format="json",
+        )
+
+    def test_checkout_reserves_stock(
+        self, token_regular_user_client, shop, address, stocked
+    ):
+        response = self.checkout(
+            token_regular_user_client, shop, address, (stocked[0], 2), (stocked[1], 1)
+        )
+        assert response.status_code == status.HTTP_201_CREATED
+
+        stocked[0].refresh_from_db()
+        stocked[1].refresh_from_db()
+        assert stocked[0].stock == 1
+        assert stocked[1].stock == 2
+        assert StockReservation.objects.filter(status="HELD").count() == 2
+
+    # test short product rejects the whole order and nothing is taken
+    def test_checkout_out_of_stock(
+        self, token_regular_user_client, shop, address, stocked
+    ):
+        response = self.checkout(
+            token_regular_user_client, shop, address, (stocked[0], 1), (stocked[1], 4)
+        )
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert "items" in response.data
+
+        stocked[0].refresh_from_db()
+        assert stocked[0].stock == 3
+        assert not Order.objects.exists()
+        assert not StockReservation.objects.exists()
+
+    # test same product in two rows is counted together
+    def test_checkout_same_product_twice(
+        self, token_regular_user_client, shop, address, stocked
+    ):
+        response = self.checkout(
+            token_regular_user_client, shop, address, (stocked[0], 2), (stocked[0], 2)
+        )
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    # test products without stock tracking are not reserved
+    def test_checkout_untracked_product(
+        self, token_regular_user_client, shop, address, products
+    ):
+        response = self.checkout(token_regular_user_client, shop, address, (products[4], 50))
+        assert response.status_code == status.HTTP_201_CREATED
+        assert not StockReservation.objects.exists()
+
+    def test_complete_order(self, token_regular_user_client, shop, address, stocked):
+        self.checkout(token_regular_user_client, shop, address, (stocked[0], 2))
+        order = Order.objects.get()
+
+        assert complete_order(order)
+        assert not complete_order(order)
+        order.refresh_from_db()
+        stocked[0].refresh_from_db()
+        assert order.status == "COMPLETED"
+        assert stocked[0].stock == 1
+        assert StockReservation.objects.get().status == "COMMITTED"
+
+    def test_cancel_order(self, token_regular_user_client, shop, address, stocked):
+        self.checkout(token_regular_user_client, shop, address, (stocked[0], 2))
+        order = Order.objects.get()
+
+        assert cancel_order(order)
+        order.refresh_from_db()
+        stocked[0].refresh_from_db()
+        assert order.status == "CANCELLED"
+        assert stocked[0].stock == 3
+        assert StockReservation.objects.get().status == "RELEASED"
+
+    def test_release_expired_reservations(
+        self, token_regular_user_client, shop, address, stocked
+    ):
+        self.checkout(token_regular_user_client, shop, address, (stocked[0], 2))
+        self.checkout(token_regular_user_client, shop, address, (stocked[1], 1))
+        expired = StockReservation.objects.get(product=stocked[0])
+        StockReservation.objects.filter(pk=expired.pk).update(
+            expires_at=timezone.now() - timedelta(minutes=1)
+        )
+
+        assert release_expired_reservations() == 1
+
+        stocked[0].refresh_from_db()
+        stocked[1].refresh_from_db()
+        assert stocked[0].stock == 3
+        assert stocked[1].stock == 2
+        assert Order.objects.get(pk=expired.order_id).status == "CANCELLED"
+
+    # test admin completes, owner cancels with delete
+    def test_complete_and_cancel_views(
+        self, token_admin_client, token_regular_user_client, shop, address, stocked
+    ):
+        self.checkout(token_regular_user_client, shop, address, (stocked[0], 1))
+        self.checkout(token_regular_user_client, shop, address, (stocked[0], 1))
+        first, second = Order.objects.order_by("id")
+
+        response = token_admin_client.post(
+            reverse("orders:order-complete", kwargs={"pk": first.pk})
+        )
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data["status"] == "COMPLETED"
+
+        response = token_regular_user_client.delete(
+            reverse("orders:order-delete", kwargs={"pk": second.pk})
+        )
+        assert response.status_code == status.HTTP_204_NO_CONTENT
+        stocked[0].refresh_from_db()
+        assert stocked[0].stock == 2
+
+        # completed order cant be cancelled
+        response = token_regular_user_client.delete(
+            reverse("orders:order-delete", kwargs={"pk": first.pk})
+        )
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    # test product edits dont write back the stock read before a reservation
+    def test_product_update_keeps_reserved_stock(
+        self, token_regular_user_client, shop, address, stocked
+    ):
+        product = Product.objects.get(pk=stocked[0].pk)
+        self.checkout(token_regular_user_client, shop, address, (stocked[0], 2))
+
+        srz_data = ProductSerializer(product, data={"name": "renamed"}, partial=True)
+        assert srz_data.is_valid()
+        srz_data.save()
+
+        response = token_regular_user_client.put(
+            reverse("catalog:product-update", kwargs={"pk": product.pk}),
+            {"name": "renamed again", "stock": 10},
+            format="json",
+        )
+        assert response.status_code == status.HTTP_200_OK
+        product.refresh_from_db()
+        assert product.name == "renamed again"
+        assert product.stock == 1
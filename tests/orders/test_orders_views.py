@@ -1,7 +1,11 @@
 import pytest
 from django.urls import reverse
+from django.core.cache import cache
 from rest_framework import status
 from decimal import Decimal
+from datetime import timedelta
+from django.utils import timezone
+from orders.models import Coupon, Delivery, Order, OrderItem
 from tests.conftest import address
 
 
@@ -98,6 +102,56 @@ class TestOrderCreateView:
         assert response.data["shop"] == shop.id
         assert response.data["address"] == address.id
 
+    # test products of the cart are loaded with one query and items are bulk inserted
+    def test_create_order_queries_do_not_grow_with_items(
+        self,
+        token_regular_user_client,
+        url,
+        shop,
+        address,
+        products,
+        django_assert_num_queries,
+    ):
+        data = {
+            "shop": shop.id,
+            "address": address.id,
+            "items": [{"product": product.id, "count": 3} for product in products],
+        }
+        # jwt user, shop, address, products, savepoint, order, items,
+        # release savepoint, items in response
+        with django_assert_num_queries(9):
+            response = token_regular_user_client.post(url, data=data, format="json")
+        assert response.status_code == status.HTTP_201_CREATED
+        assert Decimal(response.data["total_price"]) == 100 * 3 * len(products)
+        assert len(response.data["items"]) == len(products)
+
+    # test unknown product in the cart
+    def test_create_order_with_unknown_product(
+        self, token_regular_user_client, url, shop, address, product
+    ):
+        data = {
+            "shop": shop.id,
+            "address": address.id,
+            "items": [{"product": product.id, "count": 1}, {"product": 9999, "count": 1}],
+        }
+        response = token_regular_user_client.post(url, data=data, format="json")
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert "product" in response.data["items"][1]
+
+    # test zero and negative counts are rejected, not sent to the database
+    @pytest.mark.parametrize("count", [0, -2])
+    def test_create_order_with_invalid_count(
+        self, token_regular_user_client, url, shop, address, product, count
+    ):
+        data = {
+            "shop": shop.id,
+            "address": address.id,
+            "items": [{"product": product.id, "count": count}],
+        }
+        response = token_regular_user_client.post(url, data=data, format="json")
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert "count" in response.data["items"][0]
+
     # tset unauthenticated user cant create order
     def test_unauthenticated_user_cannot_create_order(self, client, url):
         response = client.post(url)
@@ -346,6 +400,35 @@ class TestDeliveryListView:
         assert response.status_code == status.HTTP_200_OK
 
 
+@pytest.mark.django_db
+class TestDeliveryListScope:
+    """
+    test delivery list only has deliveries of the user orders
+    """
+
+    @pytest.fixture
+    def deliveries(self, delivery, shop, address, another_user):
+        other_order = Order.objects.create(shop=shop, user=another_user, address=address)
+        return [delivery, Delivery.objects.create(order=other_order, method="POST")]
+
+    def test_user_sees_own_deliveries(self, token_regular_user_client, deliveries):
+        response = token_regular_user_client.get(reverse("orders:delivery-list"))
+        assert [row["id"] for row in response.data] == [deliveries[0].id]
+
+    def test_admin_sees_all_deliveries(self, token_admin_client, deliveries):
+        response = token_admin_client.get(reverse("orders:delivery-list"))
+        assert len(response.data) == 2
+
+    # object check reads order.user_id from the joined order, no extra query
+    def test_other_user_orderitem_detail_queries(
+        self, token_another_user_client, order_item, django_assert_num_queries
+    ):
+        url = reverse("orders:orderitem-detail", kwargs={"pk": order_item.pk})
+        with django_assert_num_queries(2):
+            response = token_another_user_client.get(url)
+        assert response.status_code == status.HTTP_403_FORBIDDEN
+
+
 @pytest.mark.django_db
 class TestDeliveryDetailView:
     """
@@ -445,3 +528,217 @@ class TestDeliveryDeleteView:
     ):
         response = token_regular_user_client.delete(url)
         assert response.status_code == status.HTTP_403_FORBIDDEN
+
+
+@pytest.mark.django_db
+class TestOrderQueryCount:
+    """
+    test number of queries does not grow with number of order items
+    """
+
+    @pytest.fixture
+    def order_items(self, order, products):
+        return [
+            OrderItem.objects.create(
+                order=order, product=product, count=1, row_price=product.price
+            )
+            for product in products
+        ]
+
+    def test_order_list_queries(
+        self, token_admin_client, order_items, django_assert_num_queries
+    ):
+        # jwt user + orders + prefetched items
+        with django_assert_num_queries(3):
+            response = token_admin_client.get(reverse("orders:order-list"))
+        assert response.status_code == status.HTTP_200_OK
+        assert len(response.data["results"][0]["items"]) == len(order_items)
+
+    def test_order_detail_queries(
+        self, token_regular_user_client, order, order_items, django_assert_num_queries
+    ):
+        url = reverse("orders:order-detail", kwargs={"pk": order.pk})
+        with django_assert_num_queries(3):
+            response = token_regular_user_client.get(url)
+        assert response.status_code == status.HTTP_200_OK
+
+    def test_orderitem_list_queries(
+        self, token_admin_client, order_items, django_assert_num_queries
+    ):
+        with django_assert_num_queries(2):
+            response = token_admin_client.get(reverse("orders:orderitem-list"))
+        assert response.status_code == status.HTTP_200_OK
+
+    def test_orderitem_detail_queries(
+        self, token_regular_user_client, order_items, django_assert_num_queries
+    ):
+        url = reverse("orders:orderitem-detail", kwargs={"pk": order_items[0].pk})
+        with django_assert_num_queries(2):
+            response = token_regular_user_client.get(url)
+        assert response.status_code == status.HTTP_200_OK
+
+
+@pytest.mark.django_db
+class TestOrderExportView:
+    """
+    test streaming order export
+    """
+
+    @pytest.fixture
+    def url(self):
+        return reverse("orders:order-export")
+
+    # test admin can export orders
+    def test_admin_can_export_orders(self, token_admin_client, url, order):
+        response = token_admin_client.get(url)
+        assert response.status_code == status.HTTP_200_OK
+        content = b"".join(response.streaming_content).decode()
+        assert f'"id": {order.id}' in content
+
+    # test regular user cant
+    def test_regular_user_cant_export_orders(self, token_regular_user_client, url):
+        response = token_regular_user_client.get(url)
+        assert response.status_code == status.HTTP_403_FORBIDDEN
+
+
+@pytest.mark.django_db
+class TestCouponView:
+    """
+    test applying coupon to order
+    """
+
+    @pytest.fixture
+    def coupon(self):
+        now = timezone.now()
+        return Coupon.objects.create(
+            code="ONCE",
+            discount_percent=10,
+            valid_from=now - timedelta(days=1),
+            valid_to=now + timedelta(days=1),
+            max_usage=1,
+        )
+
+    def url(self, order):
+        return reverse("orders:apply-coupon", kwargs={"order_id": order.id})
+
+    def test_owner_can_apply_coupon(self, token_regular_user_client, order, coupon):
+        response = token_regular_user_client.post(self.url(order), {"code": "ONCE"})
+        assert response.status_code == status.HTTP_200_OK
+        coupon.refresh_from_db()
+        assert coupon.usage_count == 1
+
+    # test used up coupon is rejected on another order
+    def test_coupon_is_not_oversold(
+        self, token_regular_user_client, order, coupon, shop, address, regular_user
+    ):
+        other = Order.objects.create(shop=shop, user=regular_user, address=address)
+        token_regular_user_client.post(self.url(order), {"code": "ONCE"})
+
+        response = token_regular_user_client.post(self.url(other), {"code": "ONCE"})
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        coupon.refresh_from_db()
+        assert coupon.usage_count == 1
+
+    # test same order cant take a second slot
+    def test_coupon_applied_twice(self, token_regular_user_client, order, coupon):
+        coupon.max_usage = 5
+        coupon.save()
+        token_regular_user_client.post(self.url(order), {"code": "ONCE"})
+
+        response = token_regular_user_client.post(self.url(order), {"code": "ONCE"})
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        coupon.refresh_from_db()
+        assert coupon.usage_count == 1
+
+    def test_unknown_code(self, token_regular_user_client, order):
+        response = token_regular_user_client.post(self.url(order), {"code": "NOPE"})
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+
+@pytest.mark.django_db
+class TestIdempotentOrderCreate:
+    """
+    test Idempotency-Key on order create and apply coupon
+    """
+
+    @pytest.fixture
+    def url(self):
+        return reverse("orders:order-create")
+
+    @pytest.fixture
+    def data(self, shop, address, product):
+        return {
+            "shop": shop.id,
+            "address": address.id,
+            "items": [{"product": product.id, "count": 2}],
+        }
+
+    def post(self, client, url, data, key):
+        return client.post(url, data=data, format="json", HTTP_IDEMPOTENCY_KEY=key)
+
+    # retry gets the stored response and the order is created once
+    def test_retry_returns_same_order(
+        self, token_regular_user_client, url, data, django_assert_num_queries
+    ):
+        first = self.post(token_regular_user_client, url, data, "k1")
+        # no queries, the jwt user is cached and the view does not run again
+        with django_assert_num_queries(0):
+            second = self.post(token_regular_user_client, url, data, "k1")
+
+        assert first.status_code == second.status_code == status.HTTP_201_CREATED
+        assert second.data == first.data
+        assert second["Idempotent-Replayed"] == "true"
+        assert Order.objects.count() == 1
+
+    def test_other_key_creates_new_order(self, token_regular_user_client, url, data):
+        self.post(token_regular_user_client, url, data, "k1")
+        self.post(token_regular_user_client, url, data, "k2")
+        assert Order.objects.count() == 2
+
+    # same key with another body is rejected
+    def test_key_reused_with_other_body(
+        self, token_regular_user_client, url, data
+    ):
+        self.post(token_regular_user_client, url, data, "k1")
+        data["items"][0]["count"] = 5
+        response = self.post(token_regular_user_client, url, data, "k1")
+        assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+        assert Order.objects.count() == 1
+
+    # keys of different users dont collide
+    def test_key_is_per_user(
+        self, token_regular_user_client, token_another_user_client, url, data
+    ):
+        self.post(token_regular_user_client, url, data, "k1")
+        response = self.post(token_another_user_client, url, data, "k1")
+        assert "Idempotent-Replayed" not in response
+
+    # duplicate of a request still running waits, then gives up with 409
+    def test_in_flight_duplicate(
+        self, token_regular_user_client, url, data, regular_user, monkeypatch
+    ):
+        monkeypatch.setattr("core.idempotency.IDEMPOTENCY_WAIT", 0)
+        cache.add(f"idempotency:OrderCreate:{regular_user.pk}:k1:lock", "running")
+
+        response = self.post(token_regular_user_client, url, data, "k1")
+        assert response.status_code == status.HTTP_409_CONFLICT
+        assert not Order.objects.exists()
+
+    # a retried coupon does not take a second slot
+    def test_apply_coupon_retry(self, token_regular_user_client, order):
+        now = timezone.now()
+        coupon = Coupon.objects.create(
+            code="RETRY",
+            discount_percent=10,
+            valid_from=now - timedelta(days=1),
+            valid_to=now + timedelta(days=1),
+            max_usage=5,
+        )
+        url = reverse("orders:apply-coupon", kwargs={"order_id": order.id})
+
+        first = self.post(token_regular_user_client, url, {"code": "RETRY"}, "c1")
+        second = self.post(token_regular_user_client, url, {"code": "RETRY"}, "c1")
+
+        assert first.status_code == second.status_code == status.HTTP_200_OK
+        coupon.refresh_from_db()
+        assert coupon.usage_count == 1